@@ -0,0 +1,94 @@
+import argparse
+import os
+import subprocess
+import sys
+
+from typing import Dict, List
+
+"""
+Measure how long the ingest modules take to import in a fresh
+interpreter, using python -X importtime.  Exits non-zero if a module is
+over its budget or loads one of the modules we only import lazily.
+
+"""
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Module -> import time budget in milliseconds
+DEFAULT_BUDGETS = {
+    "mcs_history_ingest": 500,
+    "mcs_scene_ingest": 500,
+    "mcs_automated_ingest": 1000,
+    "local_history_ingest": 500,
+    "run_scorecard": 500
+}
+
+# Heavy modules that should only be imported when they are used
+LAZY_MODULES = ["pandas", "shapely", "machine_common_sense"]
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    '''Cumulative import time in microseconds for each module'''
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure_import(module: str, repeat: int = 3) -> dict:
+    '''Best of repeat runs, since the first one can be slower while the
+    file system cache warms up.'''
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+        times = parse_importtime(result.stderr)
+        if best is None or times[module] < best[module]:
+            best = times
+    return {
+        "module": module,
+        "ms": best[module] / 1000.0,
+        "lazy_loaded": sorted(
+            lazy for lazy in LAZY_MODULES if lazy in best)
+    }
+
+
+def run_benchmark(modules: List[str], repeat: int) -> bool:
+    passed = True
+    for module in modules:
+        result = measure_import(module, repeat)
+        over_budget = result["ms"] > DEFAULT_BUDGETS.get(module, float("inf"))
+        status = "FAIL" if over_budget or result["lazy_loaded"] else "ok"
+        passed = passed and status == "ok"
+        print(f"{status:4} {module}: {result['ms']:.1f} ms"
+              f" (budget {DEFAULT_BUDGETS.get(module, '-')} ms)")
+        if result["lazy_loaded"]:
+            print(f"     imported {', '.join(result['lazy_loaded'])} "
+                  "at startup")
+    return passed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Check the import time of the ingest modules')
+    parser.add_argument(
+        'modules',
+        nargs='*',
+        default=list(DEFAULT_BUDGETS),
+        help='Modules to import (default: all the budgeted modules)')
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help='Number of runs per module, the best is reported')
+
+    args = parser.parse_args()
+    if not run_benchmark(args.modules, args.repeat):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+import argparse
+import json
+import logging
+import math
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from typing import List
+from unittest import mock
+
+import boto3
+from moto import mock_s3, mock_sqs
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import mcs_automated_ingest
+import mcs_scene_ingest
+from mcs_ingest import load_json_file
+
+"""
+End to end benchmark of mcs_automated_ingest.process_message: SQS
+message, S3 download, history build, scoring and insert.  S3 and SQS are
+mocked with moto and Mongo is mongomock unless --mongo-url is given, so
+nothing touches AWS.  Reports messages/second, p50/p99 latency and peak
+RSS.
+
+"""
+TEST_FOLDER = os.path.join(REPO_ROOT, "tests", "test_data")
+BUCKET = "mcs-ingest-benchmark"
+QUEUE = "mcs-ingest-benchmark-queue"
+REGION = "us-east-1"
+# A run that has not processed every message by then has lost one
+DEFAULT_TIMEOUT_SECONDS = 600
+
+# (scene file, history file) pairs from the test data
+CORPUS = [
+    ("test_juliett_0001_01_debug.json",
+     "test_eval_3-5_level2_baseline_juliett_0001_01.json"),
+    ("occluders_0001_17_I1_debug.json",
+     "occluders_0001_17_hist_updated.json"),
+    ("arth_0001_13_ex.json", "arth_0001_13_hist_all_targets.json"),
+    ("eval_6_lima_0001_02_debug.json",
+     "eval_6_lima_0001_02_tool_usage_hist.json"),
+    ("num_comp_0003_05_scene.json", "num_comp_0003_05_hist_left.json"),
+    ("eval_6_mars_0010_01_debug.json",
+     "eval_6_mars_0010_01_lava_step_hist.json")
+]
+
+
+def percentile(values: List[float], percent: float) -> float:
+    '''Nearest rank percentile'''
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(percent / 100.0 * len(ordered))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def create_mongo_client(mongo_url: str = None):
+    if mongo_url:
+        from pymongo import MongoClient
+        return MongoClient(mongo_url)
+    try:
+        import mongomock
+    except ImportError as error:
+        raise ImportError(
+            "The benchmark needs mongomock without --mongo-url, "
+            "install it with: pip install mongomock") from error
+    return mongomock.MongoClient()
+
+
+def upload_corpus(s3, messages: int) -> List[str]:
+    '''Upload messages history files, cycling through the corpus.  Each
+    copy gets its own team so it is inserted as a new document.'''
+    histories = [
+        load_json_file(TEST_FOLDER, history_file)
+        for _, history_file in CORPUS]
+    bucket = s3.Bucket(BUCKET)
+    keys = []
+    for index in range(messages):
+        history = histories[index % len(histories)]
+        history["info"]["team"] = f"bench{index}"
+        key = f"history/{history['info']['name']}_{index:06d}.json"
+        bucket.put_object(Key=key, Body=json.dumps(history).encode())
+        keys.append(key)
+    return keys
+
+
+def send_messages(queue, keys: List[str], records_per_message: int) -> int:
+    '''Queue S3 event notifications for the uploaded files'''
+    bodies = []
+    for start in range(0, len(keys), records_per_message):
+        bodies.append(json.dumps({"Records": [
+            {"s3": {"bucket": {"name": BUCKET}, "object": {"key": key}}}
+            for key in keys[start:start + records_per_message]]}))
+    for start in range(0, len(bodies), 10):
+        queue.send_messages(Entries=[
+            {"Id": str(index), "MessageBody": body}
+            for index, body in enumerate(bodies[start:start + 10])])
+    return len(bodies)
+
+
+def run_benchmark(
+        messages: int,
+        records_per_message: int = 1,
+        mongo_url: str = None,
+        db_string: str = "mcs_benchmark",
+        timeout: float = DEFAULT_TIMEOUT_SECONDS) -> dict:
+    with mock_s3(), mock_sqs():
+        s3 = boto3.resource("s3", region_name=REGION)
+        s3.create_bucket(Bucket=BUCKET)
+        sqs = boto3.resource("sqs", region_name=REGION)
+        queue = sqs.create_queue(QueueName=QUEUE)
+        error_queue = sqs.create_queue(QueueName=QUEUE + "-errors")
+
+        # Restored when the run ends, so the module does not keep the
+        #   torn down mocks
+        with mock.patch.object(mcs_automated_ingest, "s3", s3), \
+                mock.patch.object(
+                    mcs_automated_ingest, "error_queue", error_queue), \
+                mock.patch.object(
+                    mcs_automated_ingest, "dev_error_queue", error_queue):
+            return ingest_messages(
+                s3, queue, error_queue, messages, records_per_message,
+                create_mongo_client(mongo_url), db_string, timeout)
+
+
+def ingest_messages(
+        s3,
+        queue,
+        error_queue,
+        messages: int,
+        records_per_message: int,
+        client,
+        db_string: str,
+        timeout: float) -> dict:
+    '''Ingest the corpus through the mocked queue, raises TimeoutError
+    when a message is lost'''
+    client.drop_database(db_string)
+    for scene_file, _ in CORPUS:
+        mcs_scene_ingest.automated_scene_ingest_file(
+            scene_file, TEST_FOLDER, db_string, client)
+
+    keys = upload_corpus(s3, messages)
+    queued = send_messages(queue, keys, records_per_message)
+
+    latencies = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        # process_message downloads into the working directory
+        os.chdir(work_dir)
+        try:
+            start = time.perf_counter()
+            while len(latencies) < queued:
+                if time.perf_counter() - start > timeout:
+                    raise TimeoutError(
+                        f"Processed {len(latencies)} of {queued} messages "
+                        f"in {timeout} seconds")
+                received = queue.receive_messages(
+                    MaxNumberOfMessages=10, WaitTimeSeconds=0)
+                for message in received:
+                    message_start = time.perf_counter()
+                    mcs_automated_ingest.process_message(
+                        message, mcs_automated_ingest.HISTORY_MESSAGE,
+                        db_string, client)
+                    message.delete()
+                    latencies.append(time.perf_counter() - message_start)
+            elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+
+    error_queue.load()
+    errors = int(error_queue.attributes["ApproximateNumberOfMessages"])
+    client.drop_database(db_string)
+
+    return {
+        "messages": queued,
+        "files": len(keys),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "messages_per_second": round(queued / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Benchmark the automated ingest with mocked AWS')
+    parser.add_argument(
+        '--messages',
+        type=int,
+        default=200,
+        help='Number of history files to ingest')
+    parser.add_argument(
+        '--records-per-message',
+        type=int,
+        default=1,
+        help='S3 records in each SQS message')
+    parser.add_argument(
+        '--mongo-url',
+        help='Benchmark against this Mongo instead of mongomock')
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=DEFAULT_TIMEOUT_SECONDS,
+        help='Seconds to wait for every message to be processed')
+    parser.add_argument(
+        '--output',
+        help='Also write the results to this JSON file')
+
+    args = parser.parse_args()
+    # Per file ingest logging would dominate the run
+    logging.basicConfig(level=logging.WARNING)
+
+    results = run_benchmark(
+        args.messages, args.records_per_message, args.mongo_url,
+        timeout=args.timeout)
+    for key, value in results.items():
+        print(f"{key}: {value}")
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
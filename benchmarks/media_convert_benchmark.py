@@ -0,0 +1,194 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from typing import List
+
+import boto3
+from moto import mock_s3, mock_sqs
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import mcs_automated_media_convert
+from benchmarks.ingest_benchmark import peak_rss_mb, percentile
+from local_media_convert import LocalMediaConvert
+from media_convert_ledger import SqliteLedger
+
+"""
+End to end benchmark of the MediaConvert daemon: S3 event messages are
+read from SQS and the videos' jobs are submitted, concurrently and rate
+limited, to local_media_convert.LocalMediaConvert, which simulates
+request latency and the CreateJob quota.  SQS and S3 are mocked with moto
+and the job ledger is a SQLite file, so nothing touches AWS.  Reports
+jobs/second, p50/p99 latency per SQS message, throttled requests and
+peak RSS.
+
+"""
+BUCKET = "mcs-media-convert-benchmark"
+REGION = "us-east-1"
+# The queues init_aws looks up
+QUEUES = [
+    "media-convert-queue", "dev-media-convert-queue",
+    "error-media-convert-queue"]
+
+
+def upload_videos(s3, videos: int, evals: int = 2) -> List[str]:
+    '''Upload empty videos, spread across the upload folders of evals'''
+    bucket = s3.Bucket(BUCKET)
+    keys = []
+    for index in range(videos):
+        key = f"eval-videos-{6 + index % evals}/scene_{index:06d}_visual.mp4"
+        bucket.put_object(Key=key, Body=b"")
+        keys.append(key)
+    return keys
+
+
+def send_messages(queue, keys: List[str], records_per_message: int) -> int:
+    '''Queue S3 event notifications for the uploaded videos'''
+    bodies = []
+    for start in range(0, len(keys), records_per_message):
+        bodies.append(json.dumps({"Records": [
+            {"s3": {"bucket": {"name": BUCKET},
+                    "object": {"key": key, "eTag": f"etag-{key}"}}}
+            for key in keys[start:start + records_per_message]]}))
+    for start in range(0, len(bodies), 10):
+        queue.send_messages(Entries=[
+            {"Id": str(index), "MessageBody": body}
+            for index, body in enumerate(bodies[start:start + 10])])
+    return len(bodies)
+
+
+def run_benchmark(
+        videos: int,
+        records_per_message: int = 1,
+        duplicates: float = 0,
+        jobs_per_second: float = None,
+        workers: int = mcs_automated_media_convert.DEFAULT_SUBMIT_WORKERS,
+        backend_jobs_per_second: float = (
+            mcs_automated_media_convert.DEFAULT_JOBS_PER_SECOND),
+        latency: float = 0.05) -> dict:
+    '''duplicates is the fraction of videos whose message is delivered
+    twice, the converter's jobs_per_second defaults to the backend's'''
+    with mock_s3(), mock_sqs(), tempfile.TemporaryDirectory() as work_dir:
+        s3 = boto3.resource("s3", region_name=REGION)
+        s3.create_bucket(Bucket=BUCKET)
+        sqs = boto3.resource("sqs", region_name=REGION)
+        queue, _, error_queue = [
+            sqs.create_queue(QueueName=name) for name in QUEUES]
+
+        backend = LocalMediaConvert(
+            latency=latency, jobs_per_second=backend_jobs_per_second,
+            s3=s3)
+        ledger = SqliteLedger(os.path.join(work_dir, "ledger.db"))
+        mcs_automated_media_convert.init_aws(
+            jobs_per_second or backend_jobs_per_second, workers, ledger,
+            backend)
+        submitter = mcs_automated_media_convert.submitter
+
+        keys = upload_videos(s3, videos)
+        repeated = keys[:int(len(keys) * duplicates)]
+        queued = send_messages(queue, keys + repeated, records_per_message)
+
+        latencies = []
+        start = time.perf_counter()
+        while len(latencies) < queued:
+            received = queue.receive_messages(
+                MaxNumberOfMessages=mcs_automated_media_convert.MAX_MESSAGES,
+                WaitTimeSeconds=0)
+            if not received:
+                continue
+            batch_start = time.perf_counter()
+            mcs_automated_media_convert.process_messages(received, "prod")
+            # Every message in a batch waits for the whole batch
+            latencies.extend(
+                [time.perf_counter() - batch_start] * len(received))
+        elapsed = time.perf_counter() - start
+        submitter.refresh_statuses()
+        submitter.pool.shutdown()
+
+        error_queue.load()
+        errors = int(error_queue.attributes["ApproximateNumberOfMessages"])
+        jobs = backend.counts()
+
+    return {
+        "messages": queued,
+        "videos": len(keys),
+        "duplicates": len(repeated),
+        "jobs": sum(jobs.values()),
+        "completed": jobs.get("COMPLETE", 0),
+        "skipped": submitter.skipped,
+        "errors": errors,
+        "throttled": backend.throttled,
+        "seconds": round(elapsed, 3),
+        "jobs_per_second": round(sum(jobs.values()) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Benchmark the MediaConvert daemon against a local '
+                    'stand-in with mocked AWS')
+    parser.add_argument(
+        '--videos',
+        type=int,
+        default=200,
+        help='Number of videos to convert')
+    parser.add_argument(
+        '--records-per-message',
+        type=int,
+        default=1,
+        help='S3 records in each SQS message')
+    parser.add_argument(
+        '--duplicates',
+        type=float,
+        default=0,
+        help='Fraction of videos whose message is delivered twice')
+    parser.add_argument(
+        '--jobs-per-second',
+        type=float,
+        help='The converter\'s rate limit, by default the stand-in\'s '
+             'quota')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=mcs_automated_media_convert.DEFAULT_SUBMIT_WORKERS,
+        help='Jobs the converter submits at once')
+    parser.add_argument(
+        '--quota',
+        type=float,
+        default=mcs_automated_media_convert.DEFAULT_JOBS_PER_SECOND,
+        help='CreateJob requests a second the stand-in allows')
+    parser.add_argument(
+        '--latency-ms',
+        type=float,
+        default=50,
+        help='Time the stand-in takes for each request')
+    parser.add_argument(
+        '--output',
+        help='Also write the results to this JSON file')
+
+    args = parser.parse_args()
+    # Per job logging would dominate the run
+    logging.basicConfig(level=logging.WARNING)
+
+    results = run_benchmark(
+        args.videos, args.records_per_message, args.duplicates,
+        args.jobs_per_second, args.workers, args.quota,
+        args.latency_ms / 1000)
+    for key, value in results.items():
+        print(f"{key}: {value}")
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
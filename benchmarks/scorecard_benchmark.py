@@ -0,0 +1,261 @@
+import argparse
+import copy
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from typing import Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from mcs_ingest import load_json_file
+from scorecard.scorecard import SCORE_CALCULATIONS, Scorecard
+
+"""
+Benchmark Scorecard.score_all and each calc_* method against the
+tests/test_data fixtures, plus copies of them with the steps repeated to
+make longer episodes.  Reports latency and peak allocation per metric and
+compares them to a stored baseline, exiting non-zero on a regression.
+
+The baseline is machine specific, regenerate it with --update-baseline
+before comparing changes on a different machine.
+
+"""
+TEST_FOLDER = os.path.join(REPO_ROOT, "tests", "test_data")
+DEFAULT_BASELINE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "scorecard_baseline.json")
+
+# (name, scene file, history file)
+FIXTURES = [
+    ("tool_choice", "tool_choice_scene_debug.json",
+     "tool_choice_pickup_target_history.json"),
+    ("obstructed", "obstructed_scene.json", "obstructed_history.json"),
+    ("multi_retrieval", "arth_0001_13_ex.json",
+     "arth_0001_13_hist_all_targets.json"),
+    ("imitation", "imitation_eval_5_ex_1.json",
+     "imitation_eval_5_ex_1_history.json"),
+    ("ramps", "ramps_eval_5_ex_1.json", "ramps_test_all_combos.json"),
+    ("lava", "eval_6_mars_0010_01_debug.json",
+     "eval_6_mars_0010_01_lava_step_hist.json")
+]
+
+# Times creating the Scorecard (building its revisit grid) on its own
+INIT_METRIC = "__init__"
+
+# How many times the steps of each fixture are repeated
+DEFAULT_LENGTHS = [1, 5]
+
+# A metric regresses when it is slower/bigger than the baseline by more
+#   than the threshold ratio AND by more than the absolute noise floor
+DEFAULT_TIME_THRESHOLD = 0.25
+DEFAULT_MEMORY_THRESHOLD = 0.25
+TIME_NOISE_FLOOR_MS = 1.0
+MEMORY_NOISE_FLOOR_KB = 64
+
+
+def lengthen_history(history: dict, repeat: int) -> dict:
+    '''Repeat the steps of a history, renumbering them, to simulate
+    a longer episode in the same scene.'''
+    if repeat <= 1:
+        return history
+    history = copy.deepcopy(history)
+    steps = history["steps"]
+    lengthened = []
+    for _ in range(repeat):
+        for step in steps:
+            step = copy.deepcopy(step)
+            step["step"] = len(lengthened) + 1
+            lengthened.append(step)
+    history["steps"] = lengthened
+    return history
+
+
+def load_cases(lengths: List[int]) -> List[tuple]:
+    cases = []
+    for name, scene_file, history_file in FIXTURES:
+        scene = load_json_file(TEST_FOLDER, scene_file)
+        history = load_json_file(TEST_FOLDER, history_file)
+        for length in lengths:
+            cases.append((
+                f"{name}_x{length}", scene,
+                lengthen_history(history, length)))
+    return cases
+
+
+def time_metric(
+        history: dict,
+        scene: dict,
+        metric: str,
+        repeat: int) -> float:
+    '''Median milliseconds, a new Scorecard (not timed) for each run.
+    The first run is not timed, it loads the lazy imports and lets
+    calc_repeat_failed make its one change to the history.'''
+    if metric == INIT_METRIC:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            Scorecard(history, scene)
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    getattr(Scorecard(history, scene), metric)()
+    timings = []
+    for _ in range(repeat):
+        scorecard = Scorecard(history, scene)
+        start = time.perf_counter()
+        getattr(scorecard, metric)()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def peak_memory_metric(history: dict, scene: dict, metric: str) -> float:
+    '''Peak KB allocated while the metric runs'''
+    scorecard = None if metric == INIT_METRIC else Scorecard(history, scene)
+    tracemalloc.start()
+    try:
+        if scorecard is None:
+            Scorecard(history, scene)
+        else:
+            getattr(scorecard, metric)()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def run_benchmark(
+        lengths: List[int],
+        repeat: int,
+        metrics: List[str] = None) -> Dict[str, dict]:
+    metrics = metrics or (
+        [INIT_METRIC, "score_all"] + SCORE_CALCULATIONS)
+    results = {}
+    for case, scene, history in load_cases(lengths):
+        results[case] = {}
+        for metric in metrics:
+            # Some fixtures only have the scene fields their own tests
+            #   need, so not every metric can run against every fixture
+            try:
+                milliseconds = time_metric(history, scene, metric, repeat)
+            except (KeyError, TypeError, IndexError) as error:
+                results[case][metric] = {"error": repr(error)}
+                continue
+            results[case][metric] = {
+                "ms": round(milliseconds, 3),
+                "peak_kb": round(
+                    peak_memory_metric(history, scene, metric), 1)
+            }
+    return results
+
+
+def compare_to_baseline(
+        results: Dict[str, dict],
+        baseline: Dict[str, dict],
+        time_threshold: float = DEFAULT_TIME_THRESHOLD,
+        memory_threshold: float = DEFAULT_MEMORY_THRESHOLD) -> List[str]:
+    '''Returns a description of every regression'''
+    regressions = []
+    for case, metrics in results.items():
+        for metric, result in metrics.items():
+            expected = baseline.get(case, {}).get(metric)
+            if expected is None or "error" in expected:
+                continue
+            if "error" in result:
+                regressions.append(f"{case} {metric}: {result['error']}")
+                continue
+            for key, threshold, floor in [
+                    ("ms", time_threshold, TIME_NOISE_FLOOR_MS),
+                    ("peak_kb", memory_threshold, MEMORY_NOISE_FLOOR_KB)]:
+                limit = max(
+                    expected[key] * (1 + threshold), expected[key] + floor)
+                if result[key] > limit:
+                    regressions.append(
+                        f"{case} {metric} {key}: {result[key]} > "
+                        f"{round(limit, 3)} (baseline {expected[key]})")
+    return regressions
+
+
+def print_results(results: Dict[str, dict], baseline: Dict[str, dict]):
+    for case, metrics in results.items():
+        print(case)
+        for metric, result in sorted(
+                metrics.items(), key=lambda item: -item[1].get("ms", -1)):
+            if "error" in result:
+                print(f"  {metric:52} skipped: {result['error']}")
+                continue
+            expected = baseline.get(case, {}).get(metric)
+            change = ""
+            if expected and expected.get("ms"):
+                change = f" ({result['ms'] / expected['ms'] - 1:+.0%})"
+            print(f"  {metric:52} {result['ms']:10.3f} ms{change:8}"
+                  f" {result['peak_kb']:10.1f} KB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Benchmark the scorecard metrics against the fixtures')
+    parser.add_argument(
+        '--baseline',
+        default=DEFAULT_BASELINE,
+        help='Baseline JSON file to compare to')
+    parser.add_argument(
+        '--update-baseline',
+        action='store_true',
+        help='Write the results to the baseline file instead of comparing')
+    parser.add_argument(
+        '--lengths',
+        type=int,
+        nargs='+',
+        default=DEFAULT_LENGTHS,
+        help='Step repeat factors to lengthen each fixture by')
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help='Timed runs per metric, the median is reported')
+    parser.add_argument(
+        '--metrics',
+        nargs='+',
+        help='Only run these metrics (default: __init__, score_all and '
+             'every calc_*)')
+    parser.add_argument(
+        '--time-threshold',
+        type=float,
+        default=DEFAULT_TIME_THRESHOLD,
+        help='Allowed slowdown ratio before failing')
+    parser.add_argument(
+        '--memory-threshold',
+        type=float,
+        default=DEFAULT_MEMORY_THRESHOLD,
+        help='Allowed peak memory increase ratio before failing')
+
+    args = parser.parse_args()
+
+    results = run_benchmark(args.lengths, args.repeat, args.metrics)
+    if args.update_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+        print_results(results, {})
+        print(f"Wrote baseline to {args.baseline}")
+        return
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_results(results, baseline)
+    regressions = compare_to_baseline(
+        results, baseline, args.time_threshold, args.memory_threshold)
+    if regressions:
+        print(f"{len(regressions)} regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
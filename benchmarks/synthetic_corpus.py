@@ -0,0 +1,639 @@
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import sys
+import time
+import uuid
+
+from concurrent.futures import ProcessPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from mcs_history_ingest import PASSING_CELLS
+
+"""
+Generate synthetic scene debug files and matching history files for load
+testing ingest and scoring, without the MCS simulator.  Each history is a
+simple agent walking between the containers, ramps and target of its scene,
+so obstructions, ramp climbs, lava steps and container opens happen the way
+the scorecard expects to see them.  Files are generated in parallel and are
+deterministic for a given --seed, whatever the number of workers.
+
+Scenes are written to <output>/scenes and histories to <output>/history,
+ready for offline_ingest.py or the ingest benchmarks.
+
+"""
+PATTERNS = ["obstructions", "ramps", "lava", "containers"]
+
+# Scene tertiary type for each failure pattern
+PATTERN_TYPES = {
+    "obstructions": "obstacle",
+    "ramps": "ramp",
+    "lava": "lava",
+    "containers": "container"
+}
+
+EVALUATION_NAME = "eval_6"
+EVALUATION_SCENES = "Evaluation 6 Scenes"
+
+# MCS movement and performer constants
+MOVE_DISTANCE = 0.1
+ROTATE_DEGREES = 10
+TILT_DEGREES = 10
+# position.y of the performer standing on the floor, as in MCS histories
+PERFORMER_HEIGHT = 0.762
+PERFORMER_RADIUS = 0.25
+PERFORMER_REACH = 1.0
+FIELD_OF_VIEW = 42.5
+RAMP_HEIGHT = 1.0
+RAMP_LENGTH = 3.0
+RAMP_WIDTH = 1.0
+STEP_REWARD = -0.001
+
+# Steps walked on after turning away from an obstruction
+AVOID_MOVE_STEPS = 10
+
+DEFAULT_OPTIONS = {
+    "steps": 200,
+    "room_size": (10, 20),
+    "objects": 4,
+    "patterns": PATTERNS,
+    "failure_rate": 0.02
+}
+
+
+def new_id(rng: random.Random, prefix: str = "") -> str:
+    return prefix + str(uuid.UUID(int=rng.getrandbits(128)))
+
+
+def round_point(x: float, y: float, z: float) -> dict:
+    return {"x": round(x, 4), "y": round(y, 4), "z": round(z, 4)}
+
+
+def footprint(position: dict, scale: dict, rotation: float) -> tuple:
+    '''Axis aligned (min x, min z, max x, max z) of an object rotated by a
+    multiple of 90 degrees'''
+    size_x, size_z = scale["x"], scale["z"]
+    if int(round(rotation / 90)) % 2 == 1:
+        size_x, size_z = size_z, size_x
+    return (
+        position["x"] - size_x / 2, position["z"] - size_z / 2,
+        position["x"] + size_x / 2, position["z"] + size_z / 2)
+
+
+def bounding_box(position: dict, scale: dict, rotation: float) -> list:
+    min_x, min_z, max_x, max_z = footprint(position, scale, rotation)
+    return [
+        round_point(x, y, z)
+        for y in [0, scale["y"]]
+        for x, z in [
+            (max_x, max_z), (max_x, min_z), (min_x, min_z), (min_x, max_z)]]
+
+
+def create_object(
+        rng: random.Random,
+        object_type: str,
+        role: str,
+        position: dict,
+        scale: dict,
+        rotation: float = 0,
+        color: str = "white",
+        **properties) -> dict:
+    room_object = {
+        "id": new_id(rng, "" if role == "target" else role + "_"),
+        "type": object_type,
+        "debug": {"role": role, "dimensions": scale, "color": [color]},
+        "shows": [{
+            "stepBegin": 0,
+            "position": round_point(position["x"], scale["y"] / 2,
+                                    position["z"]),
+            "rotation": {"x": 0, "y": rotation, "z": 0},
+            "scale": scale,
+            "boundingBox": bounding_box(position, scale, rotation)
+        }]
+    }
+    room_object.update(properties)
+    return room_object
+
+
+def random_position(
+        rng: random.Random,
+        room: dict,
+        margin: float = 1.0) -> dict:
+    return {
+        "x": rng.uniform(-room["x"] / 2 + margin, room["x"] / 2 - margin),
+        "z": rng.uniform(-room["z"] / 2 + margin, room["z"] / 2 - margin)
+    }
+
+
+def create_ramp(rng: random.Random, room: dict) -> list:
+    '''A ramp and the platform at its top'''
+    position = random_position(rng, room, RAMP_LENGTH + 1)
+    rotation = rng.choice([0, 90, 180, 270])
+    # Ramps rise in the direction they are rotated to face
+    offset = (RAMP_LENGTH + RAMP_WIDTH) / 2
+    top = {
+        "x": position["x"] + math.sin(math.radians(rotation)) * offset,
+        "z": position["z"] + math.cos(math.radians(rotation)) * offset
+    }
+    return [
+        create_object(
+            rng, "triangle", "ramp", position,
+            {"x": RAMP_WIDTH, "y": RAMP_HEIGHT, "z": RAMP_LENGTH},
+            rotation, structure=True, kinematic=True),
+        create_object(
+            rng, "cube", "platform", top,
+            {"x": RAMP_WIDTH, "y": RAMP_HEIGHT, "z": RAMP_WIDTH},
+            rotation, structure=True, kinematic=True)
+    ]
+
+
+def generate_scene(index: int, options: dict, rng: random.Random) -> dict:
+    '''A scene debug file in the form build_scene_item reads'''
+    patterns = options["patterns"]
+    room_min, room_max = options["room_size"]
+    room = {
+        "x": rng.randint(room_min, room_max),
+        "y": 3,
+        "z": rng.randint(room_min, room_max)
+    }
+    start = random_position(rng, room)
+    start_rotation = rng.choice(range(0, 360, ROTATE_DEGREES))
+    target = create_object(
+        rng, "soccer_ball", "target", random_position(rng, room),
+        {"x": 0.22, "y": 0.22, "z": 0.22}, pickupable=True, moveable=True)
+
+    objects = [target]
+    for _ in range(options["objects"]):
+        if "obstructions" in patterns:
+            objects.append(create_object(
+                rng, "cube", "platform", random_position(rng, room),
+                {"x": rng.uniform(0.5, 2), "y": 1,
+                 "z": rng.uniform(0.5, 2)},
+                structure=True, kinematic=True))
+        if "ramps" in patterns:
+            objects.extend(create_ramp(rng, room))
+        if "containers" in patterns:
+            objects.append(create_object(
+                rng, "chest_1", "container", random_position(rng, room),
+                {"x": 0.6, "y": 0.4, "z": 0.4},
+                rng.choice([0, 90, 180, 270]),
+                rng.choice(["red", "green", "blue", "yellow"]),
+                openable=True, receptacle=True))
+
+    scene_type = PATTERN_TYPES[patterns[index % len(patterns)]]
+    name = f"synthetic_{index + 1:06d}_01"
+    scene = {
+        "name": name,
+        "version": 2,
+        "debug": {
+            "evaluation": EVALUATION_SCENES,
+            "sceneNumber": 1,
+            "hypercubeNumber": index + 1,
+            "path": [
+                {"x": start["x"], "z": start["z"]},
+                {"x": target["shows"][0]["position"]["x"],
+                 "z": target["shows"][0]["position"]["z"]}],
+            "training": False
+        },
+        "goal": {
+            "category": "retrieval",
+            "description": "Find and pick up the soccer ball.",
+            "last_step": options["steps"],
+            "metadata": {
+                "target": {"id": target["id"], "info": ["ball", "target"]}
+            },
+            "sceneInfo": {
+                "primaryType": "interactive",
+                "secondaryType": "retrieval",
+                "tertiaryType": scene_type,
+                "domainType": "interactive places",
+                "id": [rng.choice(PASSING_CELLS[scene_type])],
+                "name": f"{scene_type}_synthetic",
+                "slices": [f"synthetic {pattern}" for pattern in patterns],
+                "untrained": {"any": False}
+            }
+        },
+        "objects": objects,
+        "performerStart": {
+            "position": {"x": round(start["x"], 4), "y": 0,
+                         "z": round(start["z"], 4)},
+            "rotation": {"x": 0, "y": start_rotation, "z": 0}
+        },
+        "roomDimensions": room
+    }
+    if "lava" in patterns:
+        scene["lava"] = generate_lava(
+            start, target["shows"][0]["position"], options["objects"], rng)
+    return scene
+
+
+def generate_lava(
+        start: dict,
+        end: dict,
+        count: int,
+        rng: random.Random) -> list:
+    '''Lava cells part way along the straight path from start to end, so
+    some agents walk through them'''
+    cells = []
+    for _ in range(max(count, 1)):
+        fraction = rng.uniform(0.3, 0.7)
+        cell = {
+            "x": round(start["x"] + (end["x"] - start["x"]) * fraction),
+            "z": round(start["z"] + (end["z"] - start["z"]) * fraction)
+        }
+        if cell not in cells:
+            cells.append(cell)
+    return cells
+
+
+class SyntheticAgent:
+    '''Walks to each container and ramp of a scene in turn and then the
+    target, turning away when obstructed.  Ramps are climbed to the
+    platform at their top and walked back down.  Records one MCS style
+    history step per action.'''
+
+    def __init__(self, scene: dict, options: dict, rng: random.Random):
+        self.rng = rng
+        self.failure_rate = options["failure_rate"]
+        self.room = scene["roomDimensions"]
+        start = scene["performerStart"]
+        self.position = dict(start["position"], y=PERFORMER_HEIGHT)
+        self.rotation = start["rotation"]["y"]
+        self.head_tilt = 0
+        self.steps_on_lava = 0
+        self.lava = set(
+            (cell["x"], cell["z"]) for cell in scene.get("lava", []))
+
+        self.target = scene["objects"][0]
+        self.platforms = [
+            footprint(obj["shows"][0]["position"], obj["shows"][0]["scale"],
+                      obj["shows"][0]["rotation"]["y"])
+            for obj in scene["objects"] if obj["type"] == "cube"]
+        self.ramps = [obj for obj in scene["objects"]
+                      if obj["type"] == "triangle"]
+        self.unopenable = [obj for obj in scene["objects"]
+                           if not obj.get("openable")]
+
+        waypoints = [obj for obj in scene["objects"][1:]
+                     if obj["type"] in ["triangle", "chest_1"]]
+        rng.shuffle(waypoints)
+        self.waypoints = waypoints + [self.target]
+        # Actions queued up to climb a ramp or get around an obstruction
+        self.script = []
+        self.obstructions = 0
+        self.picked_up = False
+
+    def waypoint_position(self, room_object: dict) -> dict:
+        show = room_object["shows"][0]
+        if room_object["type"] != "triangle":
+            return show["position"]
+        # The bottom of the ramp, a little way back from it
+        rotation = math.radians(show["rotation"]["y"])
+        offset = RAMP_LENGTH / 2 + 0.5
+        return {
+            "x": show["position"]["x"] - math.sin(rotation) * offset,
+            "z": show["position"]["z"] - math.cos(rotation) * offset
+        }
+
+    def heading_to(self, position: dict) -> tuple:
+        '''Degrees to turn to face the position and the distance to it'''
+        dx = position["x"] - self.position["x"]
+        dz = position["z"] - self.position["z"]
+        heading = math.degrees(math.atan2(dx, dz)) % 360
+        turn = (heading - self.rotation + 180) % 360 - 180
+        return turn, math.hypot(dx, dz)
+
+    def elevated(self) -> bool:
+        return self.position["y"] - PERFORMER_HEIGHT > RAMP_HEIGHT / 2
+
+    def height_at(self, x: float, z: float) -> tuple:
+        '''(blocked, height above the floor) of a point.  Platforms
+        block the agent on the floor but can be walked onto from a ramp.'''
+        if (abs(x) + PERFORMER_RADIUS >= self.room["x"] / 2 or
+                abs(z) + PERFORMER_RADIUS >= self.room["z"] / 2):
+            return True, 0
+        for ramp in self.ramps:
+            show = ramp["shows"][0]
+            rotation = show["rotation"]["y"]
+            min_x, min_z, max_x, max_z = footprint(
+                show["position"], show["scale"], rotation)
+            if min_x <= x <= max_x and min_z <= z <= max_z:
+                along = (
+                    (x - show["position"]["x"]) *
+                    math.sin(math.radians(rotation)) +
+                    (z - show["position"]["z"]) *
+                    math.cos(math.radians(rotation)))
+                fraction = along / show["scale"]["z"] + 0.5
+                return False, RAMP_HEIGHT * min(max(fraction, 0), 1)
+        for min_x, min_z, max_x, max_z in self.platforms:
+            if min_x < x < max_x and min_z < z < max_z:
+                return not self.elevated(), RAMP_HEIGHT
+        return False, 0
+
+    def rotate(self, degrees: int) -> tuple:
+        self.rotation = (self.rotation + degrees) % 360
+        return ("RotateRight" if degrees > 0 else "RotateLeft"), {}
+
+    def turn_to(self, turn: float) -> list:
+        count = int(round(abs(turn) / ROTATE_DEGREES))
+        degrees = ROTATE_DEGREES if turn > 0 else -ROTATE_DEGREES
+        return [lambda: self.rotate(degrees)] * count
+
+    def move_ahead(self) -> tuple:
+        x = self.position["x"] + (
+            math.sin(math.radians(self.rotation)) * MOVE_DISTANCE)
+        z = self.position["z"] + (
+            math.cos(math.radians(self.rotation)) * MOVE_DISTANCE)
+        blocked, height = self.height_at(x, z)
+        if blocked:
+            # Turn away and walk on for a bit, giving up on a waypoint
+            #   that keeps being blocked
+            self.obstructions += 1
+            if self.waypoints and self.obstructions % 3 == 0:
+                self.waypoints.pop(0)
+            self.script = (
+                self.turn_to(self.rng.choice([-90, 90])) +
+                [self.move_ahead] * AVOID_MOVE_STEPS)
+            return "MoveAhead", {"return_status": "OBSTRUCTED"}
+        self.position = {"x": x, "y": PERFORMER_HEIGHT + height, "z": z}
+        if (round(x), round(z)) in self.lava:
+            self.steps_on_lava += 1
+        return "MoveAhead", {}
+
+    def interact(self, room_object: dict) -> tuple:
+        self.waypoints.pop(0)
+        if room_object is self.target:
+            self.picked_up = True
+            return "PickupObject", {
+                "objectId": room_object["id"], "reward": 1}
+        if room_object.get("openable"):
+            return "OpenObject", {"objectId": room_object["id"]}
+
+        # At the bottom of a ramp, walk up it onto the platform and back
+        moves = int((RAMP_LENGTH + RAMP_WIDTH) / MOVE_DISTANCE)
+        turn = (room_object["shows"][0]["rotation"]["y"] -
+                self.rotation + 180) % 360 - 180
+        self.script = (
+            self.turn_to(turn) + [self.move_ahead] * moves +
+            self.turn_to(180) + [self.move_ahead] * moves)
+        return "Pass", {}
+
+    def fail(self) -> tuple:
+        '''A failed action, repeated a few times as real agents do'''
+        room_object = self.rng.choice(self.unopenable)
+        action = self.rng.choice(["OpenObject", "PickupObject"])
+        result = {
+            "objectId": room_object["id"],
+            "return_status": (
+                "NOT_OPENABLE" if action == "OpenObject"
+                else "OUT_OF_REACH")}
+        repeats = self.rng.randint(0, 2)
+        self.script = [lambda: (action, result)] * repeats + self.script
+        return action, result
+
+    def next_action(self) -> tuple:
+        if self.rng.random() < self.failure_rate:
+            return self.fail()
+        if self.script:
+            return self.script.pop(0)()
+        if not self.waypoints:
+            # Wander until the episode ends
+            choice = self.rng.random()
+            if choice < 0.6:
+                return self.move_ahead()
+            if choice < 0.9:
+                return self.rotate(self.rng.choice(
+                    [-ROTATE_DEGREES, ROTATE_DEGREES]))
+            return "Pass", {}
+
+        waypoint = self.waypoints[0]
+        turn, distance = self.heading_to(self.waypoint_position(waypoint))
+        reach = (
+            MOVE_DISTANCE * 2 if waypoint["type"] == "triangle"
+            else PERFORMER_REACH)
+        if distance <= reach:
+            return self.interact(waypoint)
+        if abs(turn) > ROTATE_DEGREES / 2:
+            return self.rotate(
+                ROTATE_DEGREES if turn > 0 else -ROTATE_DEGREES)
+        if self.rng.random() < 0.05:
+            # Look around now and again
+            tilt = self.rng.choice([-TILT_DEGREES, TILT_DEGREES])
+            self.head_tilt = min(max(self.head_tilt + tilt, -30), 90)
+            return ("LookDown" if tilt > 0 else "LookUp"), {}
+        return self.move_ahead()
+
+    def target_visible(self) -> bool:
+        turn, _ = self.heading_to(self.target["shows"][0]["position"])
+        return abs(turn) <= FIELD_OF_VIEW / 2
+
+    def create_step(self, step_number: int) -> dict:
+        action, result = self.next_action()
+        object_id = result.get("objectId")
+        on_lava = (
+            round(self.position["x"]), round(self.position["z"])) in self.lava
+        target_position = self.target["shows"][0]["position"]
+        return {
+            "step": step_number,
+            "action": action,
+            "args": {"objectId": object_id} if object_id else {},
+            "params": {
+                "objectId": object_id,
+                "receptacleObjectId": None,
+                "moveMagnitude": MOVE_DISTANCE
+            },
+            "classification": None,
+            "confidence": None,
+            "violations_xy_list": None,
+            "internal_state": None,
+            "target_visible": self.target_visible(),
+            "output": {
+                "goal": {
+                    "category": "retrieval",
+                    "metadata": {
+                        "target": {
+                            "id": self.target["id"],
+                            "position": dict(target_position, y=0.0)
+                        },
+                        "category": "retrieval"
+                    }
+                },
+                "haptic_feedback": {"on_lava": on_lava},
+                "head_tilt": float(self.head_tilt),
+                "performer_radius": PERFORMER_RADIUS,
+                "performer_reach": PERFORMER_REACH,
+                "physics_frames_per_second": 20.0,
+                "position": round_point(
+                    self.position["x"], self.position["y"],
+                    self.position["z"]),
+                "resolved_object": object_id or "",
+                "resolved_receptacle": "",
+                "return_status": result.get("return_status", "SUCCESSFUL"),
+                "reward": result.get("reward", STEP_REWARD),
+                "rotation": float(self.rotation),
+                "room_dimensions": self.room,
+                "step_number": step_number,
+                "steps_on_lava": self.steps_on_lava
+            }
+        }
+
+
+def generate_history(
+        scene: dict,
+        options: dict,
+        rng: random.Random,
+        team: str = "synthetic") -> dict:
+    '''A history file in the form build_history_item reads'''
+    agent = SyntheticAgent(scene, options, rng)
+    steps = []
+    # As in MCS, the episode ends when the target is picked up
+    while len(steps) < options["steps"] and not agent.picked_up:
+        steps.append(agent.create_step(len(steps) + 1))
+    return {
+        "info": {
+            "evaluation_name": EVALUATION_NAME,
+            "evaluation_description": "synthetic",
+            "metadata": "level2",
+            "team": team,
+            "name": scene["name"],
+            "timestamp": options.get(
+                "timestamp", time.strftime("%Y%m%d-%H%M%S"))
+        },
+        "steps": steps,
+        "score": {"classification": None, "confidence": "-1.0"}
+    }
+
+
+def history_file_name(history: dict) -> str:
+    info = history["info"]
+    return (f"{info['evaluation_name']}_{info['metadata']}_{info['team']}_"
+            f"{info['name']}.json")
+
+
+def generate_files(task: tuple) -> int:
+    '''Write one scene and its history, returns the bytes written.  Each
+    index has its own random generator so the output does not depend on
+    how the work was split between processes.'''
+    output_dir, index, options, seed = task
+    rng = random.Random(seed * 1000003 + index)
+    scene = generate_scene(index, options, rng)
+    history = generate_history(scene, options, rng)
+
+    written = 0
+    for folder, file_name, content in [
+            ("scenes", scene["name"] + "_debug.json", scene),
+            ("history", history_file_name(history), history)]:
+        text = json.dumps(content)
+        with open(os.path.join(output_dir, folder, file_name), 'w') as f:
+            f.write(text)
+        written += len(text)
+    return written
+
+
+def generate_corpus(
+        output_dir: str,
+        count: int,
+        options: dict = None,
+        workers: int = None,
+        seed: int = 0) -> dict:
+    options = dict(DEFAULT_OPTIONS, **(options or {}))
+    # One timestamp for the whole corpus
+    options.setdefault("timestamp", time.strftime("%Y%m%d-%H%M%S"))
+    unknown = set(options["patterns"]) - set(PATTERNS)
+    if unknown or not options["patterns"]:
+        raise ValueError(f"Patterns must be from {PATTERNS}, got "
+                         f"{options['patterns']}")
+    for folder in ["scenes", "history"]:
+        os.makedirs(os.path.join(output_dir, folder), exist_ok=True)
+
+    start = time.perf_counter()
+    tasks = [(output_dir, index, options, seed) for index in range(count)]
+    if workers == 1:
+        written = sum(map(generate_files, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            written = sum(executor.map(
+                generate_files, tasks,
+                chunksize=max(1, count // ((workers or os.cpu_count()) * 8))))
+    seconds = time.perf_counter() - start
+
+    return {
+        "scenes": count,
+        "histories": count,
+        "megabytes": round(written / 1024 / 1024, 1),
+        "seconds": round(seconds, 2),
+        "files_per_second": round(2 * count / seconds, 1) if seconds else 0
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Generate synthetic scene and history files')
+    parser.add_argument(
+        'output',
+        help='Folder to write the scenes and history folders to')
+    parser.add_argument(
+        '--count',
+        type=int,
+        default=1000,
+        help='Number of scene/history pairs to generate')
+    parser.add_argument(
+        '--steps',
+        type=int,
+        default=DEFAULT_OPTIONS["steps"],
+        help='Maximum steps in each history, an episode ends early '
+             'when the target is picked up')
+    parser.add_argument(
+        '--room-size',
+        type=int,
+        nargs=2,
+        default=DEFAULT_OPTIONS["room_size"],
+        metavar=('MIN', 'MAX'),
+        help='Range of room widths and depths')
+    parser.add_argument(
+        '--objects',
+        type=int,
+        default=DEFAULT_OPTIONS["objects"],
+        help='Number of objects per pattern in each scene')
+    parser.add_argument(
+        '--patterns',
+        nargs='+',
+        choices=PATTERNS,
+        default=PATTERNS,
+        help='Failure patterns to put in the scenes')
+    parser.add_argument(
+        '--failure-rate',
+        type=float,
+        default=DEFAULT_OPTIONS["failure_rate"],
+        help='Chance of a failed open/pickup action at each step')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help='Generator processes (default: one per CPU)')
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+        help='Random seed')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    results = generate_corpus(args.output, args.count, {
+        "steps": args.steps,
+        "room_size": tuple(args.room_size),
+        "objects": args.objects,
+        "patterns": args.patterns,
+        "failure_rate": args.failure_rate
+    }, args.workers, args.seed)
+    for key, value in results.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -22,125 +22,164 @@ Create some submissions, which includes:
     which location
 
 Pass in an integer that determines the number of submissions to create, default to 1.
+
+The values of each submission are drawn in bulk from a NumPy generator
+seeded with --seed and the submission number, so the output is the same
+whatever --workers is, and the files are written straight into a
+compressed zip.
 """
-import random
 import argparse
-import os
 import json
-import shutil
-import tempfile
-from pathlib import Path
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+BLOCKS = 3
+TESTS = 1080
+SCENES = 4
+FRAMES = 100
+# Frames before the voe signal starts to fall
+FLAT_FRAMES = 20
+DEFAULT_SEED = 9435212
+
+
+def voe_template():
+    """ The bytes of a voe file with the values left blank, and the
+    offset of each value's 8 characters, e.g. '1 1.000000' """
+    template = bytearray()
+    offsets = []
+    for frame_num in range(FRAMES):
+        template += "{} ".format(frame_num + 1).encode()
+        offsets.extend(range(len(template), len(template) + 8))
+        template += b"0.000000\n"
+    return np.frombuffer(bytes(template), dtype=np.uint8), np.array(offsets)
+
+
+VOE_TEMPLATE, VOE_OFFSETS = voe_template()
+
+
+def format_values(values):
+    """ The '%f' characters of values in [0, 1], as a uint8 array with a
+    last axis of 8 """
+    micro = np.rint(values * 1e6).astype(np.int64)
+    digits = np.empty(values.shape + (8,), dtype=np.uint8)
+    digits[..., 0] = micro // 1000000 + ord('0')
+    digits[..., 1] = ord('.')
+    for place in range(6):
+        digits[..., 7 - place] = micro // 10 ** place % 10 + ord('0')
+    return digits
 
 
 class SubmissionCreator:
 
-    def __init__(self, num_sub):
-        for sub in range(num_sub):
-            self.create_submission(sub)
+    def __init__(self, num_sub, seed=DEFAULT_SEED, folder='.', tests=TESTS,
+                 performers=1, workers=1):
+        self.seed = seed
+        self.folder = folder
+        self.tests = tests
+        self.performers = performers
+        if workers > 1:
+            with ProcessPoolExecutor(workers) as executor:
+                list(executor.map(self.create_submission, range(num_sub)))
+        else:
+            for sub in range(num_sub):
+                self.create_submission(sub)
+
+    def scene_names(self):
+        return ["O{}/{:04d}/{}".format(block + 1, test + 1, scene + 1)
+                for block in range(BLOCKS) for test in range(self.tests)
+                for scene in range(SCENES)]
 
     def create_submission(self, sub):
         sub_name = "submission_" + str(sub)
-
-        # Create a working directory
-        base_dir = Path(tempfile.mkdtemp())
-        dir_path = Path(base_dir / sub_name)
-        if not dir_path.exists():
-            print("Creating directory " + str(dir_path))
-            dir_path.mkdir()
-
-        # Create descriptive json file.  In this case all the submissions are by the same TA1 performer.
-        # TODO:  make multiple performers with multiple submissions
-        desc_json = {"Performer": "TA1_group_test",
+        rng = np.random.default_rng([self.seed, sub])
+        scenes = self.scene_names()
+
+        # Create descriptive json file.  With one performer all the submissions are by the same TA1 performer.
+        performer = "TA1_group_test"
+        if self.performers > 1:
+            performer = "TA1_group_{}".format(sub % self.performers)
+        desc_json = {"Performer": performer,
                      "Submission": sub_name,
                      "Description": "What data was used, what parameters"}
-        desc_path = dir_path / "description.json"
-        with desc_path.open("w") as outfile:
-            json.dump(desc_json, outfile, indent=4)
-
-        # Create the answer.txt
-        answer_json = self.create_answer_txt(dir_path)
-
-        # create the frame dependent VOE, with same final value as the answer.txt
-        self.create_frame_dependent_voe(dir_path, answer_json)
-
-        # create the location information
-        self.create_location_information(dir_path, answer_json)
-
-        # zip them all together
-        shutil.make_archive(sub_name, 'zip', str(dir_path))
-
-    def create_answer_txt(self, path):
-        answer_filename = "answer.txt"
-        answer_json = {}
-        answer_file = path / answer_filename
-        with answer_file.open('w') as outfile:
-            for block in range(0, 3):
-                block_json = {}
-                for test in range(0, 1080):
-                    test_json = {}
-                    # Create 2 high, 2 low and shuffle
-                    results = [random.uniform(0.0, 0.3), random.uniform(0.0, 0.2), random.uniform(0.7, 1.0),
-                               random.uniform(0.8, 1.0)]
-                    random.shuffle(results)
-                    for scene in range(4):
-                        outfile.write("O{}/{:04d}/{} {:04f}\n".format(block + 1, test + 1, scene + 1, results[scene]))
-                        test_json[str(scene + 1)] = results[scene]
-                    block_json[str(test + 1)] = test_json
-                answer_json[str(block + 1)] = block_json
-
-        return answer_json
-
-    def create_frame_dependent_voe(self, path, answer_json):
-
-        for block in range(0, 3):
-            for test in range(0, 1080):
-                for scene in range(0, 4):
-
-                    voe_filename = "voe_O" + str(block + 1) + "_" + str(test + 1).zfill(4) + "_" + str(scene + 1) + ".txt"
-                    final_answer = answer_json[str(block + 1)][str(test + 1)][str(scene + 1)]
-                    voe_file = path / voe_filename
-                    with voe_file.open('w') as outfile:
-                        for frame_num in range(0, 20):
-                            outfile.write("{} 1.0000\n".format(frame_num + 1))
-                            print("{} {}".format(frame_num+1, 1.0))
-
-                        frame_val = 1.0
-                        index_of_final = random.randint(20, 100)
-                        for frame_num in range(20, index_of_final):
-                            frame_val = frame_val - random.uniform(0, (1. - final_answer) / (101 - index_of_final))
-                            if frame_val < final_answer:
-                                frame_val = final_answer
-                            outfile.write("{} {:04f}\n".format(frame_num + 1, frame_val))
-                            print("{} {}".format(frame_num+1, frame_val))
-
-                        for frame_num in range(index_of_final, 100):
-                            outfile.write("{} {:04f}\n".format(frame_num + 1, final_answer))
-                            print("{} {}".format(frame_num+1, final_answer))
-
-    def create_location_information(self, path, answer_json):
-        location_filename = "location.txt"
-        location_file = path / location_filename
-        with location_file.open('w') as outfile:
-            for block in range(0, 3):
-                for test in range(0, 1080):
-                    for scene in range(0, 4):
-                        final_answer = answer_json[str(block + 1)][str(test + 1)][str(scene + 1)]
-                        if final_answer > 0.5:
-                            frame_num = random.randint(0, 100)
-                            location = [random.randint(0, 100), random.randint(0, 100)]
-                            outfile.write("O{}/{:04d}/{} {} {} {}\n".format(block + 1, test + 1, scene + 1, frame_num,
-                                                                            location[0], location[1]))
-                        else:
-                            outfile.write("O{}/{:04d}/{} -1 -1 -1\n".format(block + 1, test + 1, scene + 1))
 
+        answers = self.create_answers(rng)
+        zip_path = os.path.join(self.folder, sub_name + ".zip")
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED,
+                             compresslevel=1) as my_zip:
+            my_zip.writestr("description.json", json.dumps(desc_json, indent=4))
+            my_zip.writestr("answer.txt", "".join(
+                "{} {:04f}\n".format(scene, value)
+                for scene, value in zip(scenes, answers)))
+
+            # create the frame dependent VOE, with same final value as the answer.txt
+            voe = self.create_frame_dependent_voe(rng, answers)
+            for scene, voe_bytes in zip(scenes, voe):
+                my_zip.writestr(
+                    "voe_" + scene.replace("/", "_") + ".txt",
+                    voe_bytes.tobytes())
+
+            # create the location information
+            my_zip.writestr("location.txt", self.create_location_information(
+                rng, scenes, answers))
+        return zip_path
+
+    def create_answers(self, rng):
+        """ 2 high and 2 low plausibilities for each test, shuffled """
+        tests = BLOCKS * self.tests
+        results = np.concatenate([
+            rng.uniform(0.0, [0.3, 0.2], (tests, 2)),
+            rng.uniform([0.7, 0.8], 1.0, (tests, 2))], axis=1)
+        return rng.permuted(results, axis=1).ravel()
+
+    def create_frame_dependent_voe(self, rng, answers):
+        """ The bytes of each scene's voe file: 1 for 20 frames, then a
+        random fall that stops at the answer by a random frame """
+        count = len(answers)
+        final = answers[:, np.newaxis]
+        index_of_final = rng.integers(
+            FLAT_FRAMES, FRAMES, count, endpoint=True)[:, np.newaxis]
+        frames = np.arange(FLAT_FRAMES, FRAMES)
+        steps = rng.uniform(0.0, 1.0, (count, FRAMES - FLAT_FRAMES)) * (
+            (1.0 - final) / (FRAMES + 1 - index_of_final))
+        falling = frames < index_of_final
+        values = np.ones((count, FRAMES))
+        values[:, FLAT_FRAMES:] = np.where(
+            falling,
+            np.maximum(1.0 - np.cumsum(np.where(falling, steps, 0), axis=1),
+                       final),
+            final)
+
+        voe = np.tile(VOE_TEMPLATE, (count, 1))
+        voe[:, VOE_OFFSETS] = format_values(values).reshape(count, -1)
+        return voe
+
+    def create_location_information(self, rng, scenes, answers):
+        """ The frame and x, y location of the plausible scenes """
+        locations = rng.integers(0, 100, (len(answers), 3), endpoint=True)
+        return "".join(
+            "{} {} {} {}\n".format(scene, *location) if answer > 0.5
+            else "{} -1 -1 -1\n".format(scene)
+            for scene, answer, location in zip(scenes, answers, locations))
 
-if __name__ == "__main__":
-    random.seed(9435212)
 
+if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--num", default="1", help="Number of submissions to create")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED,
+                        help="Seed, the same seed gives the same submissions")
+    parser.add_argument("--folder", default=".", help="Where to write the zips")
+    parser.add_argument("--tests", type=int, default=TESTS,
+                        help="Tests in each block, match the ground truth and metadata")
+    parser.add_argument("--performers", type=int, default=1,
+                        help="Number of performers the submissions are spread across")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Submissions to create in parallel")
     opt = parser.parse_args()
     num_submissions = int(opt.num)
     print("Creating {} submissions".format(num_submissions))
 
-    handler = SubmissionCreator(num_submissions)
+    handler = SubmissionCreator(num_submissions, opt.seed, opt.folder,
+                                opt.tests, opt.performers, opt.workers)
@@ -7,8 +7,11 @@ import collections
 import os
 import zipfile
 
-import numpy as np
-from sklearn.metrics import roc_auc_score
+try:
+    from eval1.score_arrays import (
+        ScoreArrays, score_absolute, score_relative)
+except ImportError:  # run as a script from eval1/
+    from score_arrays import ScoreArrays, score_absolute, score_relative
 
 """Evaluation script for the Intuitive Physics Challenge
 
@@ -51,23 +54,7 @@ def _score_relative(submitted, reference):
     Equation 1 of https://arxiv.org/pdf/1803.07616.pdf
 
     """
-    N = len(submitted)
-    score = 0
-
-    for scene in reference.keys():
-        sub, ref = submitted[scene], reference[scene]
-        pos, imp = 0, 0
-        for k in ('1', '2', '3', '4'):
-            if ref[k] == 1:  # possible movie
-                pos += sub[k]
-            else:  # impossible movie
-                imp += sub[k]
-
-        if pos < imp:  # increment the relative error score
-            score += 1
-
-    # cast to float in case we are running python2
-    return float(score) / float(N)
+    return score_relative(submitted, reference)
 
 
 def _score_absolute(submitted, reference):
@@ -76,15 +63,7 @@ def _score_absolute(submitted, reference):
     Equation 2 of https://arxiv.org/pdf/1803.07616.pdf
 
     """
-    y_true = np.asarray([
-        y for k, v in sorted(reference.items())
-        for _, y in sorted(v.items())], dtype=np.float32)
-
-    y_score = np.asarray([
-        y for k, v in sorted(submitted.items())
-        for _, y in sorted(v.items())], dtype=np.float32)
-
-    return 1.0 - roc_auc_score(y_true, y_score)
+    return score_absolute(submitted, reference)
 
 
 
@@ -98,25 +77,8 @@ def test_score():
 
 
 def score_per_block(submitted, reference):
-    sub_occluded = {k: v for k, v in submitted.items() if 'occluded' in k}
-    sub_visible = {k: v for k, v in submitted.items() if 'visible' in k}
-
-    ref_occluded = {k: v for k, v in reference.items() if 'occluded' in k}
-    ref_visible = {k: v for k, v in reference.items() if 'visible' in k}
-
-    return {
-        'visible': {
-            'relative': _score_relative(sub_visible, ref_visible),
-            'absolute': _score_absolute(sub_visible, ref_visible),
-        },
-        'occluded': {
-            'relative': _score_relative(sub_occluded, ref_occluded),
-            'absolute': _score_absolute(sub_occluded, ref_occluded),
-        },
-        'all': {
-            'relative': _score_relative(submitted, reference),
-            'absolute': _score_absolute(submitted, reference),
-        }}
+    """Scores of the visible, occluded and all scenes"""
+    return ScoreArrays(reference, blocks=None).score(submitted)[None]
 
 
 def score(submitted, reference):
@@ -129,10 +91,7 @@ def score(submitted, reference):
     """
     assert sorted(submitted.keys()) == sorted(reference.keys())
 
-    return {block: score_per_block(
-        {k: v for k, v in submitted.items() if block in k},
-        {k: v for k, v in reference.items() if block in k})
-        for block in ('O1', 'O2', 'O3')}
+    return ScoreArrays(reference).score(submitted)
 
 
 def load_answer(answer_file):
@@ -0,0 +1,135 @@
+"""Vectorized scoring core for the Intuitive Physics Challenge
+
+The reference answers are loaded once into a (scene x movie) array,
+together with a mask of the scenes in each block and category.  A
+submission is loaded into an array aligned with it, and the relative
+error rate of every block and category is one matrix product.  The
+absolute error rate is one minus the rank (Mann-Whitney) ROC AUC, so
+scoring does not need scikit-learn.
+
+"""
+
+import numpy as np
+
+MOVIES = ('1', '2', '3', '4')
+BLOCKS = ('O1', 'O2', 'O3')
+CATEGORIES = ('visible', 'occluded', 'all')
+
+
+def rank_auc(y_true, y_score):
+    """Area under the ROC curve, from the average ranks of the scores
+
+    Gives the same value as sklearn.metrics.roc_auc_score, including
+    for tied scores.
+
+    """
+    y_true = np.asarray(y_true).ravel() == 1
+    y_score = np.asarray(y_score).ravel()
+    positives = np.count_nonzero(y_true)
+    negatives = y_true.size - positives
+    if not positives or not negatives:
+        raise ValueError(
+            'Only one class present in y_true. ROC AUC score is not '
+            'defined in that case.')
+
+    _, inverse, counts = np.unique(
+        y_score, return_inverse=True, return_counts=True)
+    # average (1 based) rank of each distinct score
+    ranks = np.cumsum(counts) - (counts - 1) / 2.0
+    rank_sum = ranks[inverse][y_true].sum()
+    return float(
+        (rank_sum - positives * (positives + 1) / 2.0) /
+        (positives * negatives))
+
+
+def answer_array(answer, scenes):
+    """The answer of each scene as a (scene x movie) array"""
+    return np.array(
+        [[answer[scene][movie] for movie in MOVIES] for scene in scenes],
+        dtype=np.float64)
+
+
+def relative_errors(submitted, reference):
+    """Whether each scene's possible movies were given less plausibility
+    in total than its impossible movies
+
+    Equation 1 of https://arxiv.org/pdf/1803.07616.pdf
+
+    """
+    possible = reference == 1
+    pos = np.where(possible, submitted, 0).sum(axis=1)
+    imp = np.where(possible, 0, submitted).sum(axis=1)
+    return pos < imp
+
+
+class ScoreArrays(object):
+    """The reference answers and block masks, to score any number of
+    submissions against
+
+    With blocks=None, all the scenes are scored as one block, None.
+
+    """
+
+    def __init__(self, reference, blocks=BLOCKS):
+        self.scenes = sorted(reference.keys())
+        self.reference = answer_array(reference, self.scenes)
+        self.blocks = blocks or (None,)
+
+        # (block, category) and the mask of its scenes
+        self.subsets = []
+        for block in self.blocks:
+            in_block = np.array(
+                [block is None or block in scene for scene in self.scenes],
+                dtype=bool)
+            for category in CATEGORIES:
+                mask = in_block
+                if category != 'all':
+                    mask = in_block & np.array(
+                        [category in scene for scene in self.scenes],
+                        dtype=bool)
+                self.subsets.append(((block, category), mask))
+        self.masks = np.array(
+            [mask for _, mask in self.subsets], dtype=np.float64)
+        self.counts = self.masks.sum(axis=1)
+
+    def load(self, submitted):
+        assert sorted(submitted.keys()) == self.scenes
+        return answer_array(submitted, self.scenes)
+
+    def score(self, submitted):
+        """Relative and absolute error rates of each block and category
+
+        Returns {block: {category: {'relative': r, 'absolute': a}}}
+
+        """
+        sub = self.load(submitted)
+        if (self.counts == 0).any():
+            raise ZeroDivisionError('a block or category has no scenes')
+        relative = self.masks.dot(relative_errors(sub, self.reference))
+        relative /= self.counts
+
+        # the absolute scores are computed in single precision, like the
+        #   original scoring program
+        sub32 = sub.astype(np.float32)
+        scores = {block: {} for block in self.blocks}
+        for index, ((block, category), mask) in enumerate(self.subsets):
+            scores[block][category] = {
+                'relative': float(relative[index]),
+                'absolute': 1.0 - rank_auc(
+                    self.reference[mask], sub32[mask]),
+            }
+        return scores
+
+
+def score_relative(submitted, reference):
+    scenes = sorted(reference.keys())
+    errors = relative_errors(
+        answer_array(submitted, scenes), answer_array(reference, scenes))
+    return float(np.count_nonzero(errors)) / float(len(submitted))
+
+
+def score_absolute(submitted, reference):
+    scenes = sorted(reference.keys())
+    return 1.0 - rank_auc(
+        answer_array(reference, scenes),
+        answer_array(submitted, scenes).astype(np.float32))
@@ -0,0 +1,218 @@
+import json
+import logging
+import threading
+import time
+
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+"""
+Timing instrumentation for the ingest pipeline.  Stage timings, counters
+and histograms are kept in memory, served in the Prometheus text format
+by start_metrics_server, and logged as one JSON line per ingested file.
+
+"""
+METRICS_PORT_ENV = "MCS_INGEST_METRICS_PORT"
+
+# Histogram buckets in seconds
+DEFAULT_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+FILE_SECONDS = "mcs_ingest_file_seconds"
+FILES_TOTAL = "mcs_ingest_files_total"
+STAGE_SECONDS = "mcs_ingest_stage_seconds"
+SCORECARD_METRIC_SECONDS = "mcs_scorecard_metric_seconds"
+
+METRIC_HELP = {
+    FILE_SECONDS: "Seconds to download and ingest one file",
+    FILES_TOTAL: "Files ingested, by message type and status",
+    STAGE_SECONDS: "Seconds spent in each ingest stage",
+    SCORECARD_METRIC_SECONDS: "Seconds spent calculating each scorecard metric"
+}
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for index, bucket in enumerate(self.buckets):
+            if value <= bucket:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    '''Counters and histograms keyed by metric name and labels'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name: str, labels: Dict[str, str] = None,
+            value: float = 1) -> None:
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float,
+                labels: Dict[str, str] = None) -> None:
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def render(self) -> str:
+        '''Prometheus text exposition format'''
+        lines = []
+        with self.lock:
+            for metric_type, metrics in [
+                    ("counter", self.counters),
+                    ("histogram", self.histograms)]:
+                names = sorted(set(name for name, _ in metrics))
+                for name in names:
+                    if name in METRIC_HELP:
+                        lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+                    lines.append(f"# TYPE {name} {metric_type}")
+                    for (metric_name, labels), value in sorted(
+                            metrics.items()):
+                        if metric_name != name:
+                            continue
+                        if metric_type == "counter":
+                            lines.append(
+                                f"{name}{format_labels(labels)} {value}")
+                        else:
+                            lines.extend(
+                                render_histogram(name, labels, value))
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{value}"' for key, value in labels)
+    return "{" + pairs + "}"
+
+
+def render_histogram(name: str, labels: tuple, histogram: Histogram) -> list:
+    lines = []
+    cumulative = 0
+    for bucket, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        bucket_labels = format_labels(labels + (("le", str(bucket)),))
+        lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+    bucket_labels = format_labels(labels + (("le", "+Inf"),))
+    lines.append(f"{name}_bucket{bucket_labels} {histogram.count}")
+    lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+    lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+    return lines
+
+
+REGISTRY = MetricsRegistry()
+
+# Stage timings of the file currently being ingested on this thread
+_current = threading.local()
+
+
+@contextmanager
+def stage(name: str):
+    '''Time one stage of an ingest'''
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        REGISTRY.observe(STAGE_SECONDS, seconds, {"stage": name})
+        timing = getattr(_current, "timing", None)
+        if timing is not None:
+            stages = timing["stages"]
+            stages[name] = stages.get(name, 0) + seconds
+
+
+@contextmanager
+def record(message_type: str):
+    '''Time the ingest of a single file.  Stages run inside are
+    collected and logged as one JSON line when it finishes.'''
+    timing = {"type": message_type, "file": None, "status": "ok",
+              "stages": {}}
+    previous = getattr(_current, "timing", None)
+    _current.timing = timing
+    start = time.perf_counter()
+    try:
+        yield timing
+    except Exception:
+        timing["status"] = "error"
+        raise
+    finally:
+        _current.timing = previous
+        timing["seconds"] = time.perf_counter() - start
+        REGISTRY.observe(
+            FILE_SECONDS, timing["seconds"], {"type": message_type})
+        REGISTRY.inc(
+            FILES_TOTAL, {"type": message_type, "status": timing["status"]})
+        logging.info(json.dumps({
+            "event": "ingest_timing",
+            "type": message_type,
+            "file": timing["file"],
+            "status": timing["status"],
+            "seconds": round(timing["seconds"], 4),
+            "stages": {
+                name: round(seconds, 4)
+                for name, seconds in timing["stages"].items()}
+        }))
+
+
+def mark_error() -> None:
+    '''Flag the file being ingested as failed, for errors that are
+    handled without raising'''
+    timing = getattr(_current, "timing", None)
+    if timing is not None:
+        timing["status"] = "error"
+
+
+def observe_scorecard(metric_timings: Dict[str, float]) -> None:
+    for metric, seconds in metric_timings.items():
+        REGISTRY.observe(SCORECARD_METRIC_SECONDS, seconds, {"metric": metric})
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path not in ["/", "/metrics"]:
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes would otherwise be written to stderr
+        pass
+
+
+def start_metrics_server(
+        port: int,
+        host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    '''Serve /metrics from a daemon thread'''
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logging.info(f"Serving ingest metrics on http://{host}:{port}/metrics")
+    return server
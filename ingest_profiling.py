@@ -0,0 +1,123 @@
+import cProfile
+import logging
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+
+"""
+Opt-in profiling of single ingest messages, to capture the occasional
+pathological history file (very long episodes, huge step payloads) as it
+happens in production.  Profiles are written to a folder, one file per
+ingested basename.
+
+"""
+PROFILE_DIR_ENV = "MCS_INGEST_PROFILE_DIR"
+PROFILE_SAMPLE_ENV = "MCS_INGEST_PROFILE_SAMPLE"
+PROFILE_SLOW_SECONDS_ENV = "MCS_INGEST_PROFILE_SLOW_SECONDS"
+
+
+def sampling_profiler_available() -> bool:
+    try:
+        import pyinstrument  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class MessageProfiler:
+    '''Profiles one message in every sample_every, and/or keeps the
+    profile of any message slower than slow_seconds.  A slow message is
+    only known once it has finished, so with slow_seconds set every
+    message is profiled and the fast ones are thrown away; pyinstrument
+    is used when installed since its overhead is much lower than
+    cProfile's.'''
+
+    def __init__(
+            self,
+            output_dir: str,
+            sample_every: int = 0,
+            slow_seconds: float = None,
+            use_sampling_profiler: bool = None):
+        self.output_dir = output_dir
+        self.sample_every = sample_every
+        self.slow_seconds = slow_seconds
+        if use_sampling_profiler is None:
+            use_sampling_profiler = sampling_profiler_available()
+        self.use_sampling_profiler = use_sampling_profiler
+        self.lock = threading.Lock()
+        self.messages = 0
+        self.written = []
+        os.makedirs(output_dir, exist_ok=True)
+
+    def should_profile(self) -> tuple:
+        '''Returns (profile this message, keep it whatever its speed)'''
+        with self.lock:
+            self.messages += 1
+            sampled = (
+                self.sample_every > 0 and
+                self.messages % self.sample_every == 0)
+        return (sampled or self.slow_seconds is not None, sampled)
+
+    @contextmanager
+    def profile(self, basename: str):
+        profile_message, keep = self.should_profile()
+        if not profile_message:
+            yield
+            return
+
+        profiler = self.start_profiler()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.stop_profiler(profiler)
+            slow = (
+                self.slow_seconds is not None and
+                seconds >= self.slow_seconds)
+            if keep or slow:
+                path = self.write_profile(profiler, basename)
+                logging.info(
+                    f"Profiled {basename} ({seconds:.2f}s, "
+                    f"{'slow' if slow else 'sampled'}): {path}")
+
+    def start_profiler(self):
+        if self.use_sampling_profiler:
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    def stop_profiler(self, profiler) -> None:
+        if self.use_sampling_profiler:
+            profiler.stop()
+        else:
+            profiler.disable()
+
+    def write_profile(self, profiler, basename: str) -> str:
+        name = os.path.splitext(os.path.basename(basename))[0]
+        if self.use_sampling_profiler:
+            path = os.path.join(self.output_dir, name + ".pyinstrument.html")
+            with open(path, 'w') as profile_file:
+                profile_file.write(profiler.output_html())
+        else:
+            # Read with python -m pstats or snakeviz
+            path = os.path.join(self.output_dir, name + ".prof")
+            profiler.dump_stats(path)
+        self.written.append(path)
+        return path
+
+
+def create_profiler(
+        output_dir: str,
+        sample_every: int = 0,
+        slow_seconds: float = None) -> MessageProfiler:
+    '''Returns None when profiling is not switched on'''
+    if not output_dir or (not sample_every and slow_seconds is None):
+        return None
+    return MessageProfiler(output_dir, sample_every, slow_seconds)
@@ -0,0 +1,120 @@
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from mcs_automated_media_convert import DEFAULT_JOBS_PER_SECOND, TokenBucket
+
+"""
+Stand-in for MediaConvert, so the converter can run, be tested and be
+benchmarked without AWS.  Each request takes latency seconds, CreateJob
+is throttled above jobs_per_second like the real quota, a repeated
+ClientRequestToken returns the existing job, and jobs complete
+job_seconds after they are created.  Given an S3 resource (e.g. moto's),
+jobs of inputs that are not in S3 end in ERROR and completed jobs write
+their output file.
+
+Use it as the converter's backend:
+    mcs_automated_media_convert.init_aws(backend=LocalMediaConvert())
+
+"""
+# Output file the job template writes for each video
+OUTPUT_EXTENSION = ".mp4"
+
+
+def throttled_error(operation: str) -> ClientError:
+    return ClientError({"Error": {
+        "Code": "TooManyRequestsException",
+        "Message": "Too many requests"}}, operation)
+
+
+def split_s3_url(url: str) -> tuple:
+    bucket, _, key = url[len("s3://"):].partition("/")
+    return bucket, key
+
+
+class LocalMediaConvert:
+    def __init__(
+            self,
+            latency: float = 0.05,
+            jobs_per_second: float = DEFAULT_JOBS_PER_SECOND,
+            job_seconds: float = 0,
+            s3=None):
+        self.latency = latency
+        self.quota = TokenBucket(jobs_per_second)
+        self.job_seconds = job_seconds
+        self.s3 = s3
+        self.jobs = {}
+        self.tokens = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+
+    def client(self, message_type: str):
+        '''One stand-in serves every region'''
+        return self
+
+    def create_job(
+            self,
+            Role: str,
+            Settings: dict,
+            UserMetadata: dict = None,
+            ClientRequestToken: str = None,
+            **kwargs) -> dict:
+        time.sleep(self.latency)
+        with self.lock:
+            self.requests += 1
+        if self.quota.try_acquire():
+            with self.lock:
+                self.throttled += 1
+            raise throttled_error("CreateJob")
+
+        with self.lock:
+            if ClientRequestToken in self.tokens:
+                existing = self.jobs[self.tokens[ClientRequestToken]]
+                return {"Job": dict(existing)}
+            job = {
+                "Id": f"local-{len(self.jobs) + 1:06d}",
+                "Role": Role,
+                "Settings": Settings,
+                "UserMetadata": UserMetadata or {},
+                "Status": "SUBMITTED",
+                "CreatedAt": time.time()
+            }
+            self.jobs[job["Id"]] = job
+            if ClientRequestToken:
+                self.tokens[ClientRequestToken] = job["Id"]
+            return {"Job": dict(job)}
+
+    def get_job(self, Id: str) -> dict:
+        time.sleep(self.latency)
+        with self.lock:
+            job = self.jobs[Id]
+            if (job["Status"] == "SUBMITTED" and
+                    time.time() - job["CreatedAt"] >= self.job_seconds):
+                job["Status"] = self.finish(job)
+            return {"Job": dict(job)}
+
+    def finish(self, job: dict) -> str:
+        '''Status of a job that has had its time, writing its output'''
+        if self.s3 is None:
+            return "COMPLETE"
+        source = job["Settings"]["Inputs"][0]["FileInput"]
+        bucket, key = split_s3_url(source)
+        try:
+            self.s3.Object(bucket, key).load()
+        except ClientError:
+            return "ERROR"
+        destination = job["Settings"]["OutputGroups"][0][
+            "OutputGroupSettings"]["FileGroupSettings"]["Destination"]
+        bucket, key = split_s3_url(destination + OUTPUT_EXTENSION)
+        self.s3.Object(bucket, key).put(Body=b"")
+        return "COMPLETE"
+
+    def counts(self) -> dict:
+        '''Jobs by status'''
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job["Status"]] = counts.get(job["Status"], 0) + 1
+            return counts
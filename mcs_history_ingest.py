@@ -5,14 +5,22 @@ import logging
 import math
 import os
 import re
+from collections import defaultdict
 
 from typing import List, Union
 
-from pymongo import MongoClient
+from pymongo import InsertOne, MongoClient, ReplaceOne
+from pymongo.errors import BulkWriteError
 import create_collection_keys
+import ingest_metrics
+import results_rollup
 
-from scorecard import Scorecard
-from mcs_ingest import copy_indexes, load_json_file, get_scene_collection
+from mcs_ingest import (
+    SceneCache,
+    copy_indexes,
+    load_json_file,
+    get_scene_collection
+)
 
 HISTORY_MAPPING_INDEX = "history_mapping"
 SCENE_MAPPING_INDEX = "scenes_mapping"
@@ -106,6 +114,10 @@ PASSING_CELLS = {
 
 MAX_XY_VIOLATIONS = 50
 
+# Number of history documents buffered before a HistoryBulkWriter
+#   sends them to mongo
+DEFAULT_BULK_BATCH_SIZE = 50
+
 # Temporary Reorientation Scoring Variables
 # TODO:  Move scoring to MCS api
 DISTANCE_FROM_CORNER = 1.5
@@ -178,7 +190,11 @@ def update_agency_paired_history_item(
     collection_name = get_history_collection(db_string, client, history_item["eval"])
     collection = mongoDB[collection_name]
     logging.info(f"Updating Agency Pair {history_item['name']}")
-    collection.replace_one({"_id": history_item["_id"]}, history_item)
+    old_item = collection.find_one_and_replace(
+        {"_id": history_item["_id"]}, history_item)
+    if old_item is not None:
+        results_rollup.update_rollup(
+            mongoDB, collection_name, old_item, history_item)
 
 
 def process_score(
@@ -249,22 +265,24 @@ def process_score(
     history_item["score"]["weighted_confidence"] = weighted_confidence
 
     # Agency Scoring Check
-    # Get Paired Agency Task
-    if history_item["test_type"] == "agents":
-        paired_history_item = return_agency_paired_history_item(
-            client, db_string, history_item)
-        # Only attempt pair scoring if the other pair item has already 
-        #   been ingested
-        if paired_history_item:
-            # Determine which pair item is correct (1), the correct pair
-            #   item should have a higher classification to be correct
-            if paired_history_item["score"]["ground_truth"] == 1:
-                update_agency_scoring(paired_history_item, history_item)
-            else:
-                update_agency_scoring(history_item, paired_history_item)
-
-            update_agency_paired_history_item(
-                client, db_string, paired_history_item)
+    # Get Paired Agency Task (offline ingest pairs items itself, so
+    #   there is no client to look the pair up with)
+    if history_item["test_type"] == "agents" and client is not None:
+        with ingest_metrics.stage("pair_scoring"):
+            paired_history_item = return_agency_paired_history_item(
+                client, db_string, history_item)
+            # Only attempt pair scoring if the other pair item has already
+            #   been ingested
+            if paired_history_item:
+                # Determine which pair item is correct (1), the correct pair
+                #   item should have a higher classification to be correct
+                if paired_history_item["score"]["ground_truth"] == 1:
+                    update_agency_scoring(paired_history_item, history_item)
+                else:
+                    update_agency_scoring(history_item, paired_history_item)
+
+                update_agency_paired_history_item(
+                    client, db_string, paired_history_item)
 
     return history_item["score"]
 
@@ -288,13 +306,14 @@ def build_history_item(
     history_file: str,
     folder: str,
     client: MongoClient,
-    db_string: str
+    db_string: str,
+    scene_cache: SceneCache = None
 ) -> dict:
     logging.info(f"Ingest history file: {history_file}")
-    mongoDB = client[db_string]
 
     # Create History Object and add basic information
-    history = load_json_file(folder, history_file)
+    with ingest_metrics.stage("json_parse"):
+        history = load_json_file(folder, history_file)
 
     history_item = {
         'eval': determine_evaluation_hist_name(
@@ -315,10 +334,16 @@ def build_history_item(
     scene_rec_name = determine_evaluation_scene_name(
         history["info"]["evaluation_name"]
     )
-    collection_name = get_scene_collection(db_string, client, scene_rec_name)
-    collection = mongoDB[collection_name]
-    scene = collection.find_one(
-        {"name": history_item["name"], "eval": scene_rec_name})
+    with ingest_metrics.stage("scene_fetch"):
+        if scene_cache is not None:
+            scene = scene_cache.find_scene(
+                db_string, client, scene_rec_name, history_item["name"])
+        else:
+            collection_name = get_scene_collection(
+                db_string, client, scene_rec_name)
+            collection = client[db_string][collection_name]
+            scene = collection.find_one(
+                {"name": history_item["name"], "eval": scene_rec_name})
 
     # This variable will override any rewards for a reorientation task
     #    should the agent visit a corner it should not be at
@@ -340,24 +365,25 @@ def build_history_item(
     interactive_goal_achieved = 0
     interactive_reward = 0
 
-    for step in history["steps"]:
-        number_steps += 1
-        (
-            new_step,
-            interactive_reward,
-            interactive_goal_achieved,
-            corner_visit_order
-        ) = build_new_step_obj(
-            step,
-            interactive_reward,
-            interactive_goal_achieved,
-            number_steps,
-            incorrect_corners,
-            correct_corners,
-            corner_visit_order,
-            reorientation_scoring_override
-            )
-        steps.append(new_step)
+    with ingest_metrics.stage("step_projection"):
+        for step in history["steps"]:
+            number_steps += 1
+            (
+                new_step,
+                interactive_reward,
+                interactive_goal_achieved,
+                corner_visit_order
+            ) = build_new_step_obj(
+                step,
+                interactive_reward,
+                interactive_goal_achieved,
+                number_steps,
+                incorrect_corners,
+                correct_corners,
+                corner_visit_order,
+                reorientation_scoring_override
+                )
+            steps.append(new_step)
 
     history_item["steps"] = steps
     history_item["step_counter"] = number_steps
@@ -432,19 +458,21 @@ def build_history_item(
         history_item["domain_type"] = scene[
             "goal"]["sceneInfo"]["domainType"]
 
-        history_item["score"] = process_score(
-            history_item,
-            scene,
-            interactive_goal_achieved,
-            interactive_reward,
-            corner_visit_order,
-            reorientation_scoring_override,
-            client,
-            db_string)
-        history_item["score"]["scorecard"] = (
-            calc_scorecard(history, scene)
-            if history_item['category'] == 'interactive' else None
-        )
+        with ingest_metrics.stage("score"):
+            history_item["score"] = process_score(
+                history_item,
+                scene,
+                interactive_goal_achieved,
+                interactive_reward,
+                corner_visit_order,
+                reorientation_scoring_override,
+                client,
+                db_string)
+        with ingest_metrics.stage("scorecard"):
+            history_item["score"]["scorecard"] = (
+                calc_scorecard(history, scene)
+                if history_item['category'] == 'interactive' else None
+            )
 
         return history_item
 
@@ -594,52 +622,268 @@ def add_weighted_cube_scoring(history_item: dict, scene: dict) -> tuple:
     return (0,0,0)
 
   
+def history_item_key(history_item: dict) -> tuple:
+    """Fields that identify a single history document in a collection"""
+    return (
+        history_item["name"],
+        history_item["eval"],
+        history_item["performer"],
+        history_item["metadata"]
+    )
+
+
+class HistoryBulkWriter:
+    """Buffer history inserts/replacements and send them with one
+    bulk_write per collection instead of one round trip per document.
+
+    Work that depends on documents being in the collection (copying
+    indexes into a new collection and building the collection keys) is
+    done when the buffer is flushed.  Agency pair scoring cannot see
+    buffered documents, so callers should run rescore_agency_pairs on
+    the agent items once everything is flushed.
+
+    The results rollup is updated for the items that were written.
+
+    A failed bulk write does not raise, the fullFilename of every item
+    that was not written is added to failed_files instead."""
+
+    def __init__(
+            self,
+            client: MongoClient,
+            db_string: str,
+            batch_size: int = DEFAULT_BULK_BATCH_SIZE):
+        self.client = client
+        self.db_string = db_string
+        self.batch_size = batch_size
+        self.pending = defaultdict(list)
+        self.pending_files = defaultdict(list)
+        self.pending_keys = defaultdict(set)
+        self.pending_rollups = defaultdict(list)
+        self.collection_evals = defaultdict(set)
+        self.flushed_collections = set()
+        self.written = 0
+        self.failed_files = []
+
+    def insert(self, collection_name: str, history_item: dict) -> None:
+        self._add(
+            collection_name, history_item, InsertOne(history_item), None)
+
+    def replace(
+            self,
+            collection_name: str,
+            old_item: dict,
+            history_item: dict) -> None:
+        self._add(
+            collection_name,
+            history_item,
+            ReplaceOne({"_id": old_item["_id"]}, history_item),
+            old_item)
+
+    def flush_if_pending(
+            self,
+            collection_name: str,
+            history_item: dict) -> None:
+        """Flush first if a version of this history item is still buffered,
+        so the existence check sees it and does not insert it twice."""
+        if history_item_key(history_item) in self.pending_keys[
+                collection_name]:
+            self.flush_collection(collection_name)
+
+    def flush(self) -> None:
+        for collection_name in list(self.pending):
+            self.flush_collection(collection_name)
+
+    def flush_collection(self, collection_name: str) -> None:
+        operations = self.pending.pop(collection_name, [])
+        files = self.pending_files.pop(collection_name, [])
+        rollups = self.pending_rollups.pop(collection_name, [])
+        self.pending_keys.pop(collection_name, None)
+        if not operations:
+            return
+
+        mongoDB = self.client[self.db_string]
+        collection = mongoDB[collection_name]
+        try:
+            new_collection = (
+                collection_name not in self.flushed_collections and
+                collection.estimated_document_count() == 0)
+            collection.bulk_write(operations, ordered=True)
+        except BulkWriteError as e:
+            # Ordered writes stop at the first error
+            first_error = e.details["writeErrors"][0]["index"]
+            logging.exception(f"Bulk write to {collection_name} failed")
+            self.written += first_error
+            self.failed_files.extend(files[first_error:])
+            self.update_rollup(collection_name, rollups[:first_error])
+            return
+        except Exception:
+            logging.exception(f"Bulk write to {collection_name} failed")
+            self.failed_files.extend(files)
+            return
+        self.written += len(operations)
+        self.flushed_collections.add(collection_name)
+        self.update_rollup(collection_name, rollups)
+        logging.info(
+            f"Wrote {len(operations)} history items to {collection_name}")
+
+        if new_collection:
+            copy_indexes(
+                self.db_string,
+                self.client,
+                collection_name,
+                HISTORY_MAPPING_INDEX)
+
+        # Add Keys when a list of keys doesn't exist
+        for eval_name in self.collection_evals[collection_name]:
+            if create_collection_keys.check_collection_has_key(
+                    eval_name, mongoDB) is None:
+                create_collection_keys.find_collection_keys(
+                    collection_name, eval_name, mongoDB)
+
+    def update_rollup(self, collection_name: str, rollups: List[tuple]):
+        changes = []
+        for old_item, history_item in rollups:
+            changes.extend(results_rollup.rollup_changes(
+                collection_name, old_item, history_item))
+        results_rollup.apply_rollup_changes(
+            self.client[self.db_string], changes)
+
+    def _add(
+            self,
+            collection_name: str,
+            history_item: dict,
+            operation,
+            old_item: dict):
+        self.pending[collection_name].append(operation)
+        self.pending_rollups[collection_name].append(
+            (old_item, history_item))
+        self.pending_files[collection_name].append(
+            history_item["fullFilename"])
+        self.pending_keys[collection_name].add(
+            history_item_key(history_item))
+        self.collection_evals[collection_name].add(history_item["eval"])
+        if len(self.pending[collection_name]) >= self.batch_size:
+            self.flush_collection(collection_name)
+
+
 def automated_history_ingest_file(
         history_file: str,
         folder: str,
         db_string: str,
-        client: MongoClient) -> None:
+        client: MongoClient,
+        scene_cache: SceneCache = None,
+        writer: HistoryBulkWriter = None) -> dict:
     mongoDB = client[db_string]
 
     history_item = build_history_item(
-        history_file, folder, client, db_string)
+        history_file, folder, client, db_string, scene_cache)
     collection_name = get_history_collection(db_string, client, history_item["eval"])
 
     collection = mongoDB[collection_name]
-    total_documents = collection.count_documents({})
-    if total_documents == 1:
-        copy_indexes(db_string, client, collection_name, HISTORY_MAPPING_INDEX)
+    if writer is None:
+        total_documents = collection.count_documents({})
+        if total_documents == 1:
+            copy_indexes(db_string, client, collection_name, HISTORY_MAPPING_INDEX)
+    else:
+        writer.flush_if_pending(collection_name, history_item)
+
+    with ingest_metrics.stage("insert"):
+        check_exists = collection.find(
+            {
+                "name": history_item["name"],
+                "eval": history_item["eval"],
+                "performer": history_item["performer"],
+                "metadata": history_item["metadata"]
+            }
+        )
 
-    check_exists = collection.find(
-        {
-            "name": history_item["name"],
-            "eval": history_item["eval"],
-            "performer": history_item["performer"],
-            "metadata": history_item["metadata"]
-        }
-    )
+        matched_files = list(check_exists)
 
-    matched_files = list(check_exists)
+        if len(matched_files) == 0:
+            logging.info(f"Inserting {history_item['name']}")
+            if writer is None:
+                collection.insert_one(history_item)
+                results_rollup.update_rollup(
+                    mongoDB, collection_name, None, history_item)
+            else:
+                writer.insert(collection_name, history_item)
+        else:
+            for item in matched_files:
+                if history_item["fileTimestamp"] > item["fileTimestamp"]:
+                    logging.info(f"Updating {history_item['name']}")
+                    if writer is None:
+                        collection.replace_one(
+                            {"_id": item["_id"]}, history_item)
+                        results_rollup.update_rollup(
+                            mongoDB, collection_name, item, history_item)
+                    else:
+                        writer.replace(collection_name, item, history_item)
+
+    # The writer adds the keys once the items are in the collection
+    if writer is None:
+        # Add Keys when a list of keys doesn't exist
+        with ingest_metrics.stage("collection_keys"):
+            if create_collection_keys.check_collection_has_key(
+                    history_item["eval"], mongoDB) is None:
+                create_collection_keys.find_collection_keys(
+                    collection_name, history_item["eval"], mongoDB)
+
+    return history_item
+
+
+def rescore_agency_pairs(
+        client: MongoClient,
+        db_string: str,
+        collection_name: str,
+        history_keys: List[tuple]) -> int:
+    """Redo agency pair scoring for the given history items (see
+    history_item_key), for when both items of a pair were ingested
+    without seeing each other (bulk or parallel ingest).  Returns
+    the number of pairs scored."""
+    collection = client[db_string][collection_name]
+    scored_ids = set()
+    pairs = 0
+    for name, eval_name, performer, metadata in history_keys:
+        history_item = collection.find_one({
+            "name": name,
+            "eval": eval_name,
+            "performer": performer,
+            "metadata": metadata
+        })
+        if history_item is None or history_item["_id"] in scored_ids:
+            continue
 
-    if len(matched_files) == 0:
-        logging.info(f"Inserting {history_item['name']}")
-        collection.insert_one(history_item)
-    else:
-        for item in matched_files:
-            if history_item["fileTimestamp"] > item["fileTimestamp"]:
-                logging.info(f"Updating {history_item['name']}")
-                collection.replace_one({"_id": item["_id"]}, history_item)
+        paired_history_item = return_agency_paired_history_item(
+            client, db_string, history_item)
+        if not paired_history_item:
+            continue
+
+        if paired_history_item["score"]["ground_truth"] == 1:
+            update_agency_scoring(paired_history_item, history_item)
+        else:
+            update_agency_scoring(history_item, paired_history_item)
 
-    # Add Keys when a list of keys doesn't exist
-    if create_collection_keys.check_collection_has_key(
-            history_item["eval"], mongoDB) is None:
-        create_collection_keys.find_collection_keys(
-            collection_name, history_item["eval"], mongoDB)
+        old_item = collection.find_one_and_replace(
+            {"_id": history_item["_id"]}, history_item)
+        if old_item is not None:
+            results_rollup.update_rollup(
+                client[db_string], collection_name, old_item, history_item)
+        update_agency_paired_history_item(
+            client, db_string, paired_history_item)
+        scored_ids.update([history_item["_id"], paired_history_item["_id"]])
+        pairs += 1
+    return pairs
 
 
 def calc_scorecard(history_item: dict, scene: dict) -> dict:
+    # Imported here so only ingests that score interactive scenes pay
+    #   for loading the scorecard
+    from scorecard import Scorecard
+
     scorecard = Scorecard(history_item, scene)
-    return scorecard.score_all()
+    scores = scorecard.score_all()
+    ingest_metrics.observe_scorecard(scorecard.metric_timings)
+    return scores
 
 
 def calculate_reorientation_true_score(
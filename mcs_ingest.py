@@ -2,12 +2,16 @@ import io
 import json
 import os
 import re
+from collections import OrderedDict
 
 from pymongo import MongoClient
 
 SCENE_MAPPING_INDEX = "scenes_mapping"
 HISTORY_MAPPING_INDEX = "history_mapping"
 
+# Scene documents are large, so only keep this many in a SceneCache
+DEFAULT_SCENE_CACHE_SIZE = 256
+
 def copy_indexes(db_string: str,
         client: MongoClient,
         new_collection_name: str,
@@ -26,12 +30,14 @@ def copy_indexes(db_string: str,
         return
 
     # Get the collection for the current eval using new name
-    # Copy the indexes one by one to new collection from last eval
+    # Copy the indexes one by one to new collection from last eval,
+    #   with every field of the compound ones
     new_collection = mongoDB[new_collection_name]
     indexes_to_copy = old_collection.index_information()
     for key in indexes_to_copy:
-        index_tuple = indexes_to_copy[key]["key"][0]
-        new_collection.create_index([(index_tuple[0], int(index_tuple[1]))])
+        new_collection.create_index([
+            (field, int(direction))
+            for field, direction in indexes_to_copy[key]["key"]])
 
 
 def get_scene_collection(
@@ -60,6 +66,53 @@ def get_scene_collection(
         return mapping["collection"]
 
 
+class SceneCache:
+    """Remember scene documents (and the eval to scene collection
+    mapping) between history files, so ingesting a folder does not query
+    the scenes_mapping and scene collections again for every file.
+    Holds at most max_size scenes, least recently used are dropped."""
+
+    def __init__(self, max_size: int = DEFAULT_SCENE_CACHE_SIZE):
+        self.max_size = max_size
+        self.collections = {}
+        self.scenes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_scene_collection(
+            self,
+            db_string: str,
+            client: MongoClient,
+            eval_name: str) -> str:
+        key = (db_string, eval_name)
+        if key not in self.collections:
+            self.collections[key] = get_scene_collection(
+                db_string, client, eval_name)
+        return self.collections[key]
+
+    def find_scene(
+            self,
+            db_string: str,
+            client: MongoClient,
+            eval_name: str,
+            scene_name: str) -> dict:
+        key = (db_string, eval_name, scene_name)
+        if key in self.scenes:
+            self.hits += 1
+            self.scenes.move_to_end(key)
+            return self.scenes[key]
+
+        self.misses += 1
+        collection_name = self.get_scene_collection(
+            db_string, client, eval_name)
+        scene = client[db_string][collection_name].find_one(
+            {"name": scene_name, "eval": eval_name})
+        self.scenes[key] = scene
+        if len(self.scenes) > self.max_size:
+            self.scenes.popitem(last=False)
+        return scene
+
+
 def load_json_file(folder: str, file_name: str) -> dict:
     """Read in a json file and decode into a dict.  Can
     be used for history, scene, or other json files."""
@@ -0,0 +1,236 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+from typing import List
+
+from pymongo.errors import DuplicateKeyError
+
+"""
+Ledger of the MediaConvert jobs submitted for uploaded videos, keyed by
+the video's bucket, key and ETag.  The converter claims a video in the
+ledger before creating its job, so a redelivered SQS message (or a second
+converter) skips videos that already have a job instead of paying to
+transcode them again.  Videos whose submission failed, or whose job ended
+in error, can be claimed again.  A claim whose converter stopped before
+its job was created stays in flight until it times out, then it can be
+claimed again too.  The ledger is a Mongo collection, or a SQLite file
+for running the converter locally.
+
+"""
+LEDGER_COLLECTION = "media_convert_jobs"
+
+# Statuses, the last four are MediaConvert's own job statuses
+SUBMITTING = "SUBMITTING"
+FAILED = "FAILED"
+SUBMITTED = "SUBMITTED"
+PROGRESSING = "PROGRESSING"
+COMPLETE = "COMPLETE"
+ERROR = "ERROR"
+CANCELED = "CANCELED"
+
+# Jobs still to finish
+BACKLOG_STATUSES = [SUBMITTING, SUBMITTED, PROGRESSING]
+# Jobs whose status is looked up from MediaConvert
+ACTIVE_STATUSES = [SUBMITTED, PROGRESSING]
+# Videos that can be claimed and submitted again
+RETRY_STATUSES = [FAILED, ERROR, CANCELED]
+FINISHED_STATUSES = [COMPLETE, ERROR, CANCELED]
+
+# A claim with no job after this long was left by a converter that
+#   stopped mid submission, so the video can be claimed again
+CLAIM_TIMEOUT_SECONDS = 15 * 60
+
+
+def ledger_key(bucket: str, key: str, etag: str) -> str:
+    return hashlib.sha256(
+        f"{bucket}/{key}/{(etag or '').strip(chr(34))}".encode()).hexdigest()
+
+
+def request_token(key: str, retries: int) -> str:
+    '''The job's ClientRequestToken, so MediaConvert itself will not
+    create a second job for the same submission.  It is the ledger key
+    until a failed, errored or canceled job is retried, and then a new
+    token for each retry, or MediaConvert would return the old job.  A
+    reclaimed stale claim keeps its token, in case its job was created.'''
+    if not retries:
+        return key
+    return hashlib.sha256(f"{key}/{retries}".encode()).hexdigest()
+
+
+class MongoLedger:
+    def __init__(self, mongoDB, collection: str = LEDGER_COLLECTION):
+        self.collection = mongoDB[collection]
+        self.collection.create_index("status")
+
+    def claim(self, entry: dict) -> bool:
+        '''Record that the video in entry (its key, bucket, object_key,
+        etag and eval) is being submitted, returns False when another
+        submission already has it'''
+        now = time.time()
+        try:
+            self.collection.insert_one(dict(
+                entry, _id=entry["key"], status=SUBMITTING, claimed_at=now,
+                attempts=1, retries=0))
+            return True
+        except DuplicateKeyError:
+            pass
+        result = self.collection.update_one(
+            {"_id": entry["key"], "status": {"$in": RETRY_STATUSES}},
+            {"$set": {"status": SUBMITTING, "claimed_at": now},
+             "$inc": {"attempts": 1, "retries": 1}})
+        if result.modified_count == 1:
+            return True
+        result = self.collection.update_one(
+            {"_id": entry["key"], "status": SUBMITTING,
+             "claimed_at": {"$lt": now - CLAIM_TIMEOUT_SECONDS}},
+            {"$set": {"claimed_at": now}, "$inc": {"attempts": 1}})
+        return result.modified_count == 1
+
+    def entry(self, key: str) -> dict:
+        '''The video's status and retries, None if it is not in the
+        ledger'''
+        return self.collection.find_one(
+            {"_id": key}, {"_id": 0, "status": 1, "retries": 1})
+
+    def submitted(self, key: str, job_id: str) -> None:
+        self.collection.update_one({"_id": key}, {"$set": {
+            "status": SUBMITTED, "job_id": job_id,
+            "submitted_at": time.time()}})
+
+    def failed(self, key: str, error: str) -> None:
+        self.collection.update_one(
+            {"_id": key}, {"$set": {"status": FAILED, "error": error}})
+
+    def update_status(self, key: str, status: str) -> None:
+        fields = {"status": status}
+        if status in FINISHED_STATUSES:
+            fields["finished_at"] = time.time()
+        self.collection.update_one({"_id": key}, {"$set": fields})
+
+    def active_jobs(self) -> List[dict]:
+        return list(self.collection.find(
+            {"status": {"$in": ACTIVE_STATUSES}},
+            {"key": 1, "job_id": 1, "message_type": 1}))
+
+    def backlog(self) -> dict:
+        '''Videos still to convert by status'''
+        return {
+            result["_id"]: result["count"]
+            for result in self.collection.aggregate([
+                {"$match": {"status": {"$in": BACKLOG_STATUSES}}},
+                {"$group": {"_id": "$status", "count": {"$sum": 1}}}])}
+
+    def throughput(self, since: float) -> dict:
+        '''Videos converted since the given time by eval'''
+        return {
+            result["_id"]: result["count"]
+            for result in self.collection.aggregate([
+                {"$match": {
+                    "status": COMPLETE, "finished_at": {"$gte": since}}},
+                {"$group": {"_id": "$eval", "count": {"$sum": 1}}}])}
+
+
+class SqliteLedger:
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "key TEXT PRIMARY KEY, bucket TEXT, object_key TEXT, "
+                "etag TEXT, eval TEXT, message_type TEXT, status TEXT, "
+                "job_id TEXT, error TEXT, attempts INTEGER, retries INTEGER, "
+                "claimed_at REAL, submitted_at REAL, finished_at REAL)")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    def execute(self, sql: str, parameters: tuple = ()) -> sqlite3.Cursor:
+        with self.lock, self.connection:
+            return self.connection.execute(sql, parameters)
+
+    def claim(self, entry: dict) -> bool:
+        now = time.time()
+        cursor = self.execute(
+            "INSERT OR IGNORE INTO jobs (key, bucket, object_key, etag, "
+            "eval, message_type, status, attempts, retries, claimed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 1, 0, ?)",
+            (entry["key"], entry["bucket"], entry["object_key"],
+             entry["etag"], entry["eval"], entry.get("message_type"),
+             SUBMITTING, now))
+        if cursor.rowcount == 1:
+            return True
+        retry = ", ".join("?" * len(RETRY_STATUSES))
+        cursor = self.execute(
+            "UPDATE jobs SET status = ?, claimed_at = ?, "
+            "attempts = attempts + 1, retries = retries + 1 "
+            f"WHERE key = ? AND status IN ({retry})",
+            (SUBMITTING, now, entry["key"], *RETRY_STATUSES))
+        if cursor.rowcount == 1:
+            return True
+        cursor = self.execute(
+            "UPDATE jobs SET claimed_at = ?, attempts = attempts + 1 "
+            "WHERE key = ? AND status = ? AND claimed_at < ?",
+            (now, entry["key"], SUBMITTING, now - CLAIM_TIMEOUT_SECONDS))
+        return cursor.rowcount == 1
+
+    def entry(self, key: str) -> dict:
+        row = self.execute(
+            "SELECT status, retries FROM jobs WHERE key = ?",
+            (key,)).fetchone()
+        if row is None:
+            return None
+        return {"status": row[0], "retries": row[1]}
+
+    def submitted(self, key: str, job_id: str) -> None:
+        self.execute(
+            "UPDATE jobs SET status = ?, job_id = ?, submitted_at = ? "
+            "WHERE key = ?", (SUBMITTED, job_id, time.time(), key))
+
+    def failed(self, key: str, error: str) -> None:
+        self.execute(
+            "UPDATE jobs SET status = ?, error = ? WHERE key = ?",
+            (FAILED, error, key))
+
+    def update_status(self, key: str, status: str) -> None:
+        finished_at = time.time() if status in FINISHED_STATUSES else None
+        self.execute(
+            "UPDATE jobs SET status = ?, "
+            "finished_at = COALESCE(?, finished_at) WHERE key = ?",
+            (status, finished_at, key))
+
+    def active_jobs(self) -> List[dict]:
+        active = ", ".join("?" * len(ACTIVE_STATUSES))
+        rows = self.execute(
+            "SELECT key, job_id, message_type FROM jobs "
+            f"WHERE status IN ({active})", tuple(ACTIVE_STATUSES))
+        return [
+            {"key": key, "job_id": job_id, "message_type": message_type}
+            for key, job_id, message_type in rows.fetchall()]
+
+    def backlog(self) -> dict:
+        backlog = ", ".join("?" * len(BACKLOG_STATUSES))
+        rows = self.execute(
+            "SELECT status, COUNT(*) FROM jobs "
+            f"WHERE status IN ({backlog}) GROUP BY status",
+            tuple(BACKLOG_STATUSES))
+        return dict(rows.fetchall())
+
+    def throughput(self, since: float) -> dict:
+        rows = self.execute(
+            "SELECT eval, COUNT(*) FROM jobs WHERE status = ? AND "
+            "finished_at >= ? GROUP BY eval", (COMPLETE, since))
+        return dict(rows.fetchall())
+
+
+def report(ledger, hours: float = 1) -> dict:
+    since = time.time() - hours * 3600
+    throughput = ledger.throughput(since)
+    return {
+        "backlog": ledger.backlog(),
+        "converted": throughput,
+        "per_hour": {
+            eval_number: round(count / hours, 1)
+            for eval_number, count in throughput.items()}
+    }
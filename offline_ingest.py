@@ -0,0 +1,318 @@
+import argparse
+import json
+import logging
+import os
+import time
+
+from typing import Iterator, List
+
+import mcs_history_ingest
+import mcs_scene_ingest
+
+"""
+Score history files without MongoDB.  Scenes are read from a folder into
+memory and the history documents are streamed to a JSONL or Parquet file
+instead of being inserted into the database.
+
+"""
+OUTPUT_FORMATS = ["jsonl", "parquet"]
+DEFAULT_PARQUET_ROW_GROUP = 500
+
+# Top level history fields written as Parquet columns, anything nested
+#   (steps, scorecard, etc.) is written as a JSON string column
+PARQUET_COLUMNS = {
+    "name": "string",
+    "eval": "string",
+    "evalNumber": "int64",
+    "performer": "string",
+    "metadata": "string",
+    "fullFilename": "string",
+    "fileTimestamp": "string",
+    "scene_num": "int64",
+    "test_num": "int64",
+    "scene_goal_id": "string",
+    "test_type": "string",
+    "category": "string",
+    "category_type": "string",
+    "domain_type": "string",
+    "hasNovelty": "bool",
+    "step_counter": "int64",
+    "target_is_visible_at_start": "bool",
+    "start_distance_between_performer_and_target": "float64"
+}
+PARQUET_SCORE_COLUMNS = {
+    "classification": "string",
+    "confidence": "string",
+    "score": "int64",
+    "score_description": "string",
+    "ground_truth": "int64",
+    "goal_achieved": "int64",
+    "reward": "float64",
+    "weighted_score": "float64",
+    "weighted_score_worth": "float64",
+    "weighted_confidence": "float64"
+}
+PARQUET_JSON_COLUMNS = ["slices", "corner_visit_order", "steps", "scorecard"]
+
+
+class SceneIndex:
+    '''In memory replacement for the scene collections, keyed by
+    (eval, name).  Has the same find_scene signature as SceneCache so
+    it can be passed to build_history_item.'''
+
+    def __init__(self):
+        self.scenes = {}
+
+    def add_folder(self, folder: str) -> int:
+        scene_files = [
+            f for f in os.listdir(folder)
+            if f.endswith(mcs_scene_ingest.SCENE_DEBUG_EXTENSION)]
+        scene_files.sort()
+        for scene_file in scene_files:
+            scene = mcs_scene_ingest.build_scene_item(scene_file, folder)
+            self.scenes[(scene["eval"], scene["name"])] = scene
+        return len(scene_files)
+
+    def find_scene(
+            self,
+            db_string: str,
+            client,
+            eval_name: str,
+            scene_name: str) -> dict:
+        return self.scenes.get((eval_name, scene_name))
+
+
+def agency_pair_key(history_item: dict) -> tuple:
+    '''Same fields return_agency_paired_history_item matches on.'''
+    return (
+        history_item["eval"],
+        history_item["category_type"],
+        history_item["performer"],
+        history_item["test_num"],
+        history_item["metadata"]
+    )
+
+
+class AgencyPairer:
+    '''Holds agency history items until the other item of their pair
+    has been scored, then applies update_agency_scoring to both.'''
+
+    def __init__(self):
+        self.waiting = {}
+        self.pairs = 0
+
+    def add(self, history_item: dict) -> List[dict]:
+        '''Returns the history items that are ready to be written.'''
+        if history_item.get("test_type") != "agents":
+            return [history_item]
+
+        pair_key = agency_pair_key(history_item)
+        paired_scene_num = 2 if history_item["scene_num"] == 1 else 1
+        paired_history_item = self.waiting.pop(
+            pair_key + (paired_scene_num,), None)
+        if paired_history_item is None:
+            self.waiting[pair_key + (history_item["scene_num"],)] = (
+                history_item)
+            return []
+
+        if paired_history_item["score"]["ground_truth"] == 1:
+            mcs_history_ingest.update_agency_scoring(
+                paired_history_item, history_item)
+        else:
+            mcs_history_ingest.update_agency_scoring(
+                history_item, paired_history_item)
+        self.pairs += 1
+        return [paired_history_item, history_item]
+
+    def unpaired(self) -> List[dict]:
+        history_items = list(self.waiting.values())
+        self.waiting = {}
+        return history_items
+
+
+class JsonlWriter:
+    def __init__(self, output: str):
+        self.file = open(output, 'w')
+
+    def write(self, history_items: List[dict]) -> None:
+        for history_item in history_items:
+            self.file.write(json.dumps(history_item, default=str))
+            self.file.write("\n")
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class ParquetWriter:
+    '''Writes history items to Parquet in row groups using a fixed schema,
+    so files from different runs can be read together.'''
+
+    def __init__(
+            self,
+            output: str,
+            row_group_size: int = DEFAULT_PARQUET_ROW_GROUP):
+        # pyarrow is only needed for this output format
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as error:
+            raise ImportError(
+                "Parquet output requires pyarrow, "
+                "install it with: pip install pyarrow") from error
+
+        self.pyarrow = pyarrow
+        fields = (
+            [(column, column_type)
+             for column, column_type in PARQUET_COLUMNS.items()] +
+            [("score_" + column, column_type)
+             for column, column_type in PARQUET_SCORE_COLUMNS.items()] +
+            [(column, "string") for column in PARQUET_JSON_COLUMNS])
+        self.schema = pyarrow.schema([
+            (column, pyarrow.type_for_alias(column_type))
+            for column, column_type in fields])
+        self.writer = pyarrow.parquet.ParquetWriter(output, self.schema)
+        self.row_group_size = row_group_size
+        self.rows = []
+
+    def write(self, history_items: List[dict]) -> None:
+        self.rows.extend(
+            history_item_to_row(history_item)
+            for history_item in history_items)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.rows:
+            return
+        table = self.pyarrow.Table.from_pylist(self.rows, schema=self.schema)
+        self.writer.write_table(table)
+        self.rows = []
+
+    def close(self) -> None:
+        self.flush()
+        self.writer.close()
+
+
+def convert_value(value, column_type: str):
+    if value is None:
+        return None
+    if column_type == "string":
+        return str(value)
+    try:
+        if column_type == "int64":
+            return int(value)
+        if column_type == "float64":
+            return float(value)
+    except (TypeError, ValueError):
+        return None
+    return bool(value)
+
+
+def history_item_to_row(history_item: dict) -> dict:
+    row = {
+        column: convert_value(history_item.get(column), column_type)
+        for column, column_type in PARQUET_COLUMNS.items()
+    }
+    score = history_item.get("score") or {}
+    for column, column_type in PARQUET_SCORE_COLUMNS.items():
+        row["score_" + column] = convert_value(score.get(column), column_type)
+    row["scorecard"] = json.dumps(score.get("scorecard"), default=str)
+    for column in ["slices", "corner_visit_order", "steps"]:
+        row[column] = json.dumps(history_item.get(column), default=str)
+    return row
+
+
+def create_writer(output: str, output_format: str):
+    if output_format == "parquet":
+        return ParquetWriter(output)
+    return JsonlWriter(output)
+
+
+def build_history_items(
+        folder: str,
+        scene_index: SceneIndex,
+        failed: List[dict]) -> Iterator[dict]:
+    history_files = [f for f in os.listdir(folder) if f.endswith(".json")]
+    history_files.sort()
+    for history_file in history_files:
+        try:
+            history_item = mcs_history_ingest.build_history_item(
+                history_file, folder, None, None, scene_index)
+        except Exception as error:
+            logging.exception(f"Failed to score {history_file}")
+            failed.append({"file": history_file, "error": repr(error)})
+            continue
+        yield history_item
+
+
+def offline_ingest(
+        scene_folder: str,
+        history_folder: str,
+        output: str,
+        output_format: str = "jsonl") -> dict:
+    start = time.perf_counter()
+    scene_index = SceneIndex()
+    scenes = scene_index.add_folder(scene_folder)
+
+    pairer = AgencyPairer()
+    writer = create_writer(output, output_format)
+    failed = []
+    written = 0
+    try:
+        for history_item in build_history_items(
+                history_folder, scene_index, failed):
+            ready = pairer.add(history_item)
+            writer.write(ready)
+            written += len(ready)
+        unpaired = pairer.unpaired()
+        writer.write(unpaired)
+        written += len(unpaired)
+    finally:
+        writer.close()
+
+    return {
+        "scenes": scenes,
+        "written": written,
+        "agency_pairs": pairer.pairs,
+        "failed": failed,
+        "seconds": round(time.perf_counter() - start, 2)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Score MCS History JSON files to a JSONL or Parquet file')
+    parser.add_argument(
+        '--scene-folder',
+        required=True,
+        help='Folder location of the scene debug files')
+    parser.add_argument(
+        '--history-folder',
+        required=True,
+        help='Folder location of the history files')
+    parser.add_argument(
+        '--output',
+        required=True,
+        help='File to write the history documents to')
+    parser.add_argument(
+        '--format',
+        choices=OUTPUT_FORMATS,
+        default="jsonl",
+        help='Output format, parquet requires pyarrow')
+
+    args = parser.parse_args()
+
+    summary = offline_ingest(
+        args.scene_folder, args.history_folder, args.output, args.format)
+    print(f"Wrote {summary['written']} history documents to {args.output} "
+          f"from {summary['scenes']} scenes in {summary['seconds']}s "
+          f"({summary['agency_pairs']} agency pairs scored)")
+    for item in summary["failed"]:
+        print(f"  failed {item['file']}: {item['error']}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    main()
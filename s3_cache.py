@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+"""
+Local disk cache of S3 objects, shared by the migration scripts and the
+ingest daemon so the same history and scene files are not pulled from S3
+on every run.  Files are stored under a hash of bucket/key/ETag, so a
+changed object is a new cache entry and a cached file is never stale.
+The least recently used files are evicted once the cache is over its
+size limit.  Switched on by setting MCS_S3_CACHE_DIR.
+
+"""
+CACHE_DIR_ENV = "MCS_S3_CACHE_DIR"
+CACHE_MAX_MB_ENV = "MCS_S3_CACHE_MAX_MB"
+DEFAULT_MAX_MB = 5 * 1024
+
+# Evict down to this fraction of the limit, so eviction (which scans the
+#   whole cache) does not run on every download once the cache is full
+EVICT_TO = 0.9
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class S3Cache:
+    def __init__(self, cache_dir: str, s3_client, max_bytes: int = None):
+        self.cache_dir = cache_dir
+        self.s3_client = s3_client
+        self.max_bytes = (
+            max_bytes if max_bytes is not None
+            else DEFAULT_MAX_MB * 1024 * 1024)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.size = sum(size for _, _, size in self.cached_files())
+
+    def cache_path(self, bucket: str, key: str, etag: str) -> str:
+        digest = hashlib.sha256(
+            f"{bucket}/{key}/{etag}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def get_etag(self, bucket: str, key: str) -> str:
+        response = self.s3_client.head_object(Bucket=bucket, Key=key)
+        return response["ETag"].strip('"')
+
+    def get_path(self, bucket: str, key: str, etag: str = None) -> str:
+        '''Path of the cached copy of the object, downloading it if it is
+        not cached.  S3 event notifications include the ETag, pass it to
+        save a HEAD request.'''
+        if etag is None:
+            etag = self.get_etag(bucket, key)
+        path = self.cache_path(bucket, key, etag.strip('"'))
+        if os.path.exists(path):
+            # The modified time orders the files for eviction
+            os.utime(path)
+            with self.lock:
+                self.hits += 1
+            return path
+
+        with self.lock:
+            self.misses += 1
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        response = self.s3_client.get_object(
+            Bucket=bucket, Key=key, IfMatch=etag)
+        # Download to a temporary file and rename it into place, so other
+        #   threads and processes never see a partial file
+        handle, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(handle, 'wb') as temp_file:
+                for chunk in iter(
+                        lambda: response["Body"].read(CHUNK_SIZE), b""):
+                    temp_file.write(chunk)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        with self.lock:
+            self.size += size
+            over_limit = self.size > self.max_bytes
+        if over_limit:
+            self.evict()
+        return path
+
+    def read_json(self, bucket: str, key: str, etag: str = None) -> dict:
+        path = self.get_path(bucket, key, etag)
+        with open(path, encoding='utf-8-sig') as json_file:
+            return json.load(json_file)
+
+    def copy_to(
+            self,
+            bucket: str,
+            key: str,
+            destination: str,
+            etag: str = None) -> str:
+        '''Copy the object to destination, for code that works on (and
+        then deletes) a local file'''
+        shutil.copyfile(self.get_path(bucket, key, etag), destination)
+        return destination
+
+    def cached_files(self) -> list:
+        '''(modified time, path, size) of every cached file'''
+        files = []
+        for folder, _, file_names in os.walk(self.cache_dir):
+            for file_name in file_names:
+                if file_name.endswith(".tmp"):
+                    continue
+                path = os.path.join(folder, file_name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    # Evicted by another process
+                    continue
+                files.append((stat.st_mtime, path, stat.st_size))
+        return files
+
+    def evict(self) -> int:
+        '''Delete the least recently used files until the cache is back
+        under its limit, returns the number deleted'''
+        with self.lock:
+            files = sorted(self.cached_files())
+            size = sum(file_size for _, _, file_size in files)
+            target = self.max_bytes * EVICT_TO
+            evicted = 0
+            for _, path, file_size in files:
+                if size <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                size -= file_size
+                evicted += 1
+            self.size = size
+        if evicted:
+            logging.info(f"Evicted {evicted} files from the S3 cache")
+        return evicted
+
+
+def cache_from_env(s3_client) -> S3Cache:
+    '''The cache configured by the environment, or None when caching is
+    not switched on'''
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    if not cache_dir:
+        return None
+    max_mb = float(os.environ.get(CACHE_MAX_MB_ENV, DEFAULT_MAX_MB))
+    return S3Cache(cache_dir, s3_client, int(max_mb * 1024 * 1024))
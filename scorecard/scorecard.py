@@ -4,20 +4,20 @@
 #
 import logging
 import math
+import time
 from collections import defaultdict
 from operator import itemgetter
 from typing import Dict, List
 
 import numpy as np
-import pandas
 
-from shapely.geometry import Point, LineString, Polygon
+# pandas, shapely and machine_common_sense are slow to import and only
+#   needed by a few of the calculations, so they are imported where
+#   they are used to keep ingest and script startup fast.
+from scorecard.scorecard_location_utils import (
+    points_in_rectangles, up_ramp_or_down)
 
 # Grid Dimension determines how big our grid is for revisiting
-from machine_common_sense.action import MOVE_ACTIONS, Action
-
-from scorecard.scorecard_location_utils import is_on_ramp, up_ramp_or_down
-
 GRID_DIMENSION = 0.5
 
 # Direction limit:  Degrees difference that we allow before we count actors
@@ -67,13 +67,53 @@ RAMP_MIN_HEIGHT_CHANGE = 0.1
 # When we are this close to the ramp base, count it as on the base.
 DIST_LIMIT_FROM_BASE = 0.1
 
+# Positions checked against the ramps or structures at once
+POSITION_CHECK_CHUNK = 256
+
 DEFAULT_ROOM_DIMENSIONS = {'x': 10, 'y': 3, 'z': 10}
 
 PERFORMER_WIDTH = 0.25
 PERFORMER_HEIGHT = 0.762
 
+# Small buffer otherwise the performer will be detected inside the
+# object it's standing on.
+BOUNDING_BOX_Y_BUFFER = 0.01
+
+# Distance and direction (relative to the performer's rotation) of
+# each move action
+MOVE_MAGNITUDE = 0.1
+MOVE_DIRECTIONS = {
+    'MoveAhead': 0, 'MoveBack': 180, 'MoveLeft': -90, 'MoveRight': 90}
+ROOM_WALL_IDS = ['room_wall_x+', 'room_wall_x-', 'room_wall_z+',
+                 'room_wall_z-']
+
 MULTI_RETRIEVAL = "multi retrieval"
 
+# Calculations run by score_all, in order
+SCORE_CALCULATIONS = [
+    'calc_repeat_failed',
+    'calc_open_unopenable',
+    'calc_relook',
+    'calc_revisiting',
+    'calc_not_moving_toward_object',
+    'calc_fastest_path',
+    'calc_ramp_actions',
+    'calc_tool_usage',
+    'calc_correct_platform_side',
+    'calc_correct_door_opened',
+    'calc_pickup_non_target',
+    'calc_pickup_not_pickupable',
+    'calc_agent_interactions',
+    'calc_walked_into_structures',
+    'calc_num_rewards_achieved',
+    'calc_imitation_order_containers_are_opened_colors',
+    'calc_set_rotation',
+    'calc_shell_game',
+    'calc_door_opened_side',
+    'calc_interacted_with_blob_first',
+    'calc_stepped_in_lava'
+]
+
 
 def get_relevant_object(output) -> str:
     """See if there is an object for the current action output"""
@@ -313,6 +353,12 @@ class Scorecard:
                      for i in range(self.grid_size)]
         self.grid_counts = np.zeros([self.grid_size, self.grid_size])
 
+        # Seconds spent in each calculation by score_all
+        self.metric_timings = {}
+
+        # (centers, sizes, rotations, ids) of the ramps, see ramp_table
+        self.ramps = None
+
         # Output values
         self.revisits = 0
         self.repeat_failed = 0
@@ -333,27 +379,12 @@ class Scorecard:
         self.stepped_in_lava = None
 
     def score_all(self) -> dict:
-        self.calc_repeat_failed()
-        self.calc_open_unopenable()
-        self.calc_relook()
-        self.calc_revisiting()
-        self.calc_not_moving_toward_object()
-        self.calc_fastest_path()
-        self.calc_ramp_actions()
-        self.calc_tool_usage()
-        self.calc_correct_platform_side()
-        self.calc_correct_door_opened()
-        self.calc_pickup_non_target()
-        self.calc_pickup_not_pickupable()
-        self.calc_agent_interactions()
-        self.calc_walked_into_structures()
-        self.calc_num_rewards_achieved()
-        self.calc_imitation_order_containers_are_opened_colors()
-        self.calc_set_rotation()
-        self.calc_shell_game()
-        self.calc_door_opened_side()
-        self.calc_interacted_with_blob_first()
-        self.calc_stepped_in_lava()
+        # Time each calculation so slow metrics can be found
+        self.metric_timings = {}
+        for calculation in SCORE_CALCULATIONS:
+            start = time.perf_counter()
+            getattr(self, calculation)()
+            self.metric_timings[calculation] = time.perf_counter() - start
 
         # To be implemented
         # self.calc_attempt_impossible()
@@ -542,6 +573,8 @@ class Scorecard:
         return (grid_x, grid_z)
 
     def print_grid(self):
+        import pandas
+
         # Use a Pandas Dataframe to print it out
         df = pandas.DataFrame(self.grid_counts)
         pandas.set_option("display.max_rows", None,
@@ -746,9 +779,29 @@ class Scorecard:
         '''Calculate the number of times that the AI went
         up ramps, failed to go up/down a ramp (went other way),
         and fell off.'''
+        from machine_common_sense.action import MOVE_ACTIONS, Action
+
         logging.debug('Starting calculating ramp actions')
         steps_list = self.history['steps']
 
+        # Can only go up/down a ramp when actually moving, so only the
+        # successful moves matter.  Each distinct action name is only
+        # converted to an Action once.
+        is_move = {}
+        moves = []
+        for single_step in steps_list:
+            action = single_step['action']
+            if action not in is_move:
+                is_move[action] = Action(action) in MOVE_ACTIONS
+            if (is_move[action] and
+                    single_step['output']['return_status'] == "SUCCESSFUL"):
+                moves.append(single_step)
+
+        # Which ramp, if any, each move ended on, all in one test
+        on_ramp_flags, ramp_indexes = self.on_ramps(
+            [single_step['output']['position'] for single_step in moves])
+        _, _, ramp_rotations, ramp_ids = self.ramp_table()
+
         old_position = steps_list[0]['output']['position']
         was_on_ramp = False
         headed_up = False
@@ -762,25 +815,15 @@ class Scorecard:
         last_ramp_action_position = old_position
         last_ramp_action = None
 
-        for single_step in steps_list:
+        for single_step, now_on_ramp, ramp_index in zip(
+                moves, on_ramp_flags.tolist(), ramp_indexes.tolist()):
             step = single_step['step']
-            action = Action(single_step['action'])
-            output = single_step['output']
-            return_status = output['return_status']
             logging.debug(f"On step: {step}")
 
-            # Can only go up/down a ramp when actually moving
-            if action not in MOVE_ACTIONS:
-                logging.debug(f"Not a move {action}")
-                continue
-
-            if return_status != "SUCCESSFUL":
-                logging.debug(f"Not successful {return_status}")
-                continue
-
-            position = output['position']
-            now_on_ramp, ramp_rot, ramp_name = self.on_ramp(position)
-            logging.debug(f"Whether on ramp:   {now_on_ramp} {ramp_name}")
+            position = single_step['output']['position']
+            ramp_rot = ramp_rotations[ramp_index] if now_on_ramp else 0
+            logging.debug(f"Whether on ramp:   {now_on_ramp} " +
+                          f"{ramp_ids[ramp_index] if now_on_ramp else ''}")
 
             # Special case:  We previously thought that we had reached the top
             # or bottom, but we really went over the side and just didn't
@@ -879,28 +922,52 @@ class Scorecard:
         logging.debug('Ending calculating ramp actions')
         return self.ramp_actions
 
+    def ramp_table(self) -> tuple:
+        '''(centers, sizes, rotations, ids) of the ramps (triangles) in
+        the scene, from their first shows, in scene order.  Built once.'''
+        if self.ramps is None:
+            centers, sizes, rotations, ids = [], [], [], []
+            for obj in self.scene['objects']:
+                if obj['type'] != 'triangle':
+                    continue
+                if 'shows' in obj and len(obj['shows']) > 0:
+                    sh = obj['shows'][0]
+                    centers.append(
+                        [sh['position']['x'], sh['position']['z']])
+                    sizes.append([sh['scale']['x'], sh['scale']['z']])
+                    rotations.append(sh['rotation']['y'])
+                    ids.append(obj['id'])
+            self.ramps = (centers, sizes, rotations, ids)
+        return self.ramps
+
+    def on_ramps(self, positions: List[dict]) -> tuple:
+        '''For each position, whether it is in a ramp and the index in
+        ramp_table of the first ramp it is in'''
+        centers, sizes, rotations, _ = self.ramp_table()
+        on_ramp_flags = np.zeros(len(positions), dtype=bool)
+        ramp_indexes = np.zeros(len(positions), dtype=int)
+        if not centers:
+            return on_ramp_flags, ramp_indexes
+
+        # In chunks, so long histories do not need large arrays
+        for start in range(0, len(positions), POSITION_CHECK_CHUNK):
+            chunk = positions[start:start + POSITION_CHECK_CHUNK]
+            points = np.fromiter(
+                (value for position in chunk
+                 for value in (position['x'], position['z'])),
+                dtype=float, count=2 * len(chunk)).reshape(-1, 2)
+            inside = points_in_rectangles(points, centers, sizes, rotations)
+            on_ramp_flags[start:start + len(chunk)] = inside.any(axis=1)
+            ramp_indexes[start:start + len(chunk)] = inside.argmax(axis=1)
+        return on_ramp_flags, ramp_indexes
+
     def on_ramp(self, position) -> (bool, float, str):
         '''Determine if a position is in a ramp.  Return
         a boolean and, if True, ramp rotation and the ID'''
-
-        for obj in self.scene['objects']:
-            if obj['type'] != 'triangle':
-                continue
-
-            x = position['x']
-            z = position['z']
-            if 'shows' in obj and len(obj['shows']) > 0:
-                sh = obj['shows'][0]
-                pos = sh['position']
-                size = sh['scale']
-                rot = sh['rotation']['y']
-                on_obj = is_on_ramp(
-                    x, z,
-                    pos['x'], pos['z'],
-                    size['x'], size['z'],
-                    rot)
-                if on_obj:
-                    return True, rot, obj['id']
+        on_ramp_flags, ramp_indexes = self.on_ramps([position])
+        if on_ramp_flags[0]:
+            _, _, rotations, ids = self.ramp_table()
+            return True, rotations[ramp_indexes[0]], ids[ramp_indexes[0]]
         return False, 0, ""
 
     def fell_off_ramp(self,
@@ -1181,6 +1248,8 @@ class Scorecard:
         self.is_fastest_path = distances[0] == min(distances)
             
     def get_distance_from_path(self, start_pos: Dict[str, float],position: Dict[str, float], path: List[Dict[str, float]]):
+        from shapely.geometry import LineString, Point
+
         p1 = start_pos
         p1 = Point((start_pos['x'], start_pos['z']))
         pos = Point((position['x'], position['z']))
@@ -1290,113 +1359,158 @@ class Scorecard:
             maximum = max(value, maximum)
         return (minimum, maximum)
 
-    def point_is_inside_bounding_box(self, position, bounding_box):
-        minimum_y, maximum_y = self.get_min_max_bounding_box_coords(bounding_box, 'y')
-        """
-        Small buffer otherwise the performer will be detected
-        inside the object it's standing on.
-        """
-        buffer = 0.01
-        above = position['y'] - PERFORMER_HEIGHT + buffer > maximum_y
-        below = position['y'] - buffer < minimum_y
-        if not above and not below:
-            minimum_x, maximum_x = self.get_min_max_bounding_box_coords(bounding_box, 'x')
-            minimum_z, maximum_z = self.get_min_max_bounding_box_coords(bounding_box, 'z')
-            performer_center = Point(position['x'], position['z'])
-            performer_bounds = performer_center.buffer(PERFORMER_WIDTH)
-            box = [(minimum_x, minimum_z), (minimum_x, maximum_z),
-                    (maximum_x, maximum_z), (maximum_x, minimum_z)]
-            bb = Polygon(box)
-            obstructed_by_this_object = performer_bounds.intersects(bb)
-            if obstructed_by_this_object:
-                return obstructed_by_this_object
-        return False
+    def bounding_box_table(self, bounding_boxes: List[list]) -> tuple:
+        '''(mins, maxs), the (M, 3) x, y, z extents of each bounding
+        box, a list of corner points'''
+        mins = np.zeros((len(bounding_boxes), 3))
+        maxs = np.zeros((len(bounding_boxes), 3))
+        for index, bounding_box in enumerate(bounding_boxes):
+            corners = np.array(
+                [[pt['x'], pt['y'], pt['z']] for pt in bounding_box])
+            mins[index] = corners.min(axis=0)
+            maxs[index] = corners.max(axis=0)
+        return mins, maxs
+
+    def points_touch_bounding_boxes(
+            self,
+            positions: np.ndarray,
+            mins: np.ndarray,
+            maxs: np.ndarray) -> np.ndarray:
+        '''(N, M) whether the performer, a circle of PERFORMER_WIDTH
+        and PERFORMER_HEIGHT tall, at each of N (x, y, z) positions
+        overlaps each of M bounding_box_table boxes'''
+        x = positions[:, np.newaxis, 0]
+        y = positions[:, np.newaxis, 1]
+        z = positions[:, np.newaxis, 2]
+        above = y - PERFORMER_HEIGHT + BOUNDING_BOX_Y_BUFFER > maxs[:, 1]
+        below = y - BOUNDING_BOX_Y_BUFFER < mins[:, 1]
+
+        # Distance from the circle's center to the closest point of
+        # the box on the floor
+        dx = np.maximum(np.maximum(mins[:, 0] - x, x - maxs[:, 0]), 0)
+        dz = np.maximum(np.maximum(mins[:, 2] - z, z - maxs[:, 2]), 0)
+        return (~above & ~below &
+                (dx * dx + dz * dz <= PERFORMER_WIDTH * PERFORMER_WIDTH))
 
-    def point_is_outside_room_dimensions(self, position, room_dimensions):
+    def point_is_inside_bounding_box(self, position, bounding_box):
+        mins, maxs = self.bounding_box_table([bounding_box])
+        return bool(self.points_touch_bounding_boxes(
+            np.array([[position['x'], position['y'], position['z']]]),
+            mins, maxs)[0, 0])
+
+    def points_outside_room(
+            self,
+            positions: np.ndarray,
+            room_dimensions: dict) -> tuple:
+        '''(outside, walls), whether the performer at each of N (x, y, z)
+        positions reaches a wall of the room, and the index in
+        ROOM_WALL_IDS of the first wall it reaches (the last wall when
+        it reaches none)'''
         x_room_half_width = room_dimensions['x'] / 2
         z_room_half_width = room_dimensions['z'] / 2
-        x = position['x']
-        z = position['z']
-        beyond_max_x = x + PERFORMER_WIDTH >= x_room_half_width
-        beyond_min_x = x - PERFORMER_WIDTH <= -x_room_half_width
-        beyond_max_z = z + PERFORMER_WIDTH >= z_room_half_width
-        beyond_min_z = z - PERFORMER_WIDTH <= -z_room_half_width
-        obs = beyond_max_x or beyond_min_x or beyond_max_z or beyond_min_z
-        id = ('room_wall_x+' if beyond_max_x else
-                'room_wall_x-' if beyond_min_x else
-                'room_wall_z+' if beyond_max_z else
-                'room_wall_z-')
-        return obs, id
+        x = positions[:, 0]
+        z = positions[:, 2]
+        beyond_walls = np.stack([
+            x + PERFORMER_WIDTH >= x_room_half_width,
+            x - PERFORMER_WIDTH <= -x_room_half_width,
+            z + PERFORMER_WIDTH >= z_room_half_width,
+            z - PERFORMER_WIDTH <= -z_room_half_width], axis=1)
+        outside = beyond_walls.any(axis=1)
+        walls = np.where(
+            outside, beyond_walls.argmax(axis=1), len(ROOM_WALL_IDS) - 1)
+        return outside, walls
+
+    def point_is_outside_room_dimensions(self, position, room_dimensions):
+        outside, walls = self.points_outside_room(
+            np.array([[position['x'], position['y'], position['z']]]),
+            room_dimensions)
+        return bool(outside[0]), ROOM_WALL_IDS[walls[0]]
 
     def get_performer_target_point_based_on_direction(
         self, position, rotation, action):
-        move_magnitude = 0.1
-        direction = (-90 if action == "MoveLeft" else 90 if action == "MoveRight" 
-                    else 180 if action == "MoveBack" else 0)
-        x_vector = math.sin(math.radians(rotation + direction)) * move_magnitude
-        z_vector = math.cos(math.radians(rotation + direction)) * move_magnitude
+        direction = MOVE_DIRECTIONS.get(action, 0)
+        x_vector = math.sin(math.radians(rotation + direction)) * MOVE_MAGNITUDE
+        z_vector = math.cos(math.radians(rotation + direction)) * MOVE_MAGNITUDE
         target_x = position['x'] + x_vector
         target_z = position['z'] + z_vector
         return {'x': target_x, 'y': position['y'], 'z': target_z}
 
+    def obstructed_move_ids(self, steps: List[dict]) -> list:
+        '''What each of the obstructed move steps walked into, the id of
+        a room wall or structure, or None for a platform lip (or when
+        nothing was found)'''
+        structures = [obj for obj in self.scene['objects']
+            if obj.get('structure') is True]
+        structure_ids = [struct['id'] for struct in structures]
+        mins, maxs = self.bounding_box_table(
+            [struct['shows'][0]['boundingBox'] for struct in structures])
+        is_platform = np.array(
+            [id.startswith('platform') for id in structure_ids], dtype=bool)
+        is_ramp = np.array(
+            [id.startswith('ramp') for id in structure_ids], dtype=bool)
+        room_dimensions = self.scene.get(
+            'roomDimensions', DEFAULT_ROOM_DIMENSIONS)
+
+        # All the moves of a chunk are checked against the room walls
+        # and every structure at once
+        ids = []
+        for start in range(0, len(steps), POSITION_CHECK_CHUNK):
+            chunk = steps[start:start + POSITION_CHECK_CHUNK]
+            positions = np.array([
+                [step['output']['position'][axis] for axis in 'xyz']
+                for step in chunk], dtype=float)
+            angles = np.radians(np.array([
+                step['output']['rotation'] + MOVE_DIRECTIONS[step['action']]
+                for step in chunk], dtype=float))
+            targets = positions.copy()
+            targets[:, 0] += np.sin(angles) * MOVE_MAGNITUDE
+            targets[:, 2] += np.cos(angles) * MOVE_MAGNITUDE
+
+            obstructed_by_wall, walls = self.points_outside_room(
+                targets, room_dimensions)
+
+            # The first structure, in scene order, the target is in
+            inside = self.points_touch_bounding_boxes(targets, mins, maxs)
+            hit = inside.any(axis=1) & ~obstructed_by_wall
+            first = inside.argmax(axis=1) if structure_ids else None
+
+            """
+            Check if the obstruction is a platform lip
+            with the edge case of walking up a ramp
+            and hitting the side or outside of the lip while still
+            on the ramp and not on top of the platform
+            """
+            if hit.any() and is_ramp.any():
+                lip = np.flatnonzero(hit & is_platform[first])
+                on_ramp = self.points_touch_bounding_boxes(
+                    positions[lip], mins[is_ramp], maxs[is_ramp]).any(axis=1)
+                hit[lip[on_ramp]] = False
+
+            for row in range(len(chunk)):
+                if obstructed_by_wall[row]:
+                    ids.append(ROOM_WALL_IDS[walls[row]])
+                elif hit[row]:
+                    ids.append(structure_ids[first[row]])
+                else:
+                    ids.append(None)
+        return ids
+
     def calc_walked_into_structures(self):
         ''' 
         Determine the number of times that the performer walked into
         walls, platform walls, ramp sides, and occluders.
         Platform lips are exluded.
         '''
-        steps_list = self.history['steps']
-        walked_into_structures = 0
-        structures = [obj for obj in self.scene['objects']
-            if obj.get('structure') is True]
-        bounding_boxes = [
-            {'id': struct['id'], 'bounding_box': struct['shows'][0]['boundingBox']}
-            for struct in structures]
-        ramp_bounding_boxes = [
-            {'id': struct['id'], 'bounding_box': struct['shows'][0]['boundingBox']}
-            for struct in structures if struct['id'].startswith('ramp')]
-        default_room_dimensions = {'x': 10, 'y': 3, 'z': 10}
-        room_dimensions = self.scene.get('roomDimensions', default_room_dimensions)
-        
+        obstructed_steps = [
+            single_step for single_step in self.history['steps']
+            if single_step['action'] in MOVE_DIRECTIONS and
+            single_step['output']['return_status'] == 'OBSTRUCTED']
+
         # Keeps track of obstruction ids, this is not being used now but may be useful
-        obstructions = []
-        
-        move_actions = ['MoveAhead', 'MoveBack', 'MoveLeft', 'MoveRight']
-        for single_step in steps_list:
-            action = single_step['action']
-            output = single_step['output']
-            if action in move_actions and output['return_status'] == 'OBSTRUCTED':
-                performers_target_point = (
-                    self.get_performer_target_point_based_on_direction(
-                        output['position'], output['rotation'], action))
-                obstructed_by_wall, id = (self.point_is_outside_room_dimensions(
-                    performers_target_point, room_dimensions))
-                if obstructed_by_wall:
-                    walked_into_structures += 1
-                    obstructions.append(id)
-                    continue
-                for bb in bounding_boxes:
-                    inside = self.point_is_inside_bounding_box(
-                        performers_target_point, bb['bounding_box'])
-                    """
-                    Check if the obstruction is a platform lip
-                    with the edge case of walking up a ramp 
-                    and hitting the side or outside of the lip while still
-                    on the ramp and not on top of the platform
-                    """
-                    if inside and bb['id'].startswith('platform'):
-                        is_on_ramp = False
-                        for bb_ramp_check in ramp_bounding_boxes:
-                            if (self.point_is_inside_bounding_box(
-                                output['position'], bb_ramp_check['bounding_box'])):
-                                is_on_ramp = True
-                                break
-                        if is_on_ramp:
-                            break
-                    if inside:
-                        obstructions.append(bb['id'])
-                        walked_into_structures += 1
-                        break
+        obstructions = [
+            id for id in self.obstructed_move_ids(obstructed_steps)
+            if id is not None]
+        walked_into_structures = len(obstructions)
         self.walked_into_structures = walked_into_structures
         return self.walked_into_structures
 
@@ -1,14 +1,128 @@
 #
 # Calculate some useful scorecard location values
 #
+# The array functions work on many points and shapes at once, points
+# are (N, 2) arrays of x, z and the results are (N, M) for M shapes.
+# The Point2D functions are wrappers around them for a single point.
+#
 import logging
-import math
 from math import sin, cos
 from typing import List
 
+import numpy as np
 from numpy import deg2rad
 from point2d import Point2D
 
+# Corner offsets of a rectangle, in units of its half size, in the
+#   order of get_corners_from_center_size_rotation
+CORNER_SIGNS = np.array([[-1., 1.], [1., 1.], [1., -1.], [-1., -1.]])
+
+
+def as_points(points) -> np.ndarray:
+    '''An (N, 2) float array from x, z pairs'''
+    return np.asarray(points, dtype=float).reshape(-1, 2)
+
+
+def rotate_points(
+        points: np.ndarray,
+        centers: np.ndarray,
+        rotations) -> np.ndarray:
+    '''Rotate points CW around centers by rotations (degrees).  The
+    arguments broadcast, points and centers have a last axis of 2.'''
+    points = np.asarray(points, dtype=float)
+    centers = np.asarray(centers, dtype=float)
+    rot = deg2rad(-np.asarray(rotations, dtype=float))
+    cos_rot, sin_rot = np.cos(rot), np.sin(rot)
+    shift = points - centers
+    return np.stack([
+        shift[..., 0] * cos_rot - shift[..., 1] * sin_rot,
+        shift[..., 0] * sin_rot + shift[..., 1] * cos_rot], axis=-1) + centers
+
+
+def rectangle_corners(
+        centers: np.ndarray,
+        sizes: np.ndarray,
+        rotations: np.ndarray) -> np.ndarray:
+    '''(M, 4, 2) corners of M rectangles, rotated CW around their
+    centers'''
+    centers = as_points(centers)[:, np.newaxis, :]
+    sizes = as_points(sizes)[:, np.newaxis, :]
+    corners = centers + CORNER_SIGNS * (sizes / 2.)
+    rotations = np.asarray(rotations, dtype=float).reshape(-1, 1)
+    return rotate_points(corners, centers, rotations)
+
+
+def points_in_polygons(
+        points: np.ndarray,
+        polygons: np.ndarray) -> np.ndarray:
+    '''(N, M) whether each of N points is in each of M polygons of K
+    points each, an (M, K, 2) array, same algorithm as
+    is_point_in_polygon'''
+    points = as_points(points)
+    polygons = np.asarray(polygons, dtype=float)
+    x = points[:, np.newaxis, 0]
+    y = points[:, np.newaxis, 1]
+
+    # One edge of every polygon at a time, which keeps the arrays (N, M)
+    is_inside = np.zeros((len(points), len(polygons)), dtype=bool)
+    for k in range(polygons.shape[1]):
+        p1 = polygons[:, k]
+        p2 = polygons[:, (k + 1) % polygons.shape[1]]
+        crosses_y = (p1[:, 1] > y) != (p2[:, 1] > y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            edge_x = ((p2[:, 0] - p1[:, 0]) * (y - p1[:, 1]) /
+                      (p2[:, 1] - p1[:, 1]) + p1[:, 0])
+        is_inside ^= crosses_y & (x < edge_x)
+    return is_inside
+
+
+def points_in_rectangles(
+        points: np.ndarray,
+        centers: np.ndarray,
+        sizes: np.ndarray,
+        rotations: np.ndarray) -> np.ndarray:
+    '''(N, M) whether each point is in each rotated rectangle'''
+    return points_in_polygons(
+        points, rectangle_corners(centers, sizes, rotations))
+
+
+def dist_points_to_segments(
+        points: np.ndarray,
+        starts: np.ndarray,
+        ends: np.ndarray) -> np.ndarray:
+    '''(N, M) distance from each of N points to each of M segments,
+    from starts to ends'''
+    E = as_points(points)[:, np.newaxis, :]
+    A = as_points(starts)[np.newaxis]
+    B = as_points(ends)[np.newaxis]
+    AB = B - A
+    BE = E - B
+    AE = E - A
+
+    AB_BE = np.sum(AB * BE, axis=-1)
+    AB_AE = np.sum(AB * AE, axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        perpendicular = np.abs(
+            AB[..., 0] * AE[..., 1] - AB[..., 1] * AE[..., 0]) / np.hypot(
+            AB[..., 0], AB[..., 1])
+    return np.where(
+        AB_BE > 0, np.hypot(BE[..., 0], BE[..., 1]),
+        np.where(AB_AE < 0, np.hypot(AE[..., 0], AE[..., 1]),
+                 perpendicular))
+
+
+def points_near_bases(
+        points: np.ndarray,
+        centers: np.ndarray,
+        sizes: np.ndarray,
+        rotations: np.ndarray,
+        size_limit: float) -> np.ndarray:
+    '''(N, M) whether each point is within size_limit of the base
+    (last two corners) of each ramp'''
+    corners = rectangle_corners(centers, sizes, rotations)
+    return dist_points_to_segments(
+        points, corners[:, 2], corners[:, 3]) <= size_limit
+
 
 def get_corners_from_center_size_rotation(
         center: Point2D,
@@ -17,18 +131,9 @@ def get_corners_from_center_size_rotation(
     ''' Get the 4 points of a rectangle with a given
      center, size, and rotation.  Returns a list of
      points that is a polygon.  Rotation is CW.'''
-    pt0 = Point2D(center.x - (size.x / 2.), center.y + (size.y / 2.))
-    pt1 = Point2D(center.x + (size.x / 2.), center.y + (size.y / 2.))
-    pt2 = Point2D(center.x + (size.x / 2.), center.y - (size.y / 2.))
-    pt3 = Point2D(center.x - (size.x / 2.), center.y - (size.y / 2.))
-
-    pt0 = rotate_point(pt0, center, rotation)
-    pt1 = rotate_point(pt1, center, rotation)
-    pt2 = rotate_point(pt2, center, rotation)
-    pt3 = rotate_point(pt3, center, rotation)
-
-    polygon = [pt0, pt1, pt2, pt3]
-    return polygon
+    corners = rectangle_corners(
+        [center.x, center.y], [size.x, size.y], rotation)[0]
+    return [Point2D(float(x), float(y)) for x, y in corners]
 
 
 def is_point_in_polygon(
@@ -48,18 +153,10 @@ def is_point_in_polygon(
         logging.warning("Polygon has less than 3 members!!!")
         return False
 
-    # Close the polygon, by making last point same as first
-    polygon.append(polygon[0])
-
-    # Go through the sequential pairs of points, toggle is_inside for each
-    # crossing
-    is_inside = False
-    for p1, p2 in zip(polygon, polygon[1:]):
-        if ((p1.y > pt.y) != (p2.y > pt.y) and
-                pt.x < (p2.x - p1.x) * (pt.y - p1.y) / (p2.y - p1.y) + p1.x):
-            is_inside = not is_inside
-
-    return is_inside
+    # Each edge, including the one from the last point back to the
+    # first, toggles is_inside when the point's ray crosses it
+    return bool(points_in_polygons(
+        [pt.x, pt.y], [[[p.x, p.y] for p in polygon]])[0, 0])
 
 
 def rotate_x_z(
@@ -94,29 +191,10 @@ def calc_dist_point_to_segment(
     https://www.geeksforgeeks.org/minimum-distance-from-a-\
     point-to-the-line-segment-using-vectors/'''
 
-    # Vectors between points
-    AB = Point2D(B.x - A.x, B.y - A.y)
-    BE = Point2D(E.x - B.x, E.y - B.y)
-    AE = Point2D(E.x - A.x, E.y - A.y)
-
-    # Dot products
-    AB_BE = AB.x * BE.x + AB.y * BE.y
-    AB_AE = AB.x * AE.x + AB.y * AE.y
-
-    # If they are not perpendicular, find the
-    # point that is closest and return distance
-    if AB_BE > 0:
-        return (E - B).r
-    elif AB_AE < 0:
-        return (E - A).r
-
-    # Finding the perpendicular distance
-    x1 = AB.x
-    y1 = AB.y
-    x2 = AE.x
-    y2 = AE.y
-    mod = math.sqrt(x1 * x1 + y1 * y1)
-    return abs(x1 * y2 - y1 * x2) / mod
+    # If the closest point is not between A and B it is the
+    # nearer end, otherwise use the perpendicular distance
+    return float(dist_points_to_segments(
+        [E.x, E.y], [A.x, A.y], [B.x, B.y])[0, 0])
 
 
 def is_point_near_base(
@@ -127,15 +205,9 @@ def is_point_near_base(
         size_limit: float) -> bool:
     '''Determine if a point is within size_limit of the 'base' of a
     ramp.  The base is line segment connecting last two pts.'''
-    pt2 = Point2D(center.x + (size.x / 2.), center.y - (size.y / 2.))
-    pt3 = Point2D(center.x - (size.x / 2.), center.y - (size.y / 2.))
-    pt2 = rotate_point(pt2, center, rotation)
-    pt3 = rotate_point(pt3, center, rotation)
-
-    min_dist = calc_dist_point_to_segment(pt, pt2, pt3)
-    if min_dist <= size_limit:
-        return True
-    return False
+    return bool(points_near_bases(
+        [pt.x, pt.y], [center.x, center.y], [size.x, size.y], rotation,
+        size_limit)[0, 0])
 
 
 def up_ramp_or_down(
@@ -169,13 +241,10 @@ def is_on_ramp(
         size_x: float,
         size_z: float,
         rotation: float) -> bool:
-    '''Helper function to convert to Point2D and perform inside calc'''
-    pt = Point2D(x, z)
-    center = Point2D(center_x, center_z)
-    size = Point2D(size_x, size_z)
-
-    corners = get_corners_from_center_size_rotation(center, size, rotation)
-    is_actually_on = is_point_in_polygon(pt, corners)
+    '''Whether (x, z) is within the area of a ramp, see
+    points_in_rectangles for many points and ramps'''
+    is_actually_on = bool(points_in_rectangles(
+        [x, z], [center_x, center_z], [size_x, size_z], rotation)[0, 0])
     return is_actually_on
 
     # It is not clear if the following is needed.  The calculation
@@ -187,6 +256,7 @@ def is_on_ramp(
     # If the definition of 'on the ramp' requires that we include
     # whether it is _affected_ by the ramp, then
     # add size_limit to the parameters and uncomment below.
-    #     is_near_base = is_point_near_base(pt, center, size, rotation,
-    #            size_limit)
+    #     is_near_base = is_point_near_base(
+    #            Point2D(x, z), Point2D(center_x, center_z),
+    #            Point2D(size_x, size_z), rotation, size_limit)
     #     return is_actually_on or is_near_base
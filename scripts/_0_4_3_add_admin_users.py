@@ -15,3 +15,7 @@ def add_admins(mongoDB):
         collection.update_one(search_value, set_value)
 
     print("Admin users were successfully added!")
+
+
+def migrate(mongoDB, **options):
+    add_admins(mongoDB)
@@ -22,3 +22,7 @@ def add_has_novelty_field(mongoDB):
         history_collection.replace_one({"_id": history["_id"]}, history)
 
     print("Updated Eval 3 history to appropriate novelty level.")
+
+
+def migrate(mongoDB, **options):
+    add_has_novelty_field(mongoDB)
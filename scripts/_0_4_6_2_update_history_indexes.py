@@ -50,3 +50,7 @@ def create_new_cat_eval2_and_indexes(mongoDB):
     ])
 
     print("Index creation result: ", result)
+
+
+def migrate(mongoDB, **options):
+    create_new_cat_eval2_and_indexes(mongoDB)
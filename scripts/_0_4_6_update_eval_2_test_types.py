@@ -38,3 +38,7 @@ def update_test_types(mongoDB):
     ])
 
     print("Index creation result: ", result)
+
+
+def migrate(mongoDB, **options):
+    update_test_types(mongoDB)
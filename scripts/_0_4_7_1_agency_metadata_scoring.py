@@ -16,3 +16,7 @@ def update_agency_scoring(client, db_string):
             mcs_scene_ingest.update_agency_scoring(expected_record, unexpected_record)
             mcs_scene_ingest.update_agency_paired_history_item(client, db_string, expected_record)
             mcs_scene_ingest.update_agency_paired_history_item(client, db_string, unexpected_record)
+
+
+def migrate(mongoDB, client, db_string, **options):
+    update_agency_scoring(client, db_string)
@@ -27,4 +27,8 @@ def update_score_worth(mongoDB):
                 }
             }])
 
-        print("Update " + str(goal_id) + ".", result)
\ No newline at end of file
+        print("Update " + str(goal_id) + ".", result)
+
+
+def migrate(mongoDB, **options):
+    update_score_worth(mongoDB)
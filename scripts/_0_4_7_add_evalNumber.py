@@ -26,3 +26,7 @@ def add_eval_number(mongoDB):
             }])
 
         print("Update Eval " + str(en) + " Scenes.", result)
+
+
+def migrate(mongoDB, **options):
+    add_eval_number(mongoDB)
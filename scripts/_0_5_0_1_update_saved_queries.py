@@ -28,4 +28,8 @@ def update_saved_queries(mongoDB):
                 query["fieldType"] = field_mapping[query["fieldType"]]
 
         # Saved updated object
-        saved_queries_collection.replace_one({"_id": document["_id"]}, document)        
+        saved_queries_collection.replace_one({"_id": document["_id"]}, document)
+
+
+def migrate(mongoDB, **options):
+    update_saved_queries(mongoDB)
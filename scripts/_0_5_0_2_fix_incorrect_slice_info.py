@@ -31,4 +31,8 @@ def update_slice_info(mongoDB):
             }
         )
 
-        print("Added to slice array.", result)    
\ No newline at end of file
+        print("Added to slice array.", result)
+
+
+def migrate(mongoDB, **options):
+    update_slice_info(mongoDB)
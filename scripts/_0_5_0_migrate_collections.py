@@ -56,3 +56,7 @@ def migrate_collections(mongoDB):
     # Remove old collections after new collections set up
     history_collection.drop()
     scenes_collection.drop()
+
+
+def migrate(mongoDB, **options):
+    migrate_collections(mongoDB)
@@ -21,4 +21,8 @@ def create_new_performance_indexes(mongoDB):
             ("test_type", 1), ("metadata", 1)
         ])
 
-        print("Index creation result: ", result)
\ No newline at end of file
+        print("Index creation result: ", result)
+
+
+def migrate(mongoDB, **options):
+    create_new_performance_indexes(mongoDB)
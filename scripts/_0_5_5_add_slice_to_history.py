@@ -15,3 +15,7 @@ def add_slice_to_history_items(mongoDB):
                 results_collection.replace_one({"_id": history["_id"]}, history)
 
         print("Updated slices for Eval " + str(eval_number) + ".")
+
+
+def migrate(mongoDB, **options):
+    add_slice_to_history_items(mongoDB)
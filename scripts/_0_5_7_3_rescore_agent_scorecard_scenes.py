@@ -1,43 +1,31 @@
 from scorecard import Scorecard
-import boto3
-import os
-import json
-import io
+from scripts.migration import (
+    Migration, MongoCheckpointStore, history_file_key, run_migration)
+
+
+def rescore_history_interact_with_agent(history_record, scene, history_item):
+    scorecard = Scorecard(history_item, scene)
+    scorecard.calc_agent_interactions()
+    return {
+        "score.scorecard.interact_with_agent":
+            scorecard.get_interact_with_agent()
+    }
+
+
+def rescore_interacted_with_agent(mongoDB, batch_size=None, processes=None):
+    run_migration(mongoDB, Migration(
+        "rescore_interacted_with_agent",
+        "eval_5_results",
+        {"category": "interactive"},
+        rescore_history_interact_with_agent,
+        scenes_collection="eval_5_scenes",
+        file_key=history_file_key("eval-resources-5"),
+        batch_size=batch_size),
+        processes=processes,
+        checkpoints=MongoCheckpointStore(mongoDB))
 
-s3 = boto3.resource('s3')
-
-
-def load_json_file(file_name: str) -> dict:
-    with io.open(
-            file_name,
-            mode='r',
-            encoding='utf-8-sig') as json_file:
-        return json.loads(json_file.read())
-
-
-def rescore_interacted_with_agent(mongoDB):
-    results_collection = mongoDB["eval_5_results"]
-    scenes_collection = mongoDB["eval_5_scenes"]
-
-    history_files = results_collection.find({"category": "interactive"})
-
-    for history_record in history_files:
-        scene = scenes_collection.find_one({"name": history_record["name"]})
-
-        #Download History file
-        bucket = s3.Bucket("evaluation-images")
-        history_file = "eval-resources-5/" + history_record["fullFilename"] + ".json"
-        basename = history_record["fullFilename"] + ".json"
-        print(f"Downloading {basename}")
-        bucket.download_file(history_file, basename)
-
-        history_item = load_json_file(basename)
-        scorecard = Scorecard(history_item, scene)
-        scorecard.calc_agent_interactions()
-
-        history_record["score"]["scorecard"]["interact_with_agent"] = scorecard.get_interact_with_agent()
-        results_collection.replace_one({"_id": history_record["_id"]}, history_record)
-        os.remove(basename)
+    print("Updated scorecard for successful agent interactions.")
 
 
-    print("Updated scorecard for successful agent interactions.")
+def migrate(mongoDB, batch_size=None, processes=None, **options):
+    rescore_interacted_with_agent(mongoDB, batch_size, processes)
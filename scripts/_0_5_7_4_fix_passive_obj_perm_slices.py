@@ -76,3 +76,7 @@ def update_slice_info_passive_obj_perm(mongoDB):
         )
 
         print("Updated slices/tags for object permanence results " + str(slice_id) + ".", result)
+
+
+def migrate(mongoDB, **options):
+    update_slice_info_passive_obj_perm(mongoDB)
@@ -54,3 +54,7 @@ def update_scorecard_fields(mongoDB):
 
 
     print("Updated scorecard fields from Eval 4.")
+
+
+def migrate(mongoDB, **options):
+    update_scorecard_fields(mongoDB)
@@ -1,74 +1,64 @@
 from scorecard import Scorecard
-import boto3
-import os
-import json
-import io
+from scripts.migration import (
+    Migration, MongoCheckpointStore, history_file_key, run_migration)
 
-s3 = boto3.resource('s3')
 
-def load_json_file(file_name: str) -> dict:
-    with io.open(
-            file_name,
-            mode='r',
-            encoding='utf-8-sig') as json_file:
-        return json.loads(json_file.read())
+def update_fastest_path(mongoDB, batch_size=None, processes=None):
+    store_path_properties(mongoDB, batch_size, processes)
+    rescore_fastest_path(mongoDB, batch_size, processes)
 
-def update_fastest_path(mongoDB):
-    store_path_properties(mongoDB)
-    rescore_fastest_path(mongoDB)
 
-def store_path_properties(mongoDB):
-    scenes_collection = mongoDB["eval_5_scenes"]
+def scene_debug_file_key(scene_record):
+    goal_id = scene_record["goal"]["sceneInfo"]["id"][0]
+    return ("eval-scenes-5/" + scene_record["name"] + "_" + goal_id +
+            "_debug.json")
 
-    category_types = ["lava", "holes"]
 
-    scene_files = scenes_collection.find({
-        "goal.sceneInfo.tertiaryType": { "$in": category_types}
-    })
-
-    for scene_record in scene_files:
-        #Download Scene file
-        goal_id = scene_record["goal"]["sceneInfo"]["id"][0]
-        scene_debug_name = scene_record["name"] + "_" + goal_id + "_debug"
-        bucket = s3.Bucket("evaluation-images")
-        scene_file = "eval-scenes-5/" + scene_debug_name + ".json"
-        scene_basename = scene_debug_name + ".json"
-        print(f"Downloading scene file {scene_basename}")
-        bucket.download_file(scene_file, scene_basename)
-
-        scene_item = load_json_file(scene_basename)
-        scene_record["path"] = scene_item["debug"]["path"]
-        if("slowPath" in scene_item["debug"]):
-            scene_record["slowPath"] = scene_item["debug"]["slowPath"]
-        scenes_collection.replace_one({"_id": scene_record["_id"]}, scene_record)
-        os.remove(scene_basename)
+def copy_path_properties(scene_record, scene, scene_item):
+    fields = {"path": scene_item["debug"]["path"]}
+    if("slowPath" in scene_item["debug"]):
+        fields["slowPath"] = scene_item["debug"]["slowPath"]
+    return fields
 
-    print("Updated holes and lava scenes with path and slowPath")
 
-def rescore_fastest_path(mongoDB):
-    results_collection = mongoDB["eval_5_results"]
-    scenes_collection = mongoDB["eval_5_scenes"]
+def rescore_history_fastest_path(history_record, scene, history_item):
+    scorecard = Scorecard(history_item, scene)
+    scorecard.calc_fastest_path()
+    return {"score.scorecard.fastest_path": scorecard.is_fastest_path}
 
+
+def store_path_properties(mongoDB, batch_size=None, processes=None):
     category_types = ["lava", "holes"]
-    history_files = results_collection.find({ "category_type": { "$in": category_types}})
 
-    for history_record in history_files:
-        scene = scenes_collection.find_one({"name": history_record["name"]})
+    run_migration(mongoDB, Migration(
+        "store_path_properties",
+        "eval_5_scenes",
+        {"goal.sceneInfo.tertiaryType": {"$in": category_types}},
+        copy_path_properties,
+        file_key=scene_debug_file_key,
+        batch_size=batch_size),
+        processes=processes,
+        checkpoints=MongoCheckpointStore(mongoDB))
 
-        #Download History file
-        bucket = s3.Bucket("evaluation-images")
-        history_file = "eval-resources-5/" + history_record["fullFilename"] + ".json"
-        hist_basename = history_record["fullFilename"] + ".json"
-        print(f"Downloading history file {hist_basename}")
-        bucket.download_file(history_file, hist_basename)
+    print("Updated holes and lava scenes with path and slowPath")
 
-        history_item = load_json_file(hist_basename)
-        scorecard = Scorecard(history_item, scene)
-        scorecard.calc_fastest_path()
 
-        history_record["score"]["scorecard"]["fastest_path"] = scorecard.is_fastest_path
-        results_collection.replace_one({"_id": history_record["_id"]}, history_record)
-        os.remove(hist_basename)
+def rescore_fastest_path(mongoDB, batch_size=None, processes=None):
+    category_types = ["lava", "holes"]
 
+    run_migration(mongoDB, Migration(
+        "rescore_fastest_path",
+        "eval_5_results",
+        {"category_type": {"$in": category_types}},
+        rescore_history_fastest_path,
+        scenes_collection="eval_5_scenes",
+        file_key=history_file_key("eval-resources-5"),
+        batch_size=batch_size),
+        processes=processes,
+        checkpoints=MongoCheckpointStore(mongoDB))
 
     print("Updated scorecard for fastest path.")
+
+
+def migrate(mongoDB, batch_size=None, processes=None, **options):
+    update_fastest_path(mongoDB, batch_size, processes)
@@ -77,3 +77,6 @@ def add_domain_type_field_scenes(mongoDB):
 
         print("Updated Domain Types for Eval Scenes " + str(eval_number) + ".")
 
+
+def migrate(mongoDB, **options):
+    add_domain_type_field_scenes(mongoDB)
@@ -22,4 +22,8 @@ def apply_correct_weighted_scores(mongoDB):
 
         results_collection.replace_one({"_id": history["_id"]}, history)
 
-    print("Completed updating weighted scoring for Evaluation 6 Results")
\ No newline at end of file
+    print("Completed updating weighted scoring for Evaluation 6 Results")
+
+
+def migrate(mongoDB, **options):
+    apply_correct_weighted_scores(mongoDB)
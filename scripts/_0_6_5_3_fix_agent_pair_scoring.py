@@ -24,4 +24,7 @@ def rescore_passive_agents(mongoDB, client, db_string):
                 client, db_string, paired_record)
 
         results_collection.replace_one({"_id": history_record["_id"]}, history_record)
-        
\ No newline at end of file
+
+
+def migrate(mongoDB, client, db_string, **options):
+    rescore_passive_agents(mongoDB, client, db_string)
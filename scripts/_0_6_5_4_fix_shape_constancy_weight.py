@@ -19,4 +19,8 @@ def correct_shape_constancy_weights(mongoDB):
         history["score"]["weighted_score_worth"] = weighted_score_worth
         history["score"]["weighted_confidence"] = weighted_confidence
 
-        results_collection.replace_one({"_id": history["_id"]}, history)
\ No newline at end of file
+        results_collection.replace_one({"_id": history["_id"]}, history)
+
+
+def migrate(mongoDB, **options):
+    correct_shape_constancy_weights(mongoDB)
@@ -33,3 +33,7 @@ def update_tool_use_test_types_and_scorecard(mongoDB):
     results_collection.update_many({"category_type": "tool use",
         "scene_goal_id": {"$regex": "3", "$options": 'i'}}, [{"$set": {"category_type": "asymmetric tool use"}}])
     print("Updated Results category type for tool use.")
+
+
+def migrate(mongoDB, **options):
+    update_tool_use_test_types_and_scorecard(mongoDB)
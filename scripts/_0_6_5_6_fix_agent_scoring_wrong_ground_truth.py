@@ -267,3 +267,7 @@ def rescore_agents_imitation(mongoDB, client, db_string):
             results_collection.replace_one({"_id": history_record["_id"]}, history_record)
 
     print("Completed looping through scene file names.")
+
+
+def migrate(mongoDB, client, db_string, **options):
+    rescore_agents_imitation(mongoDB, client, db_string)
@@ -67,4 +67,8 @@ def rescore_opics_imitation_task(mongoDB):
                 }
             }])
 
-        print("Update " + history_file_name + ".", result)    
+        print("Update " + history_file_name + ".", result)
+
+
+def migrate(mongoDB, **options):
+    rescore_opics_imitation_task(mongoDB)
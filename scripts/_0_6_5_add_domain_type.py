@@ -84,3 +84,7 @@ def add_domain_type_field(mongoDB):
         scenes_collection.create_index([("domain_type", 1), ("metadata", 1)])
         
         print("Created Domain Type Indexes for Eval " + str(eval_number) + ".")
+
+
+def migrate(mongoDB, **options):
+    add_domain_type_field(mongoDB)
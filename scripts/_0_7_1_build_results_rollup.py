@@ -0,0 +1,12 @@
+import results_rollup
+
+
+def build_results_rollup(mongoDB):
+    for collection_name in results_rollup.results_collections(mongoDB):
+        results_rollup.rebuild_rollup(mongoDB, collection_name)
+
+    print("Built the results rollups")
+
+
+def migrate(mongoDB, **options):
+    build_results_rollup(mongoDB)
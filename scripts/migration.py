@@ -0,0 +1,498 @@
+import json
+import logging
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterator, List
+
+from bson import json_util
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+import s3_cache
+
+"""
+Shared runner for migrations that rescore or rewrite existing documents.
+A migration declares the documents to select and a transform, the runner
+walks the collection in _id order one batch at a time, prefetching the
+S3 file of every document on a thread pool and the scenes of the whole
+batch with one $in query, runs the transforms on a process pool and
+writes the changed fields back with $set bulk updates.  Migrations that
+only move or convert fields within a document use FieldMigration instead,
+which runs entirely on the server.
+
+Downloads go through the shared S3 disk cache when MCS_S3_CACHE_DIR is
+set, so rerunning a migration does not pull the same files again.
+
+With a checkpoint store the last _id written is saved after every batch,
+so an interrupted migration restarts where it stopped.  Transforms only
+$set fields, so redoing the batch that was in flight is harmless.  The
+_ids of the documents that failed are saved too, and a rerun retries
+them, even once the migration has completed.
+
+"""
+BUCKET = "evaluation-images"
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_DOWNLOAD_WORKERS = 16
+CHECKPOINT_COLLECTION = "migration_checkpoints"
+
+
+class Migration:
+    '''The documents of collection matching query are passed to
+    transform(record, scene, data), which returns a dict of (dotted)
+    fields to $set, or None to leave the document alone.  scene is the
+    document from scenes_collection with the record's name, and data is
+    the JSON of the S3 object file_key(record) returns (each None when
+    not asked for).  Transforms run in other processes, so they need to
+    be module level functions.'''
+
+    def __init__(
+            self,
+            name: str,
+            collection: str,
+            query: dict,
+            transform: Callable[[dict, dict, dict], dict],
+            scenes_collection: str = None,
+            file_key: Callable[[dict], str] = None,
+            bucket: str = BUCKET,
+            batch_size: int = DEFAULT_BATCH_SIZE):
+        self.name = name
+        self.collection = collection
+        self.query = query
+        self.transform = transform
+        self.scenes_collection = scenes_collection
+        self.file_key = file_key
+        self.bucket = bucket
+        self.batch_size = batch_size or DEFAULT_BATCH_SIZE
+
+
+class MongoCheckpointStore:
+    '''Checkpoints as documents in a collection, one per migration'''
+
+    def __init__(self, mongoDB, collection: str = CHECKPOINT_COLLECTION):
+        self.collection = mongoDB[collection]
+
+    def load(self, name: str) -> dict:
+        return self.collection.find_one({"_id": name})
+
+    def save(self, name: str, checkpoint: dict) -> None:
+        self.collection.replace_one(
+            {"_id": name}, dict(checkpoint, _id=name), upsert=True)
+
+    def clear(self, name: str) -> None:
+        self.collection.delete_one({"_id": name})
+
+
+class FileCheckpointStore:
+    '''Checkpoints in a local JSON file, for runs against a database the
+    migration should not write anything else to'''
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as checkpoint_file:
+            return json_util.loads(checkpoint_file.read())
+
+    def load(self, name: str) -> dict:
+        return self.read().get(name)
+
+    def save(self, name: str, checkpoint: dict) -> None:
+        checkpoints = self.read()
+        checkpoints[name] = checkpoint
+        self.write(checkpoints)
+
+    def clear(self, name: str) -> None:
+        checkpoints = self.read()
+        if checkpoints.pop(name, None) is not None:
+            self.write(checkpoints)
+
+    def write(self, checkpoints: dict) -> None:
+        # Write then rename, so a kill mid write keeps the old checkpoint
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as checkpoint_file:
+            checkpoint_file.write(json_util.dumps(checkpoints, indent=2))
+        os.replace(temp_path, self.path)
+
+
+class FieldMigration:
+    '''Moves, converts or removes fields within each document matching
+    query.  It runs on the server as one update_many with an aggregation
+    pipeline, so nothing is read into Python.  set_fields values are
+    pipeline expressions ("$field" for another field of the document,
+    to_int(field) to convert one), all evaluated against the document
+    as it was before the update.'''
+
+    def __init__(
+            self,
+            name: str,
+            collection: str,
+            query: dict,
+            set_fields: dict = None,
+            unset_fields: List[str] = None):
+        self.name = name
+        self.collection = collection
+        self.query = query
+        self.set_fields = set_fields or {}
+        self.unset_fields = unset_fields or []
+
+    def pipeline(self) -> list:
+        pipeline = []
+        if self.set_fields:
+            pipeline.append({"$set": self.set_fields})
+        if self.unset_fields:
+            pipeline.append({"$unset": self.unset_fields})
+        return pipeline
+
+
+def to_int(field: str) -> dict:
+    return {"$toInt": "$" + field}
+
+
+def rename_fields(renames: dict) -> tuple:
+    '''(set_fields, unset_fields) moving each old field to its new name'''
+    return (
+        {new: "$" + old for old, new in renames.items()},
+        list(renames.keys()))
+
+
+def run_field_migration(
+        mongoDB,
+        field_migration: FieldMigration,
+        dry_run: bool = False) -> dict:
+    '''With dry_run only counts the documents that would be updated'''
+    start = time.perf_counter()
+    collection = mongoDB[field_migration.collection]
+    report = {"migration": field_migration.name, "dry_run": dry_run}
+    if dry_run:
+        report["matched"] = collection.count_documents(field_migration.query)
+        report["modified"] = 0
+    else:
+        result = collection.update_many(
+            field_migration.query, field_migration.pipeline())
+        report["matched"] = result.matched_count
+        report["modified"] = result.modified_count
+    report["seconds"] = round(time.perf_counter() - start, 2)
+    logging.info(
+        f"{field_migration.name}: {report['matched']} matched, "
+        f"{report['modified']} modified"
+        f"{' (dry run)' if dry_run else ''} in {report['seconds']}s")
+    return report
+
+
+def history_file_key(folder: str) -> Callable[[dict], str]:
+    '''The S3 key of a result document's history file, in folder'''
+    def file_key(record: dict) -> str:
+        return f"{folder}/{record['fullFilename']}.json"
+    return file_key
+
+
+def iterate_batches(
+        collection,
+        query: dict,
+        batch_size: int,
+        last_id=None) -> Iterator[List[dict]]:
+    '''Batches of matching documents in _id order.  Each batch is a new
+    query starting after the last _id, so there is no long lived cursor
+    to time out.'''
+    while True:
+        batch_query = query
+        if last_id is not None:
+            batch_query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+        batch = list(collection.find(batch_query).sort(
+            "_id", 1).limit(batch_size))
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]["_id"]
+
+
+def fetch_json(s3_client, bucket: str, key: str, cache=None) -> dict:
+    if cache is not None:
+        return cache.read_json(bucket, key)
+    body = s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+    return json.loads(body.decode("utf-8-sig"))
+
+
+def find_scenes(scenes, names: List[str]) -> dict:
+    '''Scenes by name, the first found for each like find_one'''
+    found = {}
+    for scene in scenes.find({"name": {"$in": list(set(names))}}):
+        found.setdefault(scene["name"], scene)
+    return found
+
+
+def apply_transform(arguments: tuple) -> tuple:
+    '''Returns (fields to set, error) for one document'''
+    transform, record, scene, data = arguments
+    try:
+        return transform(record, scene, data), None
+    except Exception as error:
+        return None, repr(error)
+
+
+class MigrationRunner:
+    def __init__(
+            self,
+            mongoDB,
+            migration: Migration,
+            s3_client=None,
+            download_workers: int = DEFAULT_DOWNLOAD_WORKERS,
+            processes: int = None,
+            checkpoints=None,
+            restart: bool = False):
+        self.mongoDB = mongoDB
+        self.migration = migration
+        self.cache = None
+        if migration.file_key is not None:
+            if s3_client is None:
+                import boto3
+                s3_client = boto3.client("s3")
+            self.cache = s3_cache.cache_from_env(s3_client)
+        self.s3_client = s3_client
+        self.download_workers = download_workers
+        self.processes = processes or os.cpu_count()
+        self.report = {
+            "migration": migration.name,
+            "matched": 0,
+            "updated": 0,
+            "unchanged": 0,
+            "failed": []
+        }
+        self.checkpoints = checkpoints
+        self.restart = restart
+        self.last_id = None
+        self.completed = False
+        # _ids of the documents that failed, retried by the next run, and
+        #   of those this run is still to retry
+        self.failed_ids = []
+        self.retrying = []
+
+    def prefetch(self, batch: List[dict], download_pool) -> tuple:
+        '''Start the downloads of a batch and find its scenes'''
+        downloads = [None] * len(batch)
+        if self.migration.file_key is not None:
+            downloads = [
+                download_pool.submit(
+                    fetch_json, self.s3_client, self.migration.bucket,
+                    self.migration.file_key(record), self.cache)
+                for record in batch]
+        scenes = {}
+        if self.migration.scenes_collection is not None:
+            scenes = find_scenes(
+                self.mongoDB[self.migration.scenes_collection],
+                [record["name"] for record in batch])
+        return batch, downloads, scenes
+
+    def transform_batch(self, prefetched: tuple, transform_pool) -> tuple:
+        '''Returns the updates and the records they are for'''
+        batch, downloads, scenes = prefetched
+        arguments = []
+        records = []
+        for record, download in zip(batch, downloads):
+            try:
+                data = download.result() if download else None
+            except Exception as error:
+                self.fail(record, f"download failed: {error!r}")
+                continue
+            records.append(record)
+            arguments.append((
+                self.migration.transform, record,
+                scenes.get(record.get("name")), data))
+
+        if transform_pool is None:
+            results = map(apply_transform, arguments)
+        else:
+            results = transform_pool.map(
+                apply_transform, arguments,
+                chunksize=max(1, len(arguments) // (self.processes * 4)))
+
+        updates = []
+        updated = []
+        for record, (fields, error) in zip(records, results):
+            if error is not None:
+                self.fail(record, error)
+            elif fields:
+                updates.append(UpdateOne(
+                    {"_id": record["_id"]}, {"$set": fields}))
+                updated.append(record)
+            else:
+                self.report["unchanged"] += 1
+        return updates, updated
+
+    def fail(self, record: dict, error: str) -> None:
+        logging.warning(
+            f"{self.migration.name}: {record['_id']} failed: {error}")
+        self.report["failed"].append(
+            {"_id": str(record["_id"]), "error": error})
+        self.failed_ids.append(record["_id"])
+
+    def write(self, updates: list, records: list, last_id) -> None:
+        '''An update the server rejects fails its document, like a failed
+        transform, and the batch is still checkpointed'''
+        if updates:
+            errors = []
+            try:
+                result = self.mongoDB[self.migration.collection].bulk_write(
+                    updates, ordered=False)
+                modified = result.modified_count
+            except BulkWriteError as error:
+                modified = error.details["nModified"]
+                errors = error.details["writeErrors"]
+            for write_error in errors:
+                self.fail(records[write_error["index"]], write_error["errmsg"])
+            self.report["updated"] += modified
+            self.report["unchanged"] += len(updates) - modified - len(errors)
+        if last_id is not None:
+            self.last_id = last_id
+        self.save_checkpoint()
+
+    def write_batch(
+            self,
+            prefetched: tuple,
+            transform_pool,
+            start: float,
+            retry: bool = False) -> None:
+        '''Retried documents were already matched, and do not move the
+        checkpoint'''
+        batch = prefetched[0]
+        if retry:
+            self.forget_failures([record["_id"] for record in batch])
+        else:
+            self.report["matched"] += len(batch)
+        updates, records = self.transform_batch(prefetched, transform_pool)
+        self.report["seconds"] = round(time.perf_counter() - start, 2)
+        self.write(updates, records, None if retry else batch[-1]["_id"])
+
+    def write_batches(
+            self,
+            batches: Iterator[List[dict]],
+            download_pool,
+            transform_pool,
+            start: float,
+            retry: bool = False) -> None:
+        # The next batch downloads while this one is transformed
+        pending = None
+        for batch in batches:
+            prefetched = self.prefetch(batch, download_pool)
+            if pending is not None:
+                self.write_batch(pending, transform_pool, start, retry)
+            pending = prefetched
+        if pending is not None:
+            self.write_batch(pending, transform_pool, start, retry)
+
+    def forget_failures(self, ids: list) -> None:
+        '''Take documents being retried off the failed list, they are
+        added back if they fail again'''
+        retried = set(ids)
+        self.retrying = [_id for _id in self.retrying if _id not in retried]
+        retried = set(str(_id) for _id in ids)
+        self.report["failed"] = [
+            failure for failure in self.report["failed"]
+            if failure["_id"] not in retried]
+
+    def retry_failed(
+            self,
+            download_pool,
+            transform_pool,
+            start: float) -> None:
+        '''Retry the documents that failed in earlier runs'''
+        self.retrying = self.failed_ids
+        self.failed_ids = []
+        self.report["retried"] = (
+            self.report.get("retried", 0) + len(self.retrying))
+        logging.info(
+            f"Retrying {len(self.retrying)} failed {self.migration.name} "
+            "documents")
+        self.write_batches(
+            iterate_batches(
+                self.mongoDB[self.migration.collection],
+                {"$and": [
+                    self.migration.query,
+                    {"_id": {"$in": list(self.retrying)}}]},
+                self.migration.batch_size),
+            download_pool, transform_pool, start, retry=True)
+        # Those left no longer match the query, so need no migrating
+        self.forget_failures(list(self.retrying))
+
+    def save_checkpoint(self) -> None:
+        if self.checkpoints is not None:
+            self.checkpoints.save(self.migration.name, {
+                "last_id": self.last_id,
+                "completed": self.completed,
+                "failed_ids": self.failed_ids + self.retrying,
+                "report": self.report
+            })
+
+    def resume(self) -> bool:
+        '''Pick up from the checkpoint, returns False when the migration
+        has already completed without failures'''
+        if self.checkpoints is None:
+            return True
+        if self.restart:
+            self.checkpoints.clear(self.migration.name)
+            return True
+        checkpoint = self.checkpoints.load(self.migration.name)
+        if checkpoint is None:
+            return True
+        self.report = checkpoint["report"]
+        self.completed = checkpoint["completed"]
+        self.failed_ids = checkpoint.get("failed_ids", [])
+        self.last_id = checkpoint["last_id"]
+        if self.completed:
+            if not self.failed_ids:
+                logging.info(f"{self.migration.name} has already completed")
+                return False
+            return True
+        self.report["resumed_from"] = self.last_id
+        logging.info(f"Resuming {self.migration.name} after {self.last_id}")
+        return True
+
+    def run(self) -> dict:
+        if not self.resume():
+            return self.report
+        start = time.perf_counter() - self.report.get("seconds", 0)
+        collection = self.mongoDB[self.migration.collection]
+        transform_pool = (
+            ProcessPoolExecutor(self.processes) if self.processes > 1
+            else None)
+        try:
+            with ThreadPoolExecutor(self.download_workers) as download_pool:
+                if self.failed_ids:
+                    self.retry_failed(download_pool, transform_pool, start)
+                if not self.completed:
+                    self.write_batches(
+                        iterate_batches(
+                            collection, self.migration.query,
+                            self.migration.batch_size, self.last_id),
+                        download_pool, transform_pool, start)
+        finally:
+            if transform_pool is not None:
+                transform_pool.shutdown()
+
+        self.report["seconds"] = round(time.perf_counter() - start, 2)
+        self.completed = True
+        self.save_checkpoint()
+        logging.info(
+            f"{self.migration.name}: {self.report['matched']} matched, "
+            f"{self.report['updated']} updated, "
+            f"{self.report['unchanged']} unchanged, "
+            f"{len(self.report['failed'])} failed in "
+            f"{self.report['seconds']}s")
+        return self.report
+
+
+def run_migration(
+        mongoDB,
+        migration: Migration,
+        s3_client=None,
+        download_workers: int = DEFAULT_DOWNLOAD_WORKERS,
+        processes: int = None,
+        checkpoints=None,
+        restart: bool = False) -> dict:
+    return MigrationRunner(
+        mongoDB, migration, s3_client, download_workers, processes,
+        checkpoints, restart).run()
@@ -0,0 +1,115 @@
+import json
+import os
+import tempfile
+import unittest
+import zipfile
+
+import mongomock
+
+from eval1 import create_json_ingest
+
+
+def mongomock_database():
+    """ The database of each worker, which only the worker sees """
+    return mongomock.MongoClient()["mcs"]
+
+
+def write_submission(folder, name, answers, locations=True):
+    with zipfile.ZipFile(os.path.join(folder, name + ".zip"), "w") as zf:
+        zf.writestr("description.json", json.dumps(
+            {"Performer": "TA1 group", "Submission": name}))
+        zf.writestr("answer.txt", "".join(
+            "{} {}\n".format(scene, value) for scene, value in answers))
+        zf.writestr("location.txt", "".join(
+            "{} 10 20 30\n".format(scene) for scene, _ in answers
+            if locations))
+        for scene, value in answers:
+            zf.writestr("voe_{}.txt".format(scene.replace("/", "_")),
+                        "1 0.5\n2 {}\n".format(value))
+
+
+class TestCreateJsonIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        folder = self.directory.name
+        with open(os.path.join(folder, "metadata.json"), "w") as f:
+            json.dump({"O1": {"0001": {
+                "num_objects": 2, "complexity": "dynamic", "occluder": 1}}},
+                f)
+        scenes = ["O1/0001/{}".format(scene) for scene in "1234"]
+        with open(os.path.join(folder, "ground_truth.txt"), "w") as f:
+            f.write("".join("{} {}\n".format(scene, index % 2)
+                            for index, scene in enumerate(scenes)))
+        write_submission(folder, "submission_0", [
+            (scene, 0.25) for scene in scenes])
+        write_submission(folder, "submission_1", [
+            (scene, 0.75) for scene in scenes[:3]])
+        self.mongoDB = mongomock.MongoClient()["mcs"]
+
+    def test_process_in_batches(self):
+        creator = create_json_ingest.JsonImportCreator(
+            self.directory.name, batch_size=3, mongoDB=self.mongoDB)
+        creator.process()
+        self.assertEqual(creator.object_id, 7)
+
+        collection = self.mongoDB[create_json_ingest.config["index_name"]]
+        document = collection.find_one(
+            {"submission": "submission_1", "scene": "2"}, {"_id": 0})
+        self.assertEqual(document["performer_submission"], "TA1-submission_1")
+        self.assertEqual(document["num_objects"], 2)
+        self.assertEqual(document["ground_truth"], 1.0)
+        self.assertEqual(document["plaus_int_round"], 1)
+        self.assertEqual(document["mse_loss"], 0.0625)
+        self.assertEqual(document["mse_loss_int_round"], 0.0)
+        self.assertEqual(document["voe_signal"], {"1": 0.5, "2": 0.75})
+        self.assertEqual(document["voe_signal_list"][1],
+                         {"frame": "2", "value": 0.75})
+        self.assertEqual(
+            (document["location_frame"], document["location_x"],
+             document["location_y"]), (10, 20, 30))
+        self.assertEqual(
+            document["url_string"],
+            "perf=TA1 group&subm=submission_1&block=O1&test=0001")
+
+    def test_missing_ground_truth_and_location(self):
+        write_submission(self.directory.name, "submission_2", [
+            ("O1/0001/5", 0.5)], locations=False)
+        creator = create_json_ingest.JsonImportCreator(
+            self.directory.name, mongoDB=self.mongoDB)
+        creator.process_submission(
+            os.path.join(self.directory.name, "submission_2.zip"))
+
+        collection = self.mongoDB[create_json_ingest.config["index_name"]]
+        document = collection.find_one({"submission": "submission_2"})
+        self.assertEqual(document["ground_truth"], 0.0)
+        self.assertEqual(
+            (document["location_frame"], document["location_x"],
+             document["location_y"]), (0, 0, 0))
+
+    def test_missing_metadata_writes_nothing(self):
+        write_submission(self.directory.name, "submission_2", [
+            ("O1/0001/1", 0.5), ("O1/0002/1", 0.5)])
+        creator = create_json_ingest.JsonImportCreator(
+            self.directory.name, batch_size=1, mongoDB=self.mongoDB)
+        with self.assertRaises(KeyError):
+            creator.process_submission(
+                os.path.join(self.directory.name, "submission_2.zip"))
+        collection = self.mongoDB[create_json_ingest.config["index_name"]]
+        self.assertEqual(collection.count_documents({}), 0)
+
+    def test_process_with_workers(self):
+        creator = create_json_ingest.JsonImportCreator(
+            self.directory.name, batch_size=3,
+            mongo_factory=mongomock_database)
+        creator.process(workers=2)
+        self.assertEqual(creator.object_id, 7)
+
+        # The workers wrote to their own databases
+        collection = creator.mongoDB[create_json_ingest.config["index_name"]]
+        self.assertEqual(collection.count_documents({}), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
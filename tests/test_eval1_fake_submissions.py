@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+import unittest
+import zipfile
+
+import mongomock
+import numpy as np
+
+from eval1 import create_json_ingest
+from eval1.create_fake_submissions import SubmissionCreator, format_values
+
+
+class TestFakeSubmissions(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.folder = self.directory.name
+
+    def read(self, name, member):
+        with zipfile.ZipFile(os.path.join(self.folder, name)) as my_zip:
+            return my_zip.read(member).decode()
+
+    def test_format_values(self):
+        values = np.array([0.0, 0.123456, 0.5, 1.0, 0.9999999])
+        self.assertEqual(
+            [bytes(digits).decode() for digits in format_values(values)],
+            ["{:f}".format(value) for value in values])
+
+    def test_same_seed_same_submissions(self):
+        SubmissionCreator(2, seed=5, folder=self.folder, tests=2)
+        answer = self.read("submission_1.zip", "answer.txt")
+        voe = self.read("submission_1.zip", "voe_O2_0001_3.txt")
+        SubmissionCreator(2, seed=5, folder=self.folder, tests=2, workers=2)
+        self.assertEqual(self.read("submission_1.zip", "answer.txt"), answer)
+        self.assertEqual(
+            self.read("submission_1.zip", "voe_O2_0001_3.txt"), voe)
+        self.assertNotEqual(
+            self.read("submission_0.zip", "answer.txt"), answer)
+
+    def test_voe_ends_at_answer(self):
+        SubmissionCreator(1, folder=self.folder, tests=2)
+        answers = dict(
+            line.split() for line in
+            self.read("submission_0.zip", "answer.txt").splitlines())
+        self.assertEqual(len(answers), 3 * 2 * 4)
+        for scene, answer in answers.items():
+            lines = self.read(
+                "submission_0.zip",
+                "voe_" + scene.replace("/", "_") + ".txt").splitlines()
+            values = [float(line.split()[1]) for line in lines]
+            self.assertEqual(len(values), 100)
+            self.assertEqual(values[:20], [1.0] * 20)
+            self.assertEqual(lines[-1], "100 " + answer)
+            self.assertEqual(values, sorted(values, reverse=True))
+
+    def test_ingest(self):
+        SubmissionCreator(2, folder=self.folder, tests=2, performers=2)
+        with open(os.path.join(self.folder, "metadata.json"), "w") as f:
+            json.dump({"O{}".format(block): {"{:04d}".format(test): {
+                "num_objects": 1, "complexity": "static", "occluder": 0}
+                for test in (1, 2)} for block in (1, 2, 3)}, f)
+        with open(os.path.join(self.folder, "ground_truth.txt"), "w") as f:
+            for line in self.read(
+                    "submission_0.zip", "answer.txt").splitlines():
+                f.write("{} 1\n".format(line.split()[0]))
+
+        mongoDB = mongomock.MongoClient()["mcs"]
+        creator = create_json_ingest.JsonImportCreator(
+            self.folder, mongoDB=mongoDB)
+        creator.process()
+        self.assertEqual(creator.object_id, 48)
+        self.assertEqual(
+            sorted(mongoDB[create_json_ingest.config["index_name"]].distinct(
+                "performer")), ["TA1_group_0", "TA1_group_1"])
+
+
+if __name__ == '__main__':
+    unittest.main()
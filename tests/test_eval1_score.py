@@ -0,0 +1,89 @@
+import itertools
+import random
+import unittest
+
+from eval1 import mcs_score, score
+from eval1.score_arrays import MOVIES, ScoreArrays, rank_auc
+
+
+def pairwise_auc(y_true, y_score):
+    '''The probability a positive outscores a negative, ties count half'''
+    positives = [s for t, s in zip(y_true, y_score) if t == 1]
+    negatives = [s for t, s in zip(y_true, y_score) if t != 1]
+    wins = sum(
+        1.0 if p > n else 0.5 if p == n else 0.0
+        for p, n in itertools.product(positives, negatives))
+    return wins / (len(positives) * len(negatives))
+
+
+def loop_relative(submitted, reference):
+    '''The original per scene loop'''
+    errors = 0
+    for scene in reference:
+        pos = sum(submitted[scene][k] for k in MOVIES
+                  if reference[scene][k] == 1)
+        imp = sum(submitted[scene][k] for k in MOVIES
+                  if reference[scene][k] != 1)
+        errors += pos < imp
+    return errors / len(submitted)
+
+
+def fake_answers(rng, scenes=60):
+    submitted, reference = {}, {}
+    for index in range(scenes):
+        scene = 'O{}/{}/{:04d}'.format(
+            1 + index % 3, ('visible', 'occluded')[index // 3 % 2], index)
+        possible = rng.sample(MOVIES, 2)
+        reference[scene] = {k: 1 if k in possible else 0 for k in MOVIES}
+        # rounded so that some scores tie
+        submitted[scene] = {k: round(rng.random(), 1) for k in MOVIES}
+    return submitted, reference
+
+
+class TestEval1Score(unittest.TestCase):
+
+    def test_rank_auc_matches_pairwise(self):
+        rng = random.Random(3)
+        for _ in range(20):
+            y_true = [rng.randint(0, 1) for _ in range(30)] + [0, 1]
+            y_score = [round(rng.random(), 1) for _ in range(32)]
+            self.assertAlmostEqual(
+                rank_auc(y_true, y_score), pairwise_auc(y_true, y_score))
+        with self.assertRaises(ValueError):
+            rank_auc([1, 1], [0.2, 0.4])
+
+    def test_score_matches_per_block_loops(self):
+        submitted, reference = fake_answers(random.Random(7))
+        scores = score.score(submitted, reference)
+        self.assertEqual(mcs_score.score(submitted, reference), scores)
+
+        for block in ('O1', 'O2', 'O3'):
+            for category in ('visible', 'occluded', 'all'):
+                sub = {k: v for k, v in submitted.items()
+                       if block in k and (category == 'all' or category in k)}
+                ref = {k: reference[k] for k in sub}
+                y_true = [ref[k][m] for k in sorted(ref) for m in MOVIES]
+                y_score = [sub[k][m] for k in sorted(sub) for m in MOVIES]
+                self.assertAlmostEqual(
+                    scores[block][category]['relative'],
+                    loop_relative(sub, ref))
+                self.assertAlmostEqual(
+                    scores[block][category]['absolute'],
+                    1.0 - pairwise_auc(y_true, y_score))
+
+    def test_reference_is_reused(self):
+        rng = random.Random(11)
+        _, reference = fake_answers(rng)
+        arrays = ScoreArrays(reference)
+        for _ in range(3):
+            submitted, _ = fake_answers(rng)
+            self.assertEqual(
+                arrays.score(submitted), score.score(submitted, reference))
+        self.assertEqual(
+            score.score_per_block(submitted, reference)['all'],
+            {'relative': score._score_relative(submitted, reference),
+             'absolute': score._score_absolute(submitted, reference)})
+
+
+if __name__ == '__main__':
+    unittest.main()
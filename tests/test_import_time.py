@@ -0,0 +1,43 @@
+import json
+import subprocess
+import sys
+import unittest
+
+# Slow to import, these should only be loaded when they are used
+LAZY_MODULES = ["pandas", "shapely", "machine_common_sense"]
+
+
+def imported_modules(module: str) -> list:
+    '''Import a module in a fresh interpreter and return the modules
+    that ended up being loaded.'''
+    result = subprocess.run(
+        [sys.executable, "-c",
+         f"import json, sys, {module}; print(json.dumps(list(sys.modules)))"],
+        capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+class TestImportTime(unittest.TestCase):
+
+    def assert_lazy(self, module: str):
+        modules = imported_modules(module)
+        for lazy_module in LAZY_MODULES:
+            self.assertNotIn(lazy_module, modules)
+
+    def test_history_ingest_is_lazy(self):
+        self.assert_lazy("mcs_history_ingest")
+
+    def test_scorecard_is_lazy(self):
+        self.assert_lazy("run_scorecard")
+
+    def test_automated_ingest_is_lazy(self):
+        # Also checks no AWS calls are made, the import would fail
+        #   without credentials otherwise
+        self.assert_lazy("mcs_automated_ingest")
+
+    def test_media_convert_makes_no_aws_calls(self):
+        imported_modules("mcs_automated_media_convert")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from collections import Counter
+
+import mongomock
+
+from scripts import index_advisor
+
+
+def saved_query(*conditions):
+    return {"queryObj": [
+        {"fieldType": collection, "propertyField": field,
+         "functionOperator": operator}
+        for collection, field, operator in conditions]}
+
+
+class TestIndexAdvisor(unittest.TestCase):
+
+    def setUp(self):
+        self.mongoDB = mongomock.MongoClient()["mcs"]
+        for collection in ["eval_5_results", "eval_6_results"]:
+            self.mongoDB[collection].insert_one({"name": "scene"})
+
+    def test_filter_fields(self):
+        equality, range_fields = index_advisor.filter_fields({
+            "performer": "OPICS",
+            "test_type": {"$in": ["agents", "passive"]},
+            "$and": [{"score.score": {"$gte": 1}}, {"metadata": "level2"}],
+            "$or": [{"a": 1}, {"b": 1}]
+        })
+        self.assertEqual(equality, ["performer", "test_type", "metadata"])
+        self.assertEqual(range_fields, ["score.score"])
+
+    def test_profile_shape(self):
+        shape = index_advisor.profile_shape({
+            "op": "command",
+            "ns": "mcs.eval_6_results",
+            "command": {"aggregate": "eval_6_results", "pipeline": [
+                {"$match": {"performer": "OPICS",
+                            "fileTimestamp": {"$gt": "1"}}},
+                {"$sort": {"name": 1}},
+                {"$group": {"_id": "$test_type"}}]}})
+        self.assertEqual(shape.collection, "eval_6_results")
+        self.assertEqual(shape.equality, ["performer"])
+        self.assertEqual(shape.sort, [("name", 1)])
+        self.assertEqual(shape.range_fields, ["fileTimestamp"])
+        self.assertEqual(
+            index_advisor.shape_index(shape, Counter()),
+            [("performer", 1), ("name", 1), ("fileTimestamp", 1)])
+        self.assertIsNone(index_advisor.profile_shape(
+            {"op": "command", "ns": "mcs.x", "command": {"dbStats": 1}}))
+
+    def test_minimal_covering_set(self):
+        shapes = [
+            index_advisor.QueryShape("eval_6_results", ["test_type"]),
+            index_advisor.QueryShape(
+                "eval_6_results", ["metadata", "test_type"]),
+            index_advisor.QueryShape(
+                "eval_6_results", ["test_type", "metadata"],
+                range_fields=["score.score"]),
+            index_advisor.QueryShape(
+                "eval_6_results", ["performer"], sort=[("name", -1)]),
+            index_advisor.QueryShape("eval_6_results", ["_id"]),
+            index_advisor.QueryShape("eval_5_results", ["category"]),
+        ]
+        proposals = index_advisor.propose_indexes(
+            shapes, {"eval_5_results": [[("category", 1), ("name", 1)]]})
+        self.assertEqual(proposals["eval_6_results"], [
+            ([("test_type", 1), ("metadata", 1), ("score.score", 1)], 3),
+            ([("performer", 1), ("name", -1)], 1)])
+        # Already served by the existing index
+        self.assertEqual(proposals["eval_5_results"], [])
+
+    def test_advise_and_apply(self):
+        self.mongoDB["savedQueries"].insert_many([
+            saved_query(
+                ("eval_6_results", "test_type", "equals"),
+                ("eval_6_results", "performer", "equals"),
+                ("eval_6_scenes", "goal.sceneInfo.id", "equals")),
+            saved_query(
+                ("eval_6_results", "test_type", "equals"),
+                ("eval_6_results", "score.score", "greater than")),
+            # Collection that no longer exists
+            saved_query(("mcs_history.Evaluation 2 Results", "name",
+                         "equals"))])
+        self.mongoDB["system.profile"].insert_one({
+            "op": "query",
+            "ns": "mcs.eval_5_results",
+            "command": {"find": "eval_5_results",
+                        "filter": {"metadata": "level1"},
+                        "sort": {"name": 1}}})
+
+        self.assertEqual(
+            index_advisor.advise(self.mongoDB),
+            {"eval_6_results": [
+                ([("test_type", 1), ("performer", 1)], 1),
+                ([("test_type", 1), ("score.score", 1)], 1)]})
+
+        proposals = index_advisor.advise(self.mongoDB, self.mongoDB)
+        self.assertEqual(
+            proposals["eval_5_results"],
+            [([("metadata", 1), ("name", 1)], 1)])
+        index_advisor.apply_indexes(self.mongoDB, proposals)
+        self.assertEqual(
+            index_advisor.advise(self.mongoDB, self.mongoDB),
+            {"eval_5_results": [], "eval_6_results": []})
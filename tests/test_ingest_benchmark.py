@@ -0,0 +1,49 @@
+import unittest
+
+import mcs_automated_ingest
+from benchmarks import ingest_benchmark
+
+
+class TestIngestBenchmark(unittest.TestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(ingest_benchmark.percentile(values, 50), 50)
+        self.assertEqual(ingest_benchmark.percentile(values, 99), 99)
+        self.assertEqual(ingest_benchmark.percentile([3], 99), 3)
+        self.assertEqual(ingest_benchmark.percentile([], 50), 0.0)
+
+    def test_run_benchmark(self):
+        try:
+            import mongomock  # noqa: F401
+        except ImportError:
+            self.skipTest("mongomock is not installed")
+        with self.assertLogs(level="INFO"):
+            results = ingest_benchmark.run_benchmark(
+                messages=4, records_per_message=2)
+        self.assertEqual(results["messages"], 2)
+        self.assertEqual(results["files"], 4)
+        self.assertEqual(results["errors"], 0)
+
+    def test_run_benchmark_restores_aws(self):
+        try:
+            import mongomock  # noqa: F401
+        except ImportError:
+            self.skipTest("mongomock is not installed")
+        s3 = mcs_automated_ingest.s3
+        error_queue = mcs_automated_ingest.error_queue
+        with self.assertLogs(level="INFO"):
+            ingest_benchmark.run_benchmark(messages=1)
+        self.assertIs(mcs_automated_ingest.s3, s3)
+        self.assertIs(mcs_automated_ingest.error_queue, error_queue)
+
+        # A run that cannot finish in time fails and still restores them
+        with self.assertLogs(level="INFO"):
+            with self.assertRaises(TimeoutError):
+                ingest_benchmark.run_benchmark(messages=1, timeout=-1)
+        self.assertIs(mcs_automated_ingest.s3, s3)
+        self.assertIs(mcs_automated_ingest.error_queue, error_queue)
+
+
+if __name__ == '__main__':
+    unittest.main()
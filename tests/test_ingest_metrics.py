@@ -0,0 +1,84 @@
+import json
+import unittest
+import urllib.request
+
+import ingest_metrics
+import mcs_history_ingest
+import mcs_scene_ingest
+from mcs_ingest import load_json_file
+
+TEST_FOLDER = "tests/test_data"
+
+
+class TestIngestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        ingest_metrics.REGISTRY.reset()
+
+    def test_histogram_render(self):
+        registry = ingest_metrics.MetricsRegistry()
+        registry.observe("test_seconds", 0.003, {"stage": "insert"})
+        registry.observe("test_seconds", 100, {"stage": "insert"})
+        registry.inc("test_total", {"status": "ok"})
+        text = registry.render()
+        self.assertIn('test_total{status="ok"} 1', text)
+        self.assertIn('test_seconds_bucket{stage="insert",le="0.001"} 0', text)
+        self.assertIn('test_seconds_bucket{stage="insert",le="0.005"} 1', text)
+        self.assertIn('test_seconds_bucket{stage="insert",le="60"} 1', text)
+        self.assertIn('test_seconds_bucket{stage="insert",le="+Inf"} 2', text)
+        self.assertIn('test_seconds_count{stage="insert"} 2', text)
+
+    def test_record_logs_stages(self):
+        with self.assertLogs(level="INFO") as logs:
+            with ingest_metrics.record("history") as timing:
+                timing["file"] = "file.json"
+                with ingest_metrics.stage("json_parse"):
+                    pass
+                with ingest_metrics.stage("insert"):
+                    pass
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line["file"], "file.json")
+        self.assertEqual(line["status"], "ok")
+        self.assertEqual(sorted(line["stages"]), ["insert", "json_parse"])
+        self.assertIn(
+            'mcs_ingest_files_total{status="ok",type="history"} 1',
+            ingest_metrics.REGISTRY.render())
+
+    def test_record_error(self):
+        with self.assertLogs(level="INFO"):
+            with ingest_metrics.record("scene"):
+                ingest_metrics.mark_error()
+            with self.assertRaises(ValueError):
+                with ingest_metrics.record("scene"):
+                    raise ValueError()
+        self.assertIn(
+            'mcs_ingest_files_total{status="error",type="scene"} 2',
+            ingest_metrics.REGISTRY.render())
+
+    def test_scorecard_metric_timings(self):
+        scene = mcs_scene_ingest.build_scene_item(
+            "occluders_0001_17_I1_debug.json", TEST_FOLDER)
+        history = load_json_file(
+            TEST_FOLDER, "occluders_0001_17_hist_updated.json")
+        mcs_history_ingest.calc_scorecard(history, scene)
+        text = ingest_metrics.REGISTRY.render()
+        self.assertIn(
+            'mcs_scorecard_metric_seconds_count{metric="calc_ramp_actions"} 1',
+            text)
+
+    def test_metrics_server(self):
+        ingest_metrics.REGISTRY.inc(ingest_metrics.FILES_TOTAL,
+                                    {"status": "ok", "type": "history"})
+        server = ingest_metrics.start_metrics_server(0)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url) as response:
+                text = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertIn("# TYPE mcs_ingest_files_total counter", text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import pstats
+import tempfile
+import unittest
+
+import ingest_profiling
+
+
+def busy_work():
+    return sum(i * i for i in range(1000))
+
+
+class TestIngestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_messages(self, profiler, basenames):
+        for basename in basenames:
+            with profiler.profile(basename):
+                busy_work()
+
+    def test_create_profiler_disabled(self):
+        self.assertIsNone(ingest_profiling.create_profiler(None, 5))
+        self.assertIsNone(ingest_profiling.create_profiler(self.output_dir))
+
+    def test_sample_every(self):
+        profiler = ingest_profiling.MessageProfiler(
+            self.output_dir, sample_every=2, use_sampling_profiler=False)
+        self.run_messages(
+            profiler, ["a.json", "b.json", "c.json", "d.json"])
+        self.assertEqual(
+            sorted(os.listdir(self.output_dir)), ["b.prof", "d.prof"])
+        stats = pstats.Stats(os.path.join(self.output_dir, "b.prof"))
+        self.assertTrue(any(
+            function[2] == "busy_work" for function in stats.stats))
+
+    def test_slow_seconds(self):
+        profiler = ingest_profiling.MessageProfiler(
+            self.output_dir, slow_seconds=0, use_sampling_profiler=False)
+        self.run_messages(profiler, ["path/to/slow.json"])
+        self.assertEqual(os.listdir(self.output_dir), ["slow.prof"])
+
+    def test_fast_messages_not_kept(self):
+        profiler = ingest_profiling.MessageProfiler(
+            self.output_dir, slow_seconds=60, use_sampling_profiler=False)
+        self.run_messages(profiler, ["a.json", "b.json"])
+        self.assertEqual(os.listdir(self.output_dir), [])
+        self.assertEqual(profiler.messages, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
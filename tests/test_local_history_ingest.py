@@ -0,0 +1,137 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import local_history_ingest
+import mcs_history_ingest
+from mcs_ingest import SceneCache
+
+
+def history_item(name, eval_name="Evaluation 6 Results"):
+    return {
+        "name": name,
+        "eval": eval_name,
+        "performer": "TA2 Baseline",
+        "metadata": "level2",
+        "fullFilename": name + "_history"
+    }
+
+
+class TestLocalHistoryIngest(unittest.TestCase):
+
+    def test_partition_files(self):
+        files = [f"file_{i:02d}.json" for i in range(10)]
+        partitions = local_history_ingest.partition_files(files, 3)
+        self.assertEqual([len(p) for p in partitions], [4, 3, 3])
+        self.assertEqual(sum(partitions, []), files)
+
+    def test_partition_files_keeps_runs_together(self):
+        # Two runs of scene_b would fall either side of the middle
+        files = [
+            "eval_6_scene_a-20240101-000000.json",
+            "eval_6_scene_b-20240101-000000.json",
+            "eval_6_scene_b-20240102-000000.json",
+            "eval_6_scene_c-20240101-000000.json"]
+        self.assertEqual(
+            local_history_ingest.history_file_key(files[2]),
+            "eval_6_scene_b")
+        partitions = local_history_ingest.partition_files(files, 2)
+        self.assertEqual(len(partitions), 2)
+        self.assertEqual(sum(partitions, []), files)
+        self.assertTrue(any(
+            files[1] in partition and files[2] in partition
+            for partition in partitions))
+        self.assertEqual(
+            local_history_ingest.partition_files(files[1:3], 2),
+            [files[1:3]])
+
+    def test_partition_files_more_workers_than_files(self):
+        partitions = local_history_ingest.partition_files(["a.json"], 4)
+        self.assertEqual(partitions, [["a.json"]])
+
+    def test_failed_manifest(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            manifest = os.path.join(tmp_dir, "failed.json")
+            local_history_ingest.write_failed_manifest(
+                manifest, tmp_dir, [{"file": "a.json", "error": "boom"}])
+            self.assertEqual(
+                local_history_ingest.read_failed_manifest(manifest),
+                ["a.json"])
+
+            # A run without failures cleans up the old manifest
+            local_history_ingest.write_failed_manifest(manifest, tmp_dir, [])
+            self.assertFalse(os.path.exists(manifest))
+
+
+class TestHistoryBulkWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.client = MagicMock()
+        self.collection = MagicMock()
+        self.collection.estimated_document_count.return_value = 5
+        self.rollup_collection = MagicMock()
+        self.client["mcs"].__getitem__.side_effect = lambda name: (
+            self.rollup_collection if name == "results_rollup"
+            else self.collection)
+
+    def test_writes_in_batches(self):
+        writer = mcs_history_ingest.HistoryBulkWriter(
+            self.client, "mcs", batch_size=2)
+        with patch("create_collection_keys.check_collection_has_key"):
+            writer.insert("eval_6_results", history_item("a"))
+            self.collection.bulk_write.assert_not_called()
+            writer.insert("eval_6_results", history_item("b"))
+            self.assertEqual(self.collection.bulk_write.call_count, 1)
+            writer.insert("eval_6_results", history_item("c"))
+            writer.flush()
+        self.assertEqual(self.collection.bulk_write.call_count, 2)
+        self.assertEqual(writer.written, 3)
+        self.assertEqual(writer.failed_files, [])
+        # One rollup update for each batch written
+        self.assertEqual(self.rollup_collection.bulk_write.call_count, 2)
+
+    def test_flush_if_pending(self):
+        writer = mcs_history_ingest.HistoryBulkWriter(self.client, "mcs")
+        with patch("create_collection_keys.check_collection_has_key"):
+            writer.insert("eval_6_results", history_item("a"))
+            writer.flush_if_pending("eval_6_results", history_item("b"))
+            self.collection.bulk_write.assert_not_called()
+            writer.flush_if_pending("eval_6_results", history_item("a"))
+        self.collection.bulk_write.assert_called_once()
+
+    def test_failed_write(self):
+        self.collection.bulk_write.side_effect = Exception("down")
+        writer = mcs_history_ingest.HistoryBulkWriter(self.client, "mcs")
+        writer.insert("eval_6_results", history_item("a"))
+        writer.flush()
+        self.assertEqual(writer.failed_files, ["a_history"])
+        self.assertEqual(writer.written, 0)
+        self.rollup_collection.bulk_write.assert_not_called()
+
+
+class TestSceneCache(unittest.TestCase):
+
+    def test_find_scene_queries_once(self):
+        client = MagicMock()
+        scenes = client["mcs"]["eval_6_scenes"]
+        scenes.find_one.return_value = {"name": "scene_1"}
+        cache = SceneCache(max_size=1)
+        with patch("mcs_ingest.get_scene_collection",
+                   return_value="eval_6_scenes") as get_collection:
+            for _ in range(3):
+                scene = cache.find_scene(
+                    "mcs", client, "Evaluation 6 Scenes", "scene_1")
+            self.assertEqual(scene, {"name": "scene_1"})
+            self.assertEqual(scenes.find_one.call_count, 1)
+            self.assertEqual(cache.hits, 2)
+
+            # Oldest scene is dropped once the cache is full
+            cache.find_scene("mcs", client, "Evaluation 6 Scenes", "scene_2")
+            cache.find_scene("mcs", client, "Evaluation 6 Scenes", "scene_1")
+            self.assertEqual(scenes.find_one.call_count, 3)
+            get_collection.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
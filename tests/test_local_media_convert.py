@@ -0,0 +1,68 @@
+import unittest
+
+import boto3
+from botocore.exceptions import ClientError
+from moto import mock_s3
+
+import mcs_automated_media_convert as mamc
+from local_media_convert import LocalMediaConvert
+
+
+def settings(source, destination="s3://videos/eval-resources-6/out"):
+    return mamc.job_settings(mamc.load_job_template(), source, destination)
+
+
+class TestLocalMediaConvert(unittest.TestCase):
+
+    def test_throttles_above_quota(self):
+        backend = LocalMediaConvert(latency=0, jobs_per_second=2)
+        backend.create_job(Role="role", Settings=settings("s3://b/a.mp4"))
+        backend.create_job(Role="role", Settings=settings("s3://b/b.mp4"))
+        with self.assertRaises(ClientError) as context:
+            backend.create_job(Role="role", Settings=settings("s3://b/c.mp4"))
+        self.assertTrue(mamc.is_throttling(context.exception))
+        self.assertEqual(backend.throttled, 1)
+
+    def test_request_token_returns_existing_job(self):
+        backend = LocalMediaConvert(latency=0)
+        first = backend.create_job(
+            Role="role", Settings=settings("s3://b/a.mp4"),
+            ClientRequestToken="token")
+        second = backend.create_job(
+            Role="role", Settings=settings("s3://b/a.mp4"),
+            ClientRequestToken="token")
+        self.assertEqual(first["Job"]["Id"], second["Job"]["Id"])
+        self.assertEqual(backend.counts(), {"SUBMITTED": 1})
+
+    @mock_s3
+    def test_jobs_finish_against_s3(self):
+        s3 = boto3.resource("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket="videos")
+        s3.Object("videos", "eval-videos-6/a.mp4").put(Body=b"")
+        backend = LocalMediaConvert(latency=0, s3=s3)
+
+        found = backend.create_job(
+            Role="role", Settings=settings("s3://videos/eval-videos-6/a.mp4"))
+        missing = backend.create_job(
+            Role="role", Settings=settings("s3://videos/eval-videos-6/b.mp4"))
+        self.assertEqual(backend.get_job(
+            Id=found["Job"]["Id"])["Job"]["Status"], "COMPLETE")
+        self.assertEqual(backend.get_job(
+            Id=missing["Job"]["Id"])["Job"]["Status"], "ERROR")
+        s3.Object("videos", "eval-resources-6/out.mp4").load()
+
+    def test_submitter_retries_throttled_jobs(self):
+        backend = LocalMediaConvert(latency=0, jobs_per_second=5)
+        submitter = mamc.MediaConvertSubmitter(
+            jobs_per_second=1000, workers=4, backend=backend)
+        records = [{"s3": {
+            "bucket": {"name": "b"},
+            "object": {"key": f"eval-videos-6/{index}.mp4", "eTag": "e"}}}
+            for index in range(8)]
+        self.assertEqual(submitter.submit_all(records, "prod"), ([], []))
+        self.assertEqual(backend.counts(), {"SUBMITTED": 8})
+        self.assertGreater(submitter.throttled, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,13 @@
 import unittest
 import boto3
 import os
+import tempfile
 
 from moto import mock_s3, mock_sqs
 from unittest.mock import patch
 
 import mcs_automated_ingest as mai
+import s3_cache
 
 class TestMcsAutomatedIngest(unittest.TestCase):
 
@@ -62,6 +64,37 @@ class TestMcsAutomatedIngest(unittest.TestCase):
         basename = mai.download_file(record)
         self.assertTrue(os.path.exists(basename))
 
+    @mock_s3
+    def test_download_file_cached(self):
+        s3 = boto3.client('s3', region_name='us-east-1')
+        s3.create_bucket(Bucket=self.test_bucket)
+        s3.put_object(
+            Bucket=self.test_bucket,
+            Key=self.test_file,
+            Body='{}'
+        )
+        etag = s3.head_object(
+            Bucket=self.test_bucket, Key=self.test_file)["ETag"]
+
+        record = {
+            "s3": {
+                "bucket": {"name": self.test_bucket},
+                "object": {"key": self.test_file, "eTag": etag.strip('"')}
+                }
+            }
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = s3_cache.S3Cache(cache_dir, s3)
+            mai.s3_file_cache = cache
+            try:
+                for _ in range(2):
+                    basename = mai.download_file(record)
+                    self.assertTrue(os.path.exists(basename))
+                    os.remove(basename)
+            finally:
+                mai.s3_file_cache = None
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
     def test_ingest_scene_file(self):
         '''Ensure scene ingest is called with SCENE_MESSAGE'''
         with patch("mcs_scene_ingest.automated_scene_ingest_file") as patched_function:
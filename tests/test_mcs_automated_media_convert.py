@@ -0,0 +1,115 @@
+import json
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from botocore.exceptions import ClientError
+
+import mcs_automated_media_convert as mamc
+
+THROTTLED = ClientError(
+    {"Error": {"Code": "TooManyRequestsException"}}, "CreateJob")
+
+
+def video_record(key="eval-videos-6/scene_0001_01_visual.mp4"):
+    return {
+        "s3": {
+            "bucket": {"name": "evaluation-images"},
+            "object": {"key": key, "eTag": "abc123"}
+        }
+    }
+
+
+class TestMcsAutomatedMediaConvert(unittest.TestCase):
+
+    def test_source_and_destination(self):
+        source, destination = mamc.source_and_destination(video_record())
+        self.assertEqual(
+            source,
+            "s3://evaluation-images/eval-videos-6/scene_0001_01_visual.mp4")
+        self.assertEqual(
+            destination,
+            "s3://evaluation-images/eval-resources-6/scene_0001_01_visual")
+
+    def test_job_settings_leaves_template_alone(self):
+        template = mamc.load_job_template()
+        settings = mamc.job_settings(template, "s3://b/in.mp4", "s3://b/out")
+        self.assertEqual(settings["Inputs"][0]["FileInput"], "s3://b/in.mp4")
+        self.assertEqual(
+            settings["OutputGroups"][0]["OutputGroupSettings"][
+                "FileGroupSettings"]["Destination"], "s3://b/out")
+        self.assertEqual(template, mamc.load_job_template())
+        # Fields that do not change are shared, not copied
+        self.assertIs(
+            settings["OutputGroups"][0]["Outputs"],
+            template["OutputGroups"][0]["Outputs"])
+
+    def test_submitter_reuses_clients(self):
+        submitter = mamc.MediaConvertSubmitter()
+        with patch("boto3.client") as create_client:
+            for _ in range(3):
+                submitter.submit(video_record(), "prod")
+            submitter.submit(video_record(), "dev")
+
+        self.assertEqual(create_client.call_count, 2)
+        client = create_client.return_value
+        self.assertEqual(client.create_job.call_count, 4)
+        settings = client.create_job.call_args.kwargs["Settings"]
+        self.assertEqual(
+            settings["Inputs"][0]["FileInput"],
+            "s3://evaluation-images/eval-videos-6/scene_0001_01_visual.mp4")
+
+    def test_token_bucket(self):
+        bucket = mamc.TokenBucket(50, capacity=1)
+        start = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        # The first is free, the next five wait 20ms each
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    @patch("mcs_automated_media_convert.backoff_seconds", return_value=0)
+    def test_throttled_jobs_are_retried(self, _):
+        submitter = mamc.MediaConvertSubmitter(jobs_per_second=1000)
+        client = MagicMock()
+        client.create_job.side_effect = [THROTTLED, THROTTLED, {"Job": {}}]
+        submitter.backend.clients[mamc.MEDIA_ENDPOINTS["prod"]] = client
+
+        self.assertEqual(
+            submitter.submit_all([video_record()], "prod"), ([], []))
+        self.assertEqual(client.create_job.call_count, 3)
+        self.assertEqual(submitter.throttled, 2)
+
+    @patch("mcs_automated_media_convert.backoff_seconds", return_value=0)
+    def test_failed_jobs_go_to_error_queue(self, _):
+        submitter = mamc.MediaConvertSubmitter(jobs_per_second=1000)
+        client = MagicMock()
+
+        def create_job(Settings, **kwargs):
+            source = Settings["Inputs"][0]["FileInput"]
+            if source.endswith("bad.mp4"):
+                raise ValueError("bad video")
+            if source.endswith("busy.mp4"):
+                raise THROTTLED
+            return {"Job": {}}
+        client.create_job.side_effect = create_job
+        submitter.backend.clients[mamc.MEDIA_ENDPOINTS["dev"]] = client
+
+        message = MagicMock()
+        message.body = json.dumps({"Records": [
+            video_record("eval-videos-6/good.mp4"),
+            video_record("eval-videos-6/bad.mp4"),
+            video_record("eval-videos-6/busy.mp4")]})
+        with patch.object(mamc, "submitter", submitter), \
+                patch.object(mamc, "media_error_queue") as error_queue:
+            mamc.process_messages([message], "dev")
+
+        failed = [
+            call.kwargs["MessageAttributes"]["file"]["StringValue"]
+            for call in error_queue.send_message.call_args_list]
+        self.assertEqual(failed, [
+            "s3://evaluation-images/eval-videos-6/bad.mp4",
+            "s3://evaluation-images/eval-videos-6/busy.mp4"])
+        # Only the throttled job is retried
+        self.assertEqual(
+            client.create_job.call_count, 2 + mamc.MAX_SUBMIT_ATTEMPTS)
+        message.delete.assert_called_once()
@@ -0,0 +1,19 @@
+import unittest
+
+from benchmarks import media_convert_benchmark
+
+
+class TestMediaConvertBenchmark(unittest.TestCase):
+
+    def test_run_benchmark(self):
+        results = media_convert_benchmark.run_benchmark(
+            videos=6, records_per_message=2, duplicates=0.5, latency=0)
+        self.assertEqual(results["messages"], 5)
+        self.assertEqual(results["jobs"], 6)
+        self.assertEqual(results["completed"], 6)
+        self.assertEqual(results["skipped"], 3)
+        self.assertEqual(results["errors"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
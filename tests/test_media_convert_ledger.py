@@ -0,0 +1,170 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import mongomock
+
+import media_convert_ledger as mcl
+import mcs_automated_media_convert as mamc
+
+
+def video_record(key="eval-videos-6/scene_0001_01_visual.mp4", etag="abc"):
+    return {
+        "s3": {
+            "bucket": {"name": "evaluation-images"},
+            "object": {"key": key, "eTag": etag}
+        }
+    }
+
+
+class LedgerTests:
+    '''Run against both ledgers'''
+
+    def make_ledger(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.ledger = self.make_ledger()
+
+    def test_claim_once(self):
+        entry = mamc.ledger_entry(video_record(), "prod")
+        self.assertTrue(self.ledger.claim(entry))
+        self.assertFalse(self.ledger.claim(entry))
+        self.ledger.submitted(entry["key"], "job-1")
+        self.assertFalse(self.ledger.claim(entry))
+
+        # A new upload of the same file has a new ETag
+        self.assertTrue(self.ledger.claim(
+            mamc.ledger_entry(video_record(etag="def"), "prod")))
+
+    def test_failed_and_stale_claims_can_be_retried(self):
+        entry = mamc.ledger_entry(video_record(), "prod")
+        self.assertIsNone(self.ledger.entry(entry["key"]))
+        self.assertTrue(self.ledger.claim(entry))
+        self.assertEqual(self.ledger.entry(entry["key"]), {
+            "status": mcl.SUBMITTING, "retries": 0})
+        self.ledger.failed(entry["key"], "bad video")
+        self.assertTrue(self.ledger.claim(entry))
+        self.assertEqual(self.ledger.entry(entry["key"])["retries"], 1)
+
+        # A stale claim is not a retry, it may have created its job
+        later = time.time() + mcl.CLAIM_TIMEOUT_SECONDS + 1
+        with patch("time.time", return_value=later):
+            self.assertTrue(self.ledger.claim(entry))
+        self.assertEqual(self.ledger.entry(entry["key"])["retries"], 1)
+
+    def test_backlog_and_throughput(self):
+        keys = []
+        for name, folder in [("a", "6"), ("b", "6"), ("c", "7"), ("d", "7")]:
+            entry = mamc.ledger_entry(
+                video_record(f"eval-videos-{folder}/{name}.mp4"), "prod")
+            self.ledger.claim(entry)
+            keys.append(entry["key"])
+        for number, key in enumerate(keys[:3]):
+            self.ledger.submitted(key, f"job-{number}")
+        self.ledger.update_status(keys[0], mcl.COMPLETE)
+        self.ledger.update_status(keys[1], mcl.PROGRESSING)
+        self.ledger.update_status(keys[2], mcl.COMPLETE)
+
+        self.assertEqual(self.ledger.backlog(), {
+            mcl.SUBMITTING: 1, mcl.PROGRESSING: 1})
+        self.assertEqual(
+            self.ledger.throughput(time.time() - 60), {"6": 1, "7": 1})
+        self.assertEqual(
+            sorted(job["job_id"] for job in self.ledger.active_jobs()),
+            ["job-1"])
+
+
+class TestMongoLedger(LedgerTests, unittest.TestCase):
+    def make_ledger(self):
+        return mcl.MongoLedger(mongomock.MongoClient()["mcs"])
+
+
+class TestSqliteLedger(LedgerTests, unittest.TestCase):
+    def make_ledger(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return mcl.SqliteLedger(os.path.join(directory.name, "ledger.db"))
+
+
+class TestSubmitterLedger(unittest.TestCase):
+
+    def test_duplicates_are_skipped(self):
+        ledger = mcl.MongoLedger(mongomock.MongoClient()["mcs"])
+        submitter = mamc.MediaConvertSubmitter(
+            jobs_per_second=1000, ledger=ledger)
+        client = MagicMock()
+        client.create_job.return_value = {"Job": {"Id": "job-1"}}
+        client.get_job.return_value = {"Job": {"Status": mcl.COMPLETE}}
+        submitter.backend.clients[mamc.MEDIA_ENDPOINTS["prod"]] = client
+
+        # A redelivered message repeats the record
+        records = [video_record(), video_record()]
+        self.assertEqual(submitter.submit_all(records, "prod"), ([], []))
+        self.assertEqual(submitter.submit_all(records, "prod"), ([], []))
+        client.create_job.assert_called_once()
+        self.assertEqual(submitter.skipped, 3)
+        self.assertEqual(
+            client.create_job.call_args.kwargs["ClientRequestToken"],
+            mamc.ledger_entry(video_record(), "prod")["key"])
+
+        self.assertEqual(submitter.refresh_statuses(), 1)
+        self.assertEqual(ledger.throughput(0), {"6": 1})
+        self.assertEqual(ledger.backlog(), {})
+
+    def test_retries_get_a_new_token(self):
+        ledger = mcl.MongoLedger(mongomock.MongoClient()["mcs"])
+        submitter = mamc.MediaConvertSubmitter(
+            jobs_per_second=1000, ledger=ledger)
+        client = MagicMock()
+        client.create_job.return_value = {"Job": {"Id": "job-1"}}
+        client.get_job.return_value = {"Job": {"Status": mcl.ERROR}}
+        submitter.backend.clients[mamc.MEDIA_ENDPOINTS["prod"]] = client
+
+        submitter.submit_all([video_record()], "prod")
+        submitter.refresh_statuses()
+        submitter.submit_all([video_record()], "prod")
+        tokens = [
+            call.kwargs["ClientRequestToken"]
+            for call in client.create_job.call_args_list]
+        self.assertEqual(len(set(tokens)), 2)
+        self.assertEqual(
+            tokens[1], mcl.request_token(tokens[0], 1))
+        # Both jobs are tagged with the same video
+        self.assertEqual(
+            set(call.kwargs["UserMetadata"]["assetID"]
+                for call in client.create_job.call_args_list),
+            {tokens[0]})
+
+    def test_in_flight_messages_are_not_deleted(self):
+        ledger = mcl.MongoLedger(mongomock.MongoClient()["mcs"])
+        client = MagicMock()
+        client.create_job.return_value = {"Job": {"Id": "job-1"}}
+        submitter = mamc.MediaConvertSubmitter(
+            jobs_per_second=1000, ledger=ledger)
+        submitter.backend.clients[mamc.MEDIA_ENDPOINTS["prod"]] = client
+
+        # A converter claims the video then dies before creating its job
+        ledger.claim(mamc.ledger_entry(video_record(), "prod"))
+
+        # SQS redelivers the message while the claim is still live
+        message = MagicMock()
+        message.body = json.dumps({"Records": [video_record()]})
+        with patch.object(mamc, "submitter", submitter):
+            mamc.process_messages([message], "prod")
+            message.delete.assert_not_called()
+            client.create_job.assert_not_called()
+            self.assertEqual(submitter.skipped, 0)
+
+            # Once the claim has timed out, the video is submitted
+            later = time.time() + mcl.CLAIM_TIMEOUT_SECONDS + 1
+            with patch("time.time", return_value=later):
+                mamc.process_messages([message], "prod")
+        message.delete.assert_called_once()
+        client.create_job.assert_called_once()
+        self.assertEqual(
+            client.create_job.call_args.kwargs["ClientRequestToken"],
+            mamc.ledger_entry(video_record(), "prod")["key"])
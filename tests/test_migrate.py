@@ -0,0 +1,156 @@
+import os
+import sys
+import tempfile
+import textwrap
+import unittest
+
+import mongomock
+
+from scripts import migrate
+
+# Fixture migrations, written to a temporary package for each test
+MIGRATIONS = {
+    "_0_1_0_add_scenes": '''
+        def migrate(mongoDB, **options):
+            mongoDB["scenes"].insert_many([{"n": 1}, {"n": 2}, {"n": 3}])
+        ''',
+    "_0_1_0_1_mark_scenes": '''
+        def migrate(mongoDB, client, db_string, **options):
+            client[db_string]["scenes"].update_many(
+                {"n": {"$gt": 1}}, {"$set": {"marked": True}})
+            mongoDB["migration_checkpoints"].insert_one({"_id": "x"})
+        ''',
+    "_0_2_0_drop_scene": '''
+        options_seen = []
+
+        def migrate(mongoDB, batch_size=None, processes=None, **options):
+            options_seen.append((batch_size, processes))
+            mongoDB["scenes"].delete_one({"n": 1})
+        '''
+}
+
+
+class TestMigrate(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.package = f"migrate_fixture_{id(self)}"
+        package_dir = os.path.join(self.folder.name, self.package)
+        os.mkdir(package_dir)
+        open(os.path.join(package_dir, "__init__.py"), "w").close()
+        open(os.path.join(package_dir, "helpers.py"), "w").close()
+        for name, source in MIGRATIONS.items():
+            with open(os.path.join(package_dir, name + ".py"), "w") as file:
+                file.write(textwrap.dedent(source))
+        sys.path.insert(0, self.folder.name)
+        self.migrations = migrate.discover_migrations(
+            package_dir, self.package)
+        self.client = mongomock.MongoClient()
+        self.mongoDB = self.client["mcs"]
+
+    def tearDown(self):
+        sys.path.remove(self.folder.name)
+        for name in list(sys.modules):
+            if name.startswith(self.package):
+                del sys.modules[name]
+        self.folder.cleanup()
+
+    def test_discover_scripts_in_version_order(self):
+        migrations = migrate.discover_migrations()
+        names = [migration.name for migration in migrations]
+        self.assertNotIn("migration", names)
+        self.assertNotIn("update_scene_num_refs", names)
+        self.assertEqual(names[0], "_0_4_1_drop_extra_keys_collection")
+        versions = [migration.version for migration in migrations]
+        self.assertEqual(versions, sorted(versions))
+        self.assertLess(
+            names.index("_0_4_6_update_eval_2_test_types"),
+            names.index("_0_4_6_1_add_has_novelty_field"))
+        self.assertLess(
+            names.index("_0_5_0_migrate_collections"),
+            names.index("_0_5_0_1_update_saved_queries"))
+        self.assertLess(
+            names.index("_0_6_5_7_exclude_opics_imitation"),
+            names.index("_0_7_0_int_collisions_trajectory_scorecard"))
+
+    def test_fixture_versions(self):
+        self.assertEqual(
+            [(migration.name, migration.version)
+             for migration in self.migrations],
+            [("_0_1_0_add_scenes", (0, 1, 0)),
+             ("_0_1_0_1_mark_scenes", (0, 1, 0, 1)),
+             ("_0_2_0_drop_scene", (0, 2, 0))])
+
+    def test_run_pending(self):
+        records = migrate.run_pending(
+            self.client, "mcs", migrations=self.migrations)
+        self.assertEqual(
+            [record["_id"] for record in records],
+            [migration.name for migration in self.migrations])
+        self.assertEqual(
+            [record["documents"] for record in records],
+            [{"inserted": 3, "updated": 0, "deleted": 0},
+             {"inserted": 0, "updated": 2, "deleted": 0},
+             {"inserted": 0, "updated": 0, "deleted": 1}])
+
+        applied = migrate.applied_migrations(self.mongoDB)
+        self.assertEqual(applied["_0_1_0_1_mark_scenes"]["version"], "0.1.0.1")
+        self.assertGreaterEqual(applied["_0_2_0_drop_scene"]["seconds"], 0)
+        self.assertEqual(
+            self.mongoDB["mcs_version"].find_one()["version"], "0.2.0")
+        self.assertEqual(self.mongoDB["scenes"].count_documents({}), 2)
+
+        # Nothing is pending the second time
+        self.assertEqual(
+            migrate.run_pending(
+                self.client, "mcs", migrations=self.migrations), [])
+
+    def test_options(self):
+        migrate.run_pending(
+            self.client, "mcs", batch_size=50, processes=2,
+            settings={"_0_2_0_drop_scene": {"processes": 8}},
+            migrations=self.migrations)
+        module = sys.modules[f"{self.package}._0_2_0_drop_scene"]
+        self.assertEqual(module.options_seen, [(50, 8)])
+        record = migrate.applied_migrations(
+            self.mongoDB)["_0_1_0_add_scenes"]
+        self.assertEqual(
+            record["options"], {"batch_size": 50, "processes": 2})
+
+    def test_baseline_from_mcs_version(self):
+        self.mongoDB["mcs_version"].insert_one({"version": "0.1.0"})
+        records = migrate.run_pending(
+            self.client, "mcs", migrations=self.migrations)
+        self.assertEqual(
+            [record["_id"] for record in records], ["_0_2_0_drop_scene"])
+        applied = migrate.applied_migrations(self.mongoDB)
+        self.assertTrue(applied["_0_1_0_1_mark_scenes"]["baseline"])
+        self.assertEqual(self.mongoDB["scenes"].count_documents({}), 0)
+        self.assertEqual(
+            self.mongoDB["mcs_version"].find_one()["version"], "0.2.0")
+
+    def test_dry_run(self):
+        self.mongoDB["mcs_version"].insert_one({"version": "0.1.0"})
+        records = migrate.run_pending(
+            self.client, "mcs", dry_run=True, migrations=self.migrations)
+        self.assertEqual(
+            [record["_id"] for record in records], ["_0_2_0_drop_scene"])
+        self.assertEqual(migrate.applied_migrations(self.mongoDB), {})
+
+    def test_stops_at_failure(self):
+        failing = os.path.join(
+            self.folder.name, self.package, "_0_1_5_fail.py")
+        with open(failing, "w") as file:
+            file.write("def migrate(mongoDB, **options):\n"
+                       "    raise ValueError('bad data')\n")
+        migrations = migrate.discover_migrations(
+            os.path.dirname(failing), self.package)
+        with self.assertRaises(ValueError):
+            migrate.run_pending(self.client, "mcs", migrations=migrations)
+        self.assertEqual(
+            list(migrate.applied_migrations(self.mongoDB)),
+            ["_0_1_0_add_scenes", "_0_1_0_1_mark_scenes"])
+        self.assertEqual(
+            [migration.name for migration in migrate.pending_migrations(
+                self.mongoDB, migrations)],
+            ["_0_1_5_fail", "_0_2_0_drop_scene"])
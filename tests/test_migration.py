@@ -0,0 +1,275 @@
+import json
+import os
+import tempfile
+import unittest
+
+import boto3
+import mongomock
+from moto import mock_s3
+
+from scripts import migration
+
+BUCKET = "evaluation-images"
+
+
+def count_steps(record, scene, history):
+    if record["name"] == "unchanged":
+        return None
+    return {"score.steps": len(history["steps"]),
+            "score.scene_type": scene["type"]}
+
+
+# Names of the records transformed, the name to stop the run at and the
+#   names to fail
+transformed = []
+interrupt_at = []
+fail_at = []
+
+
+def mark_transformed(record, scene, data):
+    if record["name"] in interrupt_at:
+        raise KeyboardInterrupt()
+    if record["name"] in fail_at:
+        raise ValueError(record["name"])
+    transformed.append(record["name"])
+    return {"migrated": True}
+
+
+def move_id(record, scene, data):
+    # The server rejects a $set of the immutable _id
+    if record["name"] == "scene_3":
+        return {"_id": "moved"}
+    return {"migrated": True}
+
+
+class TestMigration(unittest.TestCase):
+
+    def setUp(self):
+        self.mongoDB = mongomock.MongoClient()["mcs"]
+        self.mongoDB["scenes"].insert_many([
+            {"name": f"scene_{index}", "type": f"type_{index}"}
+            for index in range(5)] + [{"name": "unchanged", "type": ""}])
+        self.mongoDB["results"].insert_many([
+            {"name": f"scene_{index}", "fullFilename": f"history_{index}",
+             "category": "interactive", "score": {"score": 1}}
+            for index in range(5)] + [
+            {"name": "unchanged", "fullFilename": "history_0",
+             "category": "interactive", "score": {"score": 1}},
+            {"name": "scene_0", "fullFilename": "history_0",
+             "category": "passive", "score": {"score": 1}}])
+
+    def run_migration(self, processes):
+        with mock_s3():
+            s3_client = boto3.client("s3", region_name="us-east-1")
+            s3_client.create_bucket(Bucket=BUCKET)
+            # history_4 is missing
+            for index in range(4):
+                s3_client.put_object(
+                    Bucket=BUCKET,
+                    Key=f"eval-resources-6/history_{index}.json",
+                    Body=json.dumps({"steps": [{}] * index}).encode())
+            with self.assertLogs(level="INFO"):
+                return migration.run_migration(
+                    self.mongoDB, migration.Migration(
+                        "count_steps", "results",
+                        {"category": "interactive"}, count_steps,
+                        scenes_collection="scenes",
+                        file_key=migration.history_file_key(
+                            "eval-resources-6"),
+                        batch_size=2),
+                    s3_client, processes=processes)
+
+    def check_results(self, report):
+        self.assertEqual(report["matched"], 6)
+        self.assertEqual(report["updated"], 4)
+        self.assertEqual(report["unchanged"], 1)
+        self.assertEqual(len(report["failed"]), 1)
+        self.assertIn("download failed", report["failed"][0]["error"])
+
+        results = self.mongoDB["results"]
+        for index in range(4):
+            record = results.find_one(
+                {"name": f"scene_{index}", "category": "interactive"})
+            self.assertEqual(
+                record["score"],
+                {"score": 1, "steps": index, "scene_type": f"type_{index}"})
+        self.assertEqual(
+            results.find_one({"category": "passive"})["score"], {"score": 1})
+
+    def test_run_migration(self):
+        self.check_results(self.run_migration(1))
+
+    def test_run_migration_processes(self):
+        self.check_results(self.run_migration(2))
+
+    def test_iterate_batches(self):
+        batches = list(migration.iterate_batches(
+            self.mongoDB["results"], {"category": "interactive"}, 4))
+        self.assertEqual([len(batch) for batch in batches], [4, 2])
+        ids = [record["_id"] for batch in batches for record in batch]
+        self.assertEqual(ids, sorted(ids))
+
+    def run_interrupted(self, checkpoints):
+        transformed.clear()
+        interrupt_at[:] = ["scene_3"]
+        marking = migration.Migration(
+            "mark", "results", {"category": "interactive"},
+            mark_transformed, batch_size=2)
+        with self.assertRaises(KeyboardInterrupt):
+            migration.run_migration(
+                self.mongoDB, marking, processes=1, checkpoints=checkpoints)
+        self.assertEqual(transformed, ["scene_0", "scene_1", "scene_2"])
+        checkpoint = checkpoints.load("mark")
+        self.assertFalse(checkpoint["completed"])
+        self.assertEqual(checkpoint["report"]["matched"], 2)
+
+        # Restarting picks up at the batch that was interrupted
+        transformed.clear()
+        interrupt_at.clear()
+        with self.assertLogs(level="INFO"):
+            report = migration.run_migration(
+                self.mongoDB, marking, processes=1, checkpoints=checkpoints)
+        self.assertEqual(
+            transformed, ["scene_2", "scene_3", "scene_4", "unchanged"])
+        self.assertEqual(report["matched"], 6)
+        self.assertEqual(report["updated"], 6)
+        self.assertIn("resumed_from", report)
+        self.assertEqual(self.mongoDB["results"].count_documents(
+            {"migrated": True}), 6)
+
+        # A completed migration does not run again unless restarted
+        transformed.clear()
+        with self.assertLogs(level="INFO"):
+            migration.run_migration(
+                self.mongoDB, marking, processes=1, checkpoints=checkpoints)
+        self.assertEqual(transformed, [])
+        with self.assertLogs(level="INFO"):
+            report = migration.run_migration(
+                self.mongoDB, marking, processes=1, checkpoints=checkpoints,
+                restart=True)
+        self.assertEqual(len(transformed), 6)
+        self.assertEqual(report["unchanged"], 6)
+
+    def test_mongo_checkpoints(self):
+        self.run_interrupted(migration.MongoCheckpointStore(self.mongoDB))
+
+    def test_file_checkpoints(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.run_interrupted(migration.FileCheckpointStore(
+                os.path.join(tmp_dir, "checkpoints.json")))
+
+    def run_with_failures(self, checkpoints):
+        transformed.clear()
+        fail_at[:] = ["scene_3"]
+        marking = migration.Migration(
+            "mark", "results", {"category": "interactive"},
+            mark_transformed, batch_size=2)
+        try:
+            with self.assertLogs(level="INFO"):
+                report = migration.run_migration(
+                    self.mongoDB, marking, processes=1,
+                    checkpoints=checkpoints)
+            self.assertEqual(len(report["failed"]), 1)
+            checkpoint = checkpoints.load("mark")
+            self.assertTrue(checkpoint["completed"])
+            self.assertEqual(len(checkpoint["failed_ids"]), 1)
+
+            # A rerun retries the failed document, even though the run
+            #   completed, until it succeeds
+            transformed.clear()
+            with self.assertLogs(level="INFO"):
+                report = migration.run_migration(
+                    self.mongoDB, marking, processes=1,
+                    checkpoints=checkpoints)
+            self.assertEqual(transformed, [])
+            self.assertEqual(len(report["failed"]), 1)
+            self.assertEqual(report["retried"], 1)
+
+            fail_at.clear()
+            with self.assertLogs(level="INFO"):
+                report = migration.run_migration(
+                    self.mongoDB, marking, processes=1,
+                    checkpoints=checkpoints)
+        finally:
+            fail_at.clear()
+        self.assertEqual(transformed, ["scene_3"])
+        self.assertEqual(report["failed"], [])
+        self.assertEqual(report["matched"], 6)
+        self.assertEqual(report["updated"], 6)
+        self.assertEqual(checkpoints.load("mark")["failed_ids"], [])
+        self.assertEqual(self.mongoDB["results"].count_documents(
+            {"migrated": True}), 6)
+
+        # Then it has completed
+        transformed.clear()
+        with self.assertLogs(level="INFO"):
+            migration.run_migration(
+                self.mongoDB, marking, processes=1, checkpoints=checkpoints)
+        self.assertEqual(transformed, [])
+
+    def test_mongo_checkpoints_retry_failed(self):
+        self.run_with_failures(migration.MongoCheckpointStore(self.mongoDB))
+
+    def test_file_checkpoints_retry_failed(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.run_with_failures(migration.FileCheckpointStore(
+                os.path.join(tmp_dir, "checkpoints.json")))
+
+    def test_rejected_update(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoints = migration.FileCheckpointStore(
+                os.path.join(tmp_dir, "checkpoints.json"))
+            with self.assertLogs(level="INFO"):
+                report = migration.run_migration(
+                    self.mongoDB, migration.Migration(
+                        "move_id", "results", {"category": "interactive"},
+                        move_id, batch_size=2),
+                    processes=1, checkpoints=checkpoints)
+            scene_3 = self.mongoDB["results"].find_one({"name": "scene_3"})
+            self.assertEqual(report["matched"], 6)
+            self.assertEqual(report["updated"], 5)
+            self.assertEqual(report["unchanged"], 0)
+            self.assertEqual(len(report["failed"]), 1)
+            self.assertEqual(report["failed"][0]["_id"], str(scene_3["_id"]))
+            checkpoint = checkpoints.load("move_id")
+            self.assertTrue(checkpoint["completed"])
+            self.assertEqual(checkpoint["failed_ids"], [scene_3["_id"]])
+        self.assertNotIn("migrated", scene_3)
+        self.assertEqual(self.mongoDB["results"].count_documents(
+            {"migrated": True}), 5)
+
+    def test_field_migration_pipeline(self):
+        set_fields, unset_fields = migration.rename_fields(
+            {"scene_part_num": "test_num"})
+        field_migration = migration.FieldMigration(
+            "rename", "results", {}, set_fields, unset_fields)
+        self.assertEqual(field_migration.pipeline(), [
+            {"$set": {"test_num": "$scene_part_num"}},
+            {"$unset": ["scene_part_num"]}])
+
+    def test_run_field_migration(self):
+        results = self.mongoDB["results"]
+        results.update_many(
+            {"category": "interactive"},
+            {"$set": {"scene_num": "2", "scene_part_num": "7"}})
+        field_migration = migration.FieldMigration(
+            "swap", "results", {"scene_part_num": {"$exists": True}},
+            {"scene_num": migration.to_int("scene_part_num"),
+             "test_num": migration.to_int("scene_num")})
+
+        with self.assertLogs(level="INFO"):
+            report = migration.run_field_migration(
+                self.mongoDB, field_migration, dry_run=True)
+        self.assertEqual((report["matched"], report["modified"]), (6, 0))
+        self.assertEqual(results.count_documents({"test_num": 2}), 0)
+
+        with self.assertLogs(level="INFO"):
+            report = migration.run_field_migration(
+                self.mongoDB, field_migration)
+        self.assertEqual((report["matched"], report["modified"]), (6, 6))
+        self.assertEqual(results.count_documents(
+            {"scene_num": 7, "test_num": 2}), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
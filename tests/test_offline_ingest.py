@@ -0,0 +1,123 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import offline_ingest
+
+TEST_FOLDER = "tests/test_data"
+TEST_SCENE_FILES = [
+    "test_juliett_0001_01_debug.json",
+    "occluders_0001_17_I1_debug.json"
+]
+TEST_HISTORY_FILES = [
+    "test_eval_3-5_level2_baseline_juliett_0001_01.json",
+    "occluders_0001_17_hist_updated.json"
+]
+
+
+def agency_item(scene_num, ground_truth, classification):
+    return {
+        "eval": "Evaluation 6 Results",
+        "category_type": "agent identification",
+        "performer": "TA2 Baseline",
+        "test_num": 1,
+        "metadata": "level2",
+        "scene_num": scene_num,
+        "test_type": "agents",
+        "score": {
+            "classification": classification,
+            "ground_truth": ground_truth
+        }
+    }
+
+
+class TestOfflineIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.scene_folder = os.path.join(self.tmp_dir, "scenes")
+        self.history_folder = os.path.join(self.tmp_dir, "history")
+        os.mkdir(self.scene_folder)
+        os.mkdir(self.history_folder)
+        for file in TEST_SCENE_FILES:
+            shutil.copy(os.path.join(TEST_FOLDER, file), self.scene_folder)
+        for file in TEST_HISTORY_FILES:
+            shutil.copy(os.path.join(TEST_FOLDER, file), self.history_folder)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_scene_index(self):
+        scene_index = offline_ingest.SceneIndex()
+        self.assertEqual(scene_index.add_folder(self.scene_folder), 2)
+        scene = scene_index.find_scene(
+            "mcs", None, "Evaluation 3.5 Scenes", "juliett_0001_01")
+        self.assertEqual(scene["name"], "juliett_0001_01")
+        self.assertIsNone(scene_index.find_scene(
+            "mcs", None, "Evaluation 3 Scenes", "juliett_0001_01"))
+
+    def test_offline_ingest_jsonl(self):
+        output = os.path.join(self.tmp_dir, "history.jsonl")
+        summary = offline_ingest.offline_ingest(
+            self.scene_folder, self.history_folder, output)
+        self.assertEqual(summary["written"], 2)
+        self.assertEqual(summary["failed"], [])
+
+        with open(output) as output_file:
+            history_items = {
+                item["name"]: item
+                for item in map(json.loads, output_file)}
+        passive = history_items["juliett_0001_01"]
+        self.assertEqual(passive["eval"], "Evaluation 3.5 Results")
+        self.assertEqual(passive["score"]["ground_truth"], 0)
+        self.assertEqual(passive["score"]["score_description"], "Incorrect")
+        self.assertIsNone(passive["score"]["scorecard"])
+        interactive = history_items["occluders_0001_17"]
+        self.assertIsNotNone(interactive["score"]["scorecard"])
+
+    def test_offline_ingest_missing_scene(self):
+        os.remove(os.path.join(self.scene_folder, TEST_SCENE_FILES[0]))
+        output = os.path.join(self.tmp_dir, "history.jsonl")
+        summary = offline_ingest.offline_ingest(
+            self.scene_folder, self.history_folder, output)
+        self.assertEqual(summary["written"], 1)
+        self.assertEqual(summary["failed"][0]["file"], TEST_HISTORY_FILES[0])
+
+    def test_offline_ingest_parquet(self):
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+        output = os.path.join(self.tmp_dir, "history.parquet")
+        offline_ingest.offline_ingest(
+            self.scene_folder, self.history_folder, output, "parquet")
+        table = pyarrow.parquet.read_table(output)
+        self.assertEqual(table.num_rows, 2)
+        self.assertEqual(
+            sorted(table.column("name").to_pylist()),
+            ["juliett_0001_01", "occluders_0001_17"])
+
+    def test_agency_pairer(self):
+        pairer = offline_ingest.AgencyPairer()
+        expected = agency_item(1, 1, "0.9")
+        unexpected = agency_item(2, 0, "0.1")
+        self.assertEqual(pairer.add(expected), [])
+        self.assertEqual(len(pairer.add(unexpected)), 2)
+        self.assertEqual(pairer.pairs, 1)
+        self.assertEqual(expected["score"]["score_description"], "Correct")
+        self.assertEqual(expected["score"]["weighted_score_worth"], 1)
+        self.assertEqual(unexpected["score"]["weighted_score_worth"], 0)
+        self.assertEqual(pairer.unpaired(), [])
+
+    def test_agency_pairer_unpaired(self):
+        pairer = offline_ingest.AgencyPairer()
+        pairer.add(agency_item(1, 1, "0.9"))
+        self.assertEqual(pairer.add({"test_type": "retrieval"}),
+                         [{"test_type": "retrieval"}])
+        self.assertEqual(len(pairer.unpaired()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+from unittest.mock import patch
+
+import mongomock
+
+import mcs_history_ingest
+import results_rollup
+
+COLLECTION = "eval_6_results"
+
+
+def result(name, performer, score, weighted_score_worth=1, **fields):
+    item = {
+        "name": name,
+        "eval": "Evaluation 6 Results",
+        "performer": performer,
+        "metadata": "level2",
+        "test_type": "interactive",
+        "category_type": "ramp",
+        "scene_goal_id": "A1",
+        "fullFilename": name + "_history",
+        "fileTimestamp": "1",
+        "score": {
+            "score": score,
+            "weighted_score": score * weighted_score_worth,
+            "weighted_score_worth": weighted_score_worth
+        }
+    }
+    item.update(fields)
+    return item
+
+
+def rollups(mongoDB):
+    return sorted(
+        (tuple(rollup["_id"].values()), rollup["count"], rollup["score"],
+         rollup["weighted_score"], rollup["weighted_score_worth"])
+        for rollup in mongoDB[results_rollup.ROLLUP_COLLECTION].find()
+        if rollup["count"])
+
+
+class TestResultsRollup(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mongomock.MongoClient()
+        self.mongoDB = self.client["mcs"]
+        self.mongoDB["history_mapping"].insert_one(
+            {"name": "Evaluation 6 Results", "collection": COLLECTION})
+
+    def test_contribution(self):
+        item = result("a", "TA2 Baseline", 1, 3)
+        self.assertEqual(
+            results_rollup.contribution(item, -1),
+            {"count": -1, "score": -1, "weighted_score": -3,
+             "weighted_score_worth": -3})
+        item["score"]["weighted_score"] = None
+        self.assertEqual(
+            results_rollup.contribution(item)["weighted_score"], 0)
+
+    def test_replacement_in_same_group_is_one_update(self):
+        old_item = result("a", "TA2 Baseline", 0)
+        new_item = result("a", "TA2 Baseline", 1)
+        operations = results_rollup.rollup_operations(
+            results_rollup.rollup_changes(COLLECTION, old_item, new_item))
+        self.assertEqual(len(operations), 1)
+        self.assertEqual(
+            operations[0]._doc, {"$inc": {"score": 1, "weighted_score": 1}})
+
+        # Nothing changed, nothing to write
+        self.assertEqual(results_rollup.rollup_operations(
+            results_rollup.rollup_changes(COLLECTION, new_item, new_item)),
+            [])
+
+    def test_writer_matches_rebuild(self):
+        writer = mcs_history_ingest.HistoryBulkWriter(
+            self.client, "mcs", batch_size=2)
+        with patch("create_collection_keys.check_collection_has_key"):
+            writer.insert(COLLECTION, result("a", "TA2 Baseline", 0))
+            writer.insert(COLLECTION, result("b", "TA2 Baseline", 1, 2))
+            writer.insert(COLLECTION, result("a", "OPICS", 1))
+            writer.flush()
+
+            # A newer history file for a, now in a different cube
+            old_item = self.mongoDB[COLLECTION].find_one(
+                {"name": "a", "performer": "TA2 Baseline"})
+            writer.replace(COLLECTION, old_item, result(
+                "a", "TA2 Baseline", 1, fileTimestamp="2",
+                scene_goal_id="B1"))
+            writer.flush()
+
+        incremental = rollups(self.mongoDB)
+        self.assertEqual(incremental, [
+            ((COLLECTION, "OPICS", "level2", "interactive", "ramp", "A1"),
+             1, 1, 1, 1),
+            ((COLLECTION, "TA2 Baseline", "level2", "interactive", "ramp",
+              "A1"), 1, 1, 2, 2),
+            ((COLLECTION, "TA2 Baseline", "level2", "interactive", "ramp",
+              "B1"), 1, 1, 1, 1)])
+
+        self.assertEqual(
+            results_rollup.rebuild_rollup(self.mongoDB, COLLECTION), 3)
+        self.assertEqual(rollups(self.mongoDB), incremental)
+
+    def test_agency_pair_update(self):
+        item = result("a", "TA2 Baseline", 1)
+        self.mongoDB[COLLECTION].insert_one(item)
+        results_rollup.update_rollup(self.mongoDB, COLLECTION, None, item)
+
+        item["score"].update({"score": 0, "weighted_score": 0})
+        mcs_history_ingest.update_agency_paired_history_item(
+            self.client, "mcs", item)
+        self.assertEqual(rollups(self.mongoDB), [
+            ((COLLECTION, "TA2 Baseline", "level2", "interactive", "ramp",
+              "A1"), 1, 0, 0, 1)])
+
+    def test_summarize(self):
+        self.mongoDB[COLLECTION].insert_many([
+            result("a", "TA2 Baseline", 1),
+            result("b", "TA2 Baseline", 0, metadata="oracle"),
+            result("c", "OPICS", 1, scene_goal_id="B1"),
+            result("d", "OPICS", 1, test_type="passive")])
+        results_rollup.rebuild_rollup(self.mongoDB, COLLECTION)
+
+        summaries = results_rollup.summarize(
+            self.mongoDB, COLLECTION, ["performer"],
+            {"test_type": "interactive"})
+        self.assertEqual(
+            sorted((summary["performer"], summary["count"], summary["score"])
+                   for summary in summaries),
+            [("OPICS", 1, 1), ("TA2 Baseline", 2, 1)])
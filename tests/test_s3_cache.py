@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+import unittest
+
+import boto3
+from moto import mock_s3
+
+import s3_cache
+
+BUCKET = "test-mcs-cache"
+
+
+@mock_s3
+class TestS3Cache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.s3_client = boto3.client("s3", region_name="us-east-1")
+        self.s3_client.create_bucket(Bucket=BUCKET)
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def put(self, key: str, content: dict) -> None:
+        self.s3_client.put_object(
+            Bucket=BUCKET, Key=key, Body=json.dumps(content).encode())
+
+    def test_read_json_cached(self):
+        self.put("history/file.json", {"steps": 1})
+        cache = s3_cache.S3Cache(self.cache_dir.name, self.s3_client)
+        self.assertEqual(
+            cache.read_json(BUCKET, "history/file.json"), {"steps": 1})
+        self.assertEqual(
+            cache.read_json(BUCKET, "history/file.json"), {"steps": 1})
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # A changed object has a new ETag, so is downloaded again
+        self.put("history/file.json", {"steps": 2})
+        self.assertEqual(
+            cache.read_json(BUCKET, "history/file.json"), {"steps": 2})
+        self.assertEqual(cache.misses, 2)
+
+        # The cache is shared with new instances (and other processes)
+        cache = s3_cache.S3Cache(self.cache_dir.name, self.s3_client)
+        self.assertEqual(
+            cache.read_json(BUCKET, "history/file.json"), {"steps": 2})
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_evict_least_recently_used(self):
+        for index in range(3):
+            self.put(f"file_{index}.json", {"data": "x" * 100})
+        cache = s3_cache.S3Cache(
+            self.cache_dir.name, self.s3_client, max_bytes=250)
+        first = cache.get_path(BUCKET, "file_0.json")
+        second = cache.get_path(BUCKET, "file_1.json")
+        # Make file_0 the most recently used
+        os.utime(second, (1, 1))
+        cache.get_path(BUCKET, "file_0.json")
+        with self.assertLogs(level="INFO"):
+            third = cache.get_path(BUCKET, "file_2.json")
+        self.assertTrue(os.path.exists(first))
+        self.assertFalse(os.path.exists(second))
+        self.assertTrue(os.path.exists(third))
+        self.assertLessEqual(cache.size, 250)
+
+    def test_cache_from_env(self):
+        self.assertIsNone(s3_cache.cache_from_env(self.s3_client))
+        os.environ[s3_cache.CACHE_DIR_ENV] = self.cache_dir.name
+        os.environ[s3_cache.CACHE_MAX_MB_ENV] = "1"
+        try:
+            cache = s3_cache.cache_from_env(self.s3_client)
+        finally:
+            del os.environ[s3_cache.CACHE_DIR_ENV]
+            del os.environ[s3_cache.CACHE_MAX_MB_ENV]
+        self.assertEqual(cache.max_bytes, 1024 * 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
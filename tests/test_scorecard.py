@@ -16,6 +16,7 @@ from scorecard import (
     get_lookpoint,
 )
 import scorecard
+from scorecard.scorecard import DEFAULT_ROOM_DIMENSIONS, MOVE_DIRECTIONS
 
 TEST_SCENE_FILE_NAME = "occluders_0001_17_I1_debug.json"
 TEST_HISTORY_FILE_NAME = "india_0003_baseline_level1.json"
@@ -668,6 +669,42 @@ class TestMcsScorecard(unittest.TestCase):
         self.assertFalse(on_ramp_bool)
         self.assertEqual(ramp_id, "")
 
+    def test_on_ramps(self):
+        scene_file = mcs_scene_ingest.load_json_file(
+            TEST_FOLDER, TEST_SCENE_RAMP)
+        history_file = mcs_scene_ingest.load_json_file(
+            TEST_FOLDER, TEST_HISTORY_RAMP_UP_DOWN)
+        scorecard = Scorecard(history_file, scene_file)
+
+        # Every position in the history, checked at once.  The expected
+        # (on ramp, run length) are from the per position shapely check
+        # that on_ramps replaced, and every ramp found is ramp_lower.
+        positions = [step['output']['position']
+                     for step in history_file['steps']]
+        on_ramp_flags, ramp_indexes = scorecard.on_ramps(positions)
+        _, _, rotations, ids = scorecard.ramp_table()
+        runs = [
+            (False, 40), (True, 10), (False, 50), (True, 10), (False, 61),
+            (True, 9), (False, 38), (True, 27), (False, 82), (True, 16),
+            (False, 49), (True, 11), (False, 22), (True, 20), (False, 13)]
+        expected = [flag for flag, length in runs for _ in range(length)]
+        self.assertEqual(list(on_ramp_flags), expected)
+        for on_ramp_bool, index in zip(on_ramp_flags, ramp_indexes):
+            if on_ramp_bool:
+                self.assertEqual(ids[index], 'ramp_lower')
+                self.assertEqual(rotations[index], 90)
+
+        # And one by one
+        for position, on_ramp_bool, index in zip(
+                positions, on_ramp_flags, ramp_indexes):
+            self.assertEqual(
+                scorecard.on_ramp(position),
+                (True, rotations[index], ids[index]) if on_ramp_bool
+                else (False, 0, ""))
+
+        on_ramp_flags, _ = scorecard.on_ramps([])
+        self.assertEqual(len(on_ramp_flags), 0)
+
     def test_platform_side(self):
         # Robot leaves platform on correct side
         scene_file = mcs_scene_ingest.load_json_file(
@@ -854,6 +891,108 @@ class TestMcsScorecard(unittest.TestCase):
         # should be zero because this structure is not tracked
         assert scorecard.get_walked_into_structures() == 0
 
+    def test_obstructed_move_ids(self):
+        # What each obstructed move walked into, as (id, run length).
+        # The expected ids are from the per step shapely checks that
+        # obstructed_move_ids replaced.
+        scene_file = mcs_scene_ingest.load_json_file(
+            TEST_FOLDER, TEST_SCENE_OBSTRUCTED)
+        history_file = mcs_scene_ingest.load_json_file(
+            TEST_FOLDER, TEST_HISTORY_OBSTRUCTED)
+        scorecard = Scorecard(history_file, scene_file)
+        steps = [
+            step for step in history_file['steps']
+            if step['action'] in MOVE_DIRECTIONS and
+            step['output']['return_status'] == 'OBSTRUCTED']
+        platforms = {
+            name: 'platform_' + suffix for name, suffix in [
+                ('a', '334a7efc-35fe-4d61-b126-41784d28212d'),
+                ('b', '99b9dec2-6c12-48c1-80aa-27db14b6d1a7'),
+                ('c', '144b61b1-e42f-489f-b27d-730c7a940550')]}
+        ramps = {
+            name: 'ramp_' + suffix for name, suffix in [
+                ('a', '3ff6b984-037f-48b8-a3ed-09653768bbd3'),
+                ('b', '0af7166c-27fb-4e2a-9822-c28836575ead'),
+                ('c', '83a4eda6-26c1-41c9-9ca0-fef51a7dde0c')]}
+        runs = [
+            ('room_wall_x+', 5), ('room_wall_z+', 3),
+            ('occluder_side_a2eb54e5-ad1c-440c-baec-ba187f3b6580', 3),
+            ('occluder_wall_fe08f6de-d8f6-4c10-a653-990469ed7f4f', 3),
+            (ramps['a'], 1), (platforms['a'], 3), (None, 6),
+            ('room_wall_x-', 4), (platforms['a'], 1), (ramps['b'], 1),
+            (platforms['b'], 1), (None, 7), (ramps['c'], 1),
+            (platforms['c'], 1), (None, 14), ('room_wall_z-', 2),
+            (None, 18)]
+        self.assertEqual(
+            scorecard.obstructed_move_ids(steps),
+            [id for id, length in runs for _ in range(length)])
+
+    def test_obstructed_move_ids_near_corners(self):
+        def box(id, x_range, z_range, y_range):
+            return {'id': id, 'structure': True, 'shows': [{'boundingBox': [
+                {'x': x, 'y': y, 'z': z} for x in x_range
+                for y in y_range for z in z_range]}]}
+
+        def step(action, x, z, rotation, y=0.4625, status='OBSTRUCTED'):
+            return {'action': action, 'output': {
+                'return_status': status, 'rotation': rotation,
+                'position': {'x': x, 'y': y, 'z': z}}}
+
+        scene = {'objects': [
+            box('wall_a', (1, 2), (1, 2), (0, 3)),
+            box('platform_a', (-3, -1), (-1, 1), (0, 1)),
+            box('ramp_a', (-4.5, -3), (-1, 1), (0, 1)),
+            {'id': 'ball', 'shows': [{'boundingBox': []}]}]}
+        # (step, what it walked into) from the shapely checks
+        expected = [
+            # Toward the corner of wall_a at (1, 1), to (0.83, 0.83),
+            # 0.240 from it, and to (0.81, 0.81), 0.269 from it
+            (step('MoveAhead', 0.83, 0.73, 0), 'wall_a'),
+            (step('MoveAhead', 0.81, 0.71, 0), None),
+            (step('MoveRight', 0.73, 0.83, 0), 'wall_a'),
+            (step('MoveLeft', 0.91, 0.81, 0), None),
+            (step('MoveBack', 0.81, 0.91, 0), None),
+            # Toward the far corner at (2, 2)
+            (step('MoveBack', 2.17, 2.27, 0), 'wall_a'),
+            (step('MoveBack', 2.2, 2.3, 0), None),
+            # Toward an edge of wall_a
+            (step('MoveAhead', 1.5, 0.66, 0), 'wall_a'),
+            (step('MoveAhead', 1.5, 0.64, 0), None),
+            # Above wall_a
+            (step('MoveAhead', 1.5, 0.7, 0, y=3.8), None),
+            # From the floor into the platform's side
+            (step('MoveAhead', -0.7, 0, 270), 'platform_a'),
+            # From the ramp into the platform's lip
+            (step('MoveAhead', -3.2, 0, 90, y=1.0), None),
+            # From the floor into the ramp's side
+            (step('MoveAhead', -3.7, 1.3, 180), 'ramp_a'),
+            (step('MoveAhead', 4.7, 0, 90), 'room_wall_x+'),
+            (step('MoveAhead', -4.7, 3, 270), 'room_wall_x-'),
+            (step('MoveAhead', 0, 4.7, 0), 'room_wall_z+'),
+            (step('MoveBack', 0, -4.7, 0), 'room_wall_z-'),
+            (step('MoveAhead', 4.7, 4.7, 45), 'room_wall_x+'),
+            (step('MoveAhead', 0, -2, 0), None)]
+        steps = [step for step, _ in expected]
+        scorecard = Scorecard({'steps': steps + [
+            step('MoveAhead', 0.83, 0.73, 0, status='SUCCESSFUL')]}, scene)
+        self.assertEqual(
+            scorecard.obstructed_move_ids(steps),
+            [id for _, id in expected])
+        self.assertEqual(scorecard.calc_walked_into_structures(), 11)
+
+        # The same checks one target at a time
+        self.assertEqual(scorecard.point_is_outside_room_dimensions(
+            {'x': 0, 'y': 0, 'z': -4.8}, DEFAULT_ROOM_DIMENSIONS),
+            (True, 'room_wall_z-'))
+        self.assertEqual(scorecard.point_is_outside_room_dimensions(
+            {'x': 0, 'y': 0, 'z': 0}, DEFAULT_ROOM_DIMENSIONS),
+            (False, 'room_wall_z-'))
+        wall_box = scene['objects'][0]['shows'][0]['boundingBox']
+        self.assertTrue(scorecard.point_is_inside_bounding_box(
+            {'x': 0.83, 'y': 0.4625, 'z': 0.83}, wall_box))
+        self.assertFalse(scorecard.point_is_inside_bounding_box(
+            {'x': 0.81, 'y': 0.4625, 'z': 0.81}, wall_box))
+
     def test_number_of_rewards_achieved_all(self):
         scene_file = mcs_scene_ingest.load_json_file(
             TEST_FOLDER, TEST_SCENE_NUM_REWARDS)
@@ -0,0 +1,40 @@
+import unittest
+
+from benchmarks import scorecard_benchmark
+
+
+class TestScorecardBenchmark(unittest.TestCase):
+
+    def test_lengthen_history(self):
+        history = {"steps": [{"step": 1}, {"step": 2}]}
+        lengthened = scorecard_benchmark.lengthen_history(history, 3)
+        self.assertEqual(
+            [step["step"] for step in lengthened["steps"]],
+            [1, 2, 3, 4, 5, 6])
+        self.assertEqual(len(history["steps"]), 2)
+
+    def test_compare_to_baseline(self):
+        baseline = {"case": {
+            "score_all": {"ms": 100, "peak_kb": 100},
+            "calc_relook": {"ms": 0.1, "peak_kb": 1},
+            "calc_shell_game": {"error": "KeyError('sceneInfo')"}
+        }}
+        results = {"case": {
+            "score_all": {"ms": 130, "peak_kb": 100},
+            # Under the noise floor even though it is 5x slower
+            "calc_relook": {"ms": 0.5, "peak_kb": 1},
+            "calc_shell_game": {"error": "KeyError('sceneInfo')"}
+        }}
+        regressions = scorecard_benchmark.compare_to_baseline(
+            results, baseline)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("case score_all ms"))
+
+    def test_benchmark_metric(self):
+        results = scorecard_benchmark.run_benchmark(
+            [1], 1, ["calc_repeat_failed"])
+        self.assertIn("ms", results["lava_x1"]["calc_repeat_failed"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,16 +1,35 @@
+import random
 import unittest
 from math import sqrt
 
+import numpy as np
 from point2d import Point2D
 
 from scorecard.scorecard_location_utils import (
     is_point_in_polygon,
+    is_point_near_base,
     rotate_x_z,
     get_corners_from_center_size_rotation,
     calc_dist_point_to_segment,
+    dist_points_to_segments,
+    points_in_polygons,
+    points_in_rectangles,
+    points_near_bases,
+    rotate_points,
     up_ramp_or_down)
 
 
+def pnpoly(x, y, polygon):
+    '''The scalar algorithm, on a closed copy of the polygon'''
+    closed = polygon + polygon[:1]
+    is_inside = False
+    for p1, p2 in zip(closed, closed[1:]):
+        if (p1[1] > y) != (p2[1] > y) and x < (
+                (p2[0] - p1[0]) * (y - p1[1]) / (p2[1] - p1[1]) + p1[0]):
+            is_inside = not is_inside
+    return is_inside
+
+
 class TestScorecardLocationutils(unittest.TestCase):
 
     def test_rotate_point(self):
@@ -103,6 +122,60 @@ class TestScorecardLocationutils(unittest.TestCase):
         pt = Point2D(6.5, 4.5)
         is_inside = is_point_in_polygon(pt, polygon)
         self.assertTrue(is_inside)
+        # The polygon is left as it was
+        self.assertEqual(len(polygon), 5)
+
+    def test_rotate_points(self):
+        points = rotate_points(
+            [[3, 5], [-4, 1.5]], [[0, 0], [-1, -1]], [33, 61])
+        np.testing.assert_allclose(
+            points, [[5.2392, 2.55943], [-0.26787, 2.83588]], atol=0.0001)
+
+    def test_points_in_rectangles(self):
+        rng = random.Random(2)
+        points = [[rng.uniform(-5, 5), rng.uniform(-5, 5)]
+                  for _ in range(200)]
+        rectangles = [
+            ([rng.uniform(-3, 3), rng.uniform(-3, 3)],
+             [rng.uniform(0.5, 4), rng.uniform(0.5, 4)],
+             rng.uniform(-360, 360)) for _ in range(6)]
+        centers, sizes, rotations = zip(*rectangles)
+        inside = points_in_rectangles(points, centers, sizes, rotations)
+        self.assertEqual(inside.shape, (200, 6))
+
+        for m, (center, size, rotation) in enumerate(rectangles):
+            corners = [
+                (pt.x, pt.y) for pt in get_corners_from_center_size_rotation(
+                    Point2D(*center), Point2D(*size), rotation)]
+            for n, (x, y) in enumerate(points):
+                self.assertEqual(inside[n, m], pnpoly(x, y, corners))
+        self.assertTrue(inside.any())
+
+        # Concave polygons too
+        polygon = [[6.1, 5.8], [8.0, 2.9], [5.8, 0.6], [1.2, 2.86], [5.5, 3]]
+        self.assertEqual(
+            points_in_polygons([[4, 4], [6.5, 4.5]], [polygon])[:, 0].tolist(),
+            [False, True])
+
+    def test_dist_points_to_segments(self):
+        dists = dist_points_to_segments(
+            [[1, 1], [5, 4], [-3.75, -4]],
+            [[0, 0], [-4, 1]],
+            [[2, 0], [-2.5, -2]])
+        self.assertEqual(dists.shape, (3, 2))
+        np.testing.assert_allclose(
+            [dists[0, 0], dists[1, 0], dists[2, 1]], [1, 5, 2.3585],
+            atol=0.0001)
+
+        # Points near the base of a ramp, which runs from (1, -1) to
+        #   (-1, -1) before rotating
+        near = points_near_bases(
+            [[0, -1.2], [0, 1], [0, 1.2]], [[0, 0], [0, 0]],
+            [[2, 2], [2, 2]], [0, 180], 0.5)
+        self.assertEqual(near.tolist(), [[True, False], [False, True],
+                                         [False, True]])
+        self.assertTrue(is_point_near_base(
+            Point2D(0, 1.2), Point2D(0, 0), Point2D(2, 2), 180, 0.5))
 
     def test_calc_dist_point_to_segment(self):
         E = Point2D(1, 1)
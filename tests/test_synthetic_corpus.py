@@ -0,0 +1,106 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import offline_ingest
+from benchmarks import synthetic_corpus
+from scorecard import Scorecard
+
+
+def read_folder(folder: str) -> dict:
+    contents = {}
+    for file_name in sorted(os.listdir(folder)):
+        with open(os.path.join(folder, file_name)) as json_file:
+            contents[file_name] = json.load(json_file)
+    return contents
+
+
+class TestSyntheticCorpus(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_generate_scene_patterns(self):
+        options = dict(synthetic_corpus.DEFAULT_OPTIONS, objects=2)
+        scene = synthetic_corpus.generate_scene(
+            0, options, random.Random(1))
+        types = [obj["type"] for obj in scene["objects"]]
+        self.assertEqual(types.count("triangle"), 2)
+        self.assertEqual(types.count("chest_1"), 2)
+        # An obstruction and a ramp top platform each time
+        self.assertEqual(types.count("cube"), 4)
+        self.assertTrue(scene["lava"])
+        self.assertEqual(
+            scene["goal"]["metadata"]["target"]["id"],
+            scene["objects"][0]["id"])
+
+        options["patterns"] = ["containers"]
+        scene = synthetic_corpus.generate_scene(
+            0, options, random.Random(1))
+        self.assertNotIn("lava", scene)
+        self.assertEqual(
+            scene["goal"]["sceneInfo"]["tertiaryType"], "container")
+
+    def test_generate_corpus_is_deterministic(self):
+        options = {"steps": 50, "timestamp": "20240101-000000"}
+        serial = os.path.join(self.tmp_dir, "serial")
+        parallel = os.path.join(self.tmp_dir, "parallel")
+        synthetic_corpus.generate_corpus(serial, 4, options, 1, seed=3)
+        synthetic_corpus.generate_corpus(parallel, 4, options, 2, seed=3)
+        for folder in ["scenes", "history"]:
+            self.assertEqual(
+                read_folder(os.path.join(serial, folder)),
+                read_folder(os.path.join(parallel, folder)))
+
+    def test_corpus_ingests(self):
+        output_dir = os.path.join(self.tmp_dir, "corpus")
+        results = synthetic_corpus.generate_corpus(
+            output_dir, 4, {"steps": 300}, 1)
+        self.assertEqual(results["histories"], 4)
+
+        output = os.path.join(self.tmp_dir, "history.jsonl")
+        results = offline_ingest.offline_ingest(
+            os.path.join(output_dir, "scenes"),
+            os.path.join(output_dir, "history"),
+            output)
+        self.assertEqual(results["failed"], [])
+        self.assertEqual(results["written"], 4)
+        with open(output) as output_file:
+            items = [json.loads(line) for line in output_file]
+        for item in items:
+            self.assertEqual(item["eval"], "Evaluation 6 Results")
+            self.assertLessEqual(len(item["steps"]), 300)
+            self.assertIn("scorecard", item["score"])
+
+    def test_obstructions_reach_scorecard(self):
+        output_dir = os.path.join(self.tmp_dir, "corpus")
+        synthetic_corpus.generate_corpus(
+            output_dir, 4, {"steps": 300, "patterns": ["obstructions"]}, 1)
+        scenes = read_folder(os.path.join(output_dir, "scenes"))
+        histories = read_folder(os.path.join(output_dir, "history"))
+
+        # The obstructed moves are into the obstructions, not only into
+        #   the room's walls
+        walked_into = []
+        walked_into_structures = 0
+        for history in histories.values():
+            scene = scenes[history["info"]["name"] + "_debug.json"]
+            scorecard = Scorecard(history, scene)
+            walked_into.extend(scorecard.obstructed_move_ids([
+                step for step in history["steps"]
+                if step["output"]["return_status"] == "OBSTRUCTED"]))
+            walked_into_structures += (
+                scorecard.calc_walked_into_structures())
+        self.assertGreater(walked_into_structures, 0)
+        self.assertTrue(any(
+            id is not None and id.startswith("platform_")
+            for id in walked_into))
+
+if __name__ == '__main__':
+    unittest.main()